@@ -0,0 +1,84 @@
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AckBatcher:
+    """
+    Settles RabbitMQ deliveries once their updates have been processed.
+
+    Deliveries finish out of order because they run on different workers, so
+    successful deliveries are only acknowledged once every delivery before
+    them is settled too. The contiguous run is then acknowledged with a single
+    `multiple=True` ack as soon as `batch_size` deliveries are ready, or when
+    `flush()` is called.
+
+    Failed deliveries are copied to the dead letter queue (when configured)
+    and acknowledged, or rejected without requeueing otherwise, so a broken
+    update never stays unacknowledged and never blocks the ones behind it.
+
+    All methods must be called from the thread that owns the channel.
+    """
+
+    def __init__(self, channel, batch_size=1, dead_letter_queue=None):
+        """
+        :param channel: The pika channel the deliveries were received on
+        :param batch_size: Number of ready deliveries that triggers an ack
+        :param dead_letter_queue: Queue that receives failed deliveries, or None
+        """
+        self.channel = channel
+        self.batch_size = max(1, int(batch_size))
+        self.dead_letter_queue = dead_letter_queue
+        self._outstanding = collections.deque()
+        self._settled = set()
+        self._ready_tag = None
+        self._ready_count = 0
+
+    def track(self, delivery_tag):
+        """Register a delivery as soon as it is received."""
+        self._outstanding.append(delivery_tag)
+
+    def settle(self, delivery_tag, body=None, success=True, properties=None):
+        """Mark a tracked delivery as processed, successfully or not."""
+        if not success:
+            if self.dead_letter_queue:
+                self.channel.basic_publish(
+                    exchange="",
+                    routing_key=self.dead_letter_queue,
+                    body=body,
+                    properties=properties,
+                )
+                logger.warning(
+                    f"Moved delivery {delivery_tag} to {self.dead_letter_queue}"
+                )
+            else:
+                # Drop it from the run and reject it right away
+                self._outstanding.remove(delivery_tag)
+                self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+                logger.warning(f"Rejected delivery {delivery_tag}")
+                self._advance()
+                return
+
+        self._settled.add(delivery_tag)
+        self._advance()
+
+    def _advance(self):
+        while self._outstanding and self._outstanding[0] in self._settled:
+            delivery_tag = self._outstanding.popleft()
+            self._settled.discard(delivery_tag)
+            self._ready_tag = delivery_tag
+            self._ready_count += 1
+        if self._ready_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Acknowledge every delivery that is ready, even if the batch is not full."""
+        if self._ready_tag is None:
+            return
+        self.channel.basic_ack(delivery_tag=self._ready_tag, multiple=True)
+        logger.debug(
+            f"Acked {self._ready_count} deliveries up to {self._ready_tag}"
+        )
+        self._ready_tag = None
+        self._ready_count = 0
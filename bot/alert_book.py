@@ -0,0 +1,146 @@
+import bisect
+import collections
+import logging
+import threading
+import time
+
+from bot.market_catalog import market_catalog
+
+logger = logging.getLogger(__name__)
+
+# A price alert as stored in price_alert_requests
+Alert = collections.namedtuple("Alert", ["alert_id", "user_id", "symbol", "price_level"])
+
+
+class AlertBook:
+    """
+    In-memory index of the price alerts, grouped by market.
+
+    The price levels of each market are kept sorted, so the alerts hit by a
+    price move are found with two bisects, whatever the number of alerts.
+    An alert triggers when the price crosses its level between two
+    observations, or is within `band` of it (the original behaviour, which
+    also covers the first observation of a market).
+
+    Markets are keyed by their unified Bybit symbol, so "BTCUSDT" and
+    "BTC/USDT" alerts share one ticker. The book follows the
+    price_alert_requests table: handlers update it on writes, `sync` picks up
+    rows written by other processes and a full reload every
+    `resync_interval` seconds drops the ones they removed.
+    """
+
+    def __init__(self, band=0.005, resync_interval=300, overlap=100):
+        """
+        :param band: Relative distance to the price at which an alert triggers
+        :param resync_interval: Seconds between full reloads from the database
+        :param overlap: Ids below the highest known one that every sync reads
+            again, to pick up rows committed out of id order
+        """
+        self.band = band
+        self.resync_interval = resync_interval
+        self.overlap = overlap
+        self._levels = {}  # market -> sorted [(level, alert_id)]
+        self._alerts = {}  # alert_id -> (market, Alert)
+        self._prices = {}  # market -> last observed price
+        self._max_id = 0
+        self._synced_at = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def market(symbol):
+        listing = market_catalog.find(symbol, "bybit")
+        return listing.symbol if listing is not None else symbol
+
+    def add(self, alert):
+        # Resolved before taking the lock, the catalog may have to be built
+        self._insert(self.market(alert.symbol), alert)
+
+    def _insert(self, market, alert):
+        with self._lock:
+            if alert.alert_id in self._alerts:
+                return
+            bisect.insort(
+                self._levels.setdefault(market, []),
+                (float(alert.price_level), alert.alert_id),
+            )
+            self._alerts[alert.alert_id] = (market, alert)
+            self._max_id = max(self._max_id, alert.alert_id)
+
+    def remove(self, alert_id):
+        with self._lock:
+            entry = self._alerts.pop(alert_id, None)
+            if entry is None:
+                return
+            market, alert = entry
+            levels = self._levels[market]
+            levels.pop(bisect.bisect_left(levels, (float(alert.price_level), alert_id)))
+            if not levels:
+                del self._levels[market]
+                self._prices.pop(market, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._alerts)
+
+    def markets(self):
+        with self._lock:
+            return list(self._levels)
+
+    def sync(self, session, model):
+        """
+        Catch up with the alert table.
+
+        New rows are loaded by id on every call; the whole table is reloaded
+        every `resync_interval` seconds to drop removed alerts. Ids are
+        allocated at insert but become visible at commit, so concurrent
+        inserts can commit out of order: the last `overlap` ids below the
+        highest known one are read again, and the rows that were still in
+        flight at the previous sync are added then. Alerts already in the
+        book are left as they are. The query and the market lookups run
+        without the lock, so alert operations are not held up by them.
+        """
+        now = time.monotonic()
+        with self._lock:
+            full = self._synced_at is None or now - self._synced_at >= self.resync_interval
+            min_id = self._max_id - self.overlap
+        query = session.query(model)
+        if not full:
+            query = query.filter(model.id > min_id)
+        alerts = [Alert(row.id, row.user_id, row.symbol, row.price_level) for row in query.all()]
+        markets = [self.market(alert.symbol) for alert in alerts]
+        with self._lock:
+            if full:
+                self._levels.clear()
+                self._alerts.clear()
+                self._max_id = 0
+                self._synced_at = now
+            for market, alert in zip(markets, alerts):
+                self._insert(market, alert)
+            if full:
+                # Forget the prices of markets that no longer have alerts
+                for market in list(self._prices):
+                    if market not in self._levels:
+                        del self._prices[market]
+                logger.info(f"Reloaded {len(self._alerts)} price alerts")
+
+    def update_price(self, market, price):
+        """Record a new price of a market and remove and return the alerts it triggers."""
+        with self._lock:
+            levels = self._levels.get(market)
+            previous = self._prices.get(market, price)
+            self._prices[market] = price
+            if not levels:
+                return []
+
+            low = min(previous, price * (1 - self.band))
+            high = max(previous, price * (1 + self.band))
+            start = bisect.bisect_left(levels, (low, float("-inf")))
+            end = bisect.bisect_right(levels, (high, float("inf")))
+            triggered = [self._alerts[alert_id][1] for _, alert_id in levels[start:end]]
+            for alert in triggered:
+                self.remove(alert.alert_id)
+            return triggered
+
+
+# Shared by the alert handlers and the periodic alert check of the process
+alert_book = AlertBook()
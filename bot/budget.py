@@ -0,0 +1,238 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from bot.database import ApiUsage, Session
+from bot.lanes import LANES
+from config.settings import (
+    RAPIDAPI_RATE,
+    RAPIDAPI_MONTHLY_QUOTA,
+    LUNARCRUSH_RATE,
+    LUNARCRUSH_DAILY_CREDITS,
+    API_BUDGET_PROCESSES,
+    API_BUDGET_RESERVE,
+    API_BUDGET_MAX_WAIT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Priorities of provider calls, lower is served first. Updates take the
+# priority of their lane (bot.lanes.lane_priority: premium, interactive,
+# bulk); scheduled jobs and anything outside an update are background.
+BACKGROUND = len(LANES)
+
+# A provider's limits: requests per second, and calls (or credits) per
+# "day" or "month" (UTC)
+Provider = collections.namedtuple("Provider", ["name", "rate", "quota", "period"])
+
+# Priority of the calls made by the current thread, see request_priority
+_context = threading.local()
+
+
+class BudgetExceeded(Exception):
+    """A provider call was refused to stay within the rate or the quota."""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} budget exceeded: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+def current_priority():
+    return getattr(_context, "priority", BACKGROUND)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Make the provider calls of this thread use the given priority."""
+    previous = current_priority()
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+def period_start(period, now=None):
+    now = now or datetime.utcnow()
+    if period == "month":
+        return datetime(now.year, now.month, 1)
+    return datetime(now.year, now.month, now.day)
+
+
+class PriorityBucket:
+    """
+    Token bucket where lower priorities leave tokens for the higher ones.
+
+    Premium calls may empty the bucket, lower priorities have to leave a
+    growing share of it (background calls only take a token from a full
+    bucket), so when the rate is tight premium calls go through first and
+    background calls wait for the bucket to refill. The bucket holds one
+    token on top of the burst, which only premium calls may take, so even
+    at a rate below one call per second premium calls go first.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: Tokens added per second
+        :param burst: Calls a background caller may make at once from a full
+            bucket, premium callers get one more
+        """
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0) + 1
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority, timeout):
+        """Take a token, waiting at most `timeout` seconds. Returns False on timeout."""
+        floor = (self.capacity - 1) * min(priority, BACKGROUND) / BACKGROUND
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens - 1 >= floor:
+                    self._tokens -= 1
+                    return True
+                wait = (floor + 1 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class ApiBudget:
+    """
+    Rate and quota accounting of the paid provider APIs.
+
+    Quotas are counted in the api_usage table, one row per provider and
+    period, with a conditional increment, so every process and thread draws
+    from the same budget and none can overshoot it. A call of priority p
+    may only use the quota up to (1 - reserve[p]), keeping the rest for
+    higher priorities. Request rates are enforced per process with a
+    PriorityBucket, each of the `processes` processes getting an equal
+    share of the provider rate.
+    """
+
+    def __init__(self, providers, processes=1, reserve=(0,), max_wait=10):
+        """
+        :param providers: Provider limits
+        :param processes: Number of processes sharing the rates
+        :param reserve: Share of the quota held back from each priority
+        :param max_wait: Seconds a call waits for the rate before it is refused
+        """
+        self.providers = {provider.name: provider for provider in providers}
+        self.reserve = tuple(reserve)
+        self.max_wait = max_wait
+        self._buckets = {
+            provider.name: PriorityBucket(provider.rate / processes, provider.rate / processes)
+            for provider in providers
+        }
+
+    def reserve_share(self, priority):
+        return self.reserve[min(priority, len(self.reserve) - 1)]
+
+    def spend(self, provider, cost=1, priority=None):
+        """
+        Account for a provider call before making it, waiting for the rate.
+
+        :param cost: Calls or credits the call uses
+        :param priority: Priority of the call, the thread's by default
+        :raises BudgetExceeded: When the call does not fit in the budget
+        """
+        limits = self.providers[provider]
+        priority = current_priority() if priority is None else priority
+        if not self._buckets[provider].acquire(priority, self.max_wait):
+            logger.warning(f"Refused {provider} call of priority {priority}: rate limit")
+            raise BudgetExceeded(provider, "rate limit")
+        allowed = int(limits.quota * (1 - self.reserve_share(priority)))
+        if not self._consume(limits, cost, allowed):
+            logger.warning(f"Refused {provider} call of priority {priority}: quota used up")
+            raise BudgetExceeded(provider, "quota used up")
+
+    def _consume(self, limits, cost, allowed):
+        start = period_start(limits.period)
+        session = Session()
+        try:
+            for _ in range(2):
+                result = session.execute(
+                    update(ApiUsage)
+                    .where(
+                        ApiUsage.provider == limits.name,
+                        ApiUsage.period_start == start,
+                        ApiUsage.used + cost <= allowed,
+                    )
+                    .values(used=ApiUsage.used + cost)
+                )
+                if result.rowcount:
+                    session.commit()
+                    return True
+                if session.get(ApiUsage, (limits.name, start)) is not None:
+                    session.rollback()
+                    return False
+                # First call of the period, another process may create the row too
+                try:
+                    session.add(ApiUsage(provider=limits.name, period_start=start, used=0))
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+            return False
+        except SQLAlchemyError as e:
+            # Don't take the commands down with the accounting
+            logger.error(f"Could not account for a {limits.name} call: {e}")
+            session.rollback()
+            return True
+        finally:
+            session.close()
+
+    def remaining(self, provider):
+        """
+        Return the budget left for a provider in the current period:
+        {"quota", "used", "remaining", "period_start", "rate_tokens"}.
+        """
+        limits = self.providers[provider]
+        start = period_start(limits.period)
+        session = Session()
+        try:
+            usage = session.get(ApiUsage, (provider, start))
+            used = usage.used if usage is not None else 0
+        finally:
+            session.close()
+        return {
+            "quota": limits.quota,
+            "used": used,
+            "remaining": max(limits.quota - used, 0),
+            "period_start": start,
+            "rate_tokens": self._buckets[provider].available(),
+        }
+
+    def status(self):
+        """Remaining budget of every provider, by provider name."""
+        return {name: self.remaining(name) for name in self.providers}
+
+
+# Shared by every handler and job of the process
+api_budget = ApiBudget(
+    [
+        Provider("rapidapi", RAPIDAPI_RATE, RAPIDAPI_MONTHLY_QUOTA, "month"),
+        Provider("lunarcrush", LUNARCRUSH_RATE, LUNARCRUSH_DAILY_CREDITS, "day"),
+    ],
+    processes=API_BUDGET_PROCESSES,
+    reserve=API_BUDGET_RESERVE,
+    max_wait=API_BUDGET_MAX_WAIT,
+)
@@ -0,0 +1,89 @@
+import fcntl
+import logging
+import os
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Candles are stored as rows of 6 float64 values (ccxt's OHLCV order)
+COLUMNS = 6
+ROW_BYTES = COLUMNS * np.dtype(np.float64).itemsize
+
+UNSAFE_CHARACTERS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class CandleStore:
+    """
+    Append-only on-disk store of closed candles, one file per
+    (exchange, symbol, timeframe).
+
+    Each file is a flat array of little-endian float64 rows (timestamp in
+    ms, open, high, low, close, volume) in timestamp order, so reads are
+    memory-mapped and slicing a long history copies nothing until used.
+    Only closed candles are stored; they never change, so appends only add
+    rows newer than the last stored one. Writers of several processes are
+    serialized with a file lock, and a row left incomplete by a crash is
+    dropped before the next append.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, exchange_id, symbol, timeframe):
+        return os.path.join(
+            self.root,
+            UNSAFE_CHARACTERS.sub("_", exchange_id),
+            UNSAFE_CHARACTERS.sub("_", symbol),
+            f"{UNSAFE_CHARACTERS.sub('_', timeframe)}.f64",
+        )
+
+    def read(self, exchange_id, symbol, timeframe):
+        """Return the stored candles as a read-only memory-mapped (n, 6) array."""
+        path = self.path(exchange_id, symbol, timeframe)
+        try:
+            rows = os.path.getsize(path) // ROW_BYTES
+        except OSError:
+            rows = 0
+        if not rows:
+            return np.empty((0, COLUMNS), dtype="<f8")
+        return np.memmap(path, dtype="<f8", mode="r", shape=(rows, COLUMNS))
+
+    def append(self, exchange_id, symbol, timeframe, candles):
+        """Append the candles newer than the last stored one. Returns the number written."""
+        candles = np.asarray(candles, dtype="<f8").reshape(-1, COLUMNS)
+        if not len(candles):
+            return 0
+        path = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                size = f.seek(0, os.SEEK_END)
+                complete = size - size % ROW_BYTES
+                if complete != size:
+                    logger.warning(f"Dropping an incomplete candle row from {path}")
+                    f.truncate(complete)
+                if complete:
+                    f.seek(complete - ROW_BYTES)
+                    last = np.frombuffer(f.read(ROW_BYTES), dtype="<f8")[0]
+                    candles = candles[candles[:, 0] > last]
+                if len(candles):
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(candles).tobytes())
+                    f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return len(candles)
+
+    def reset(self, exchange_id, symbol, timeframe):
+        """Drop the stored candles of a series."""
+        path = self.path(exchange_id, symbol, timeframe)
+        if not os.path.exists(path):
+            return
+        # Replace the file instead of truncating it: arrays still mapped from
+        # the old file must stay readable
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        open(tmp_path, "wb").close()
+        os.replace(tmp_path, path)
@@ -113,6 +113,25 @@ class Referrals(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False) # Timestamp of the referral
 
 
+# Market scan result table class definition
+class ScanResult(Base):
+    __tablename__ = "scan_results"
+    timeframe = Column(String, primary_key=True)  # One row per scanned timeframe
+    candle_time = Column(DateTime, nullable=False)  # Open time of the last closed candle scanned
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    symbols = Column(Integer, nullable=False)  # Number of symbols scored
+    bullish = Column(String, nullable=False)  # JSON list of the top bullish symbols
+    bearish = Column(String, nullable=False)  # JSON list of the top bearish symbols
+
+
+# API usage table class definition (see bot.budget)
+class ApiUsage(Base):
+    __tablename__ = "api_usage"
+    provider = Column(String, primary_key=True)  # Provider name, e.g. rapidapi
+    period_start = Column(DateTime, primary_key=True)  # Start of the quota period (UTC)
+    used = Column(Integer, default=0, nullable=False)  # Calls or credits spent in the period
+
+
 # Create a connection to the database and bind the engine
 engine = create_engine(MY_POSTGRESQL_URL)
 
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+import ccxt
+from requests.adapters import HTTPAdapter
+
+from config.settings import EXCHANGE_MARKETS_TTL, EXCHANGE_TIMEOUT, EXCHANGE_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangeRegistry:
+    """
+    Process-wide registry of ccxt exchange clients.
+
+    Each exchange gets one client, created on first use with a keep-alive
+    HTTP session sized for the worker threads, and its markets are loaded
+    once and reloaded after `markets_ttl` seconds. Clients are shared by all
+    threads: creation and market (re)loads happen under a per-exchange lock,
+    so no caller sees a client without markets and concurrent callers never
+    load them twice. If a reload fails the previous markets are kept.
+    """
+
+    def __init__(self, markets_ttl=3600, timeout=10000, pool_size=16):
+        """
+        :param markets_ttl: Seconds after which the markets are reloaded
+        :param timeout: Request timeout of the clients in milliseconds
+        :param pool_size: Connections kept alive per exchange host
+        """
+        self.markets_ttl = markets_ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._clients = {}
+        self._loaded_at = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _exchange_lock(self, exchange_id):
+        with self._lock:
+            return self._locks.setdefault(exchange_id, threading.Lock())
+
+    def _create(self, exchange_id):
+        exchange = getattr(ccxt, exchange_id)(
+            {"enableRateLimit": True, "timeout": self.timeout}
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        exchange.session.mount("https://", adapter)
+        exchange.session.mount("http://", adapter)
+        return exchange
+
+    def get(self, exchange_id):
+        """
+        Return the shared client of an exchange, with its markets loaded.
+
+        :raises ccxt.BaseError: When the markets could not be loaded at all
+        """
+        with self._exchange_lock(exchange_id):
+            exchange = self._clients.get(exchange_id)
+            if exchange is None:
+                exchange = self._clients[exchange_id] = self._create(exchange_id)
+
+            loaded_at = self._loaded_at.get(exchange_id)
+            if loaded_at is None or time.monotonic() - loaded_at >= self.markets_ttl:
+                try:
+                    exchange.load_markets(reload=loaded_at is not None)
+                    self._loaded_at[exchange_id] = time.monotonic()
+                    logger.info(f"Loaded {len(exchange.markets)} {exchange_id} markets")
+                except ccxt.BaseError as e:
+                    if loaded_at is None:
+                        raise
+                    logger.warning(f"Could not reload {exchange_id} markets, keeping the old ones: {e}")
+                    # Try again after the next interval, not on every call
+                    self._loaded_at[exchange_id] = time.monotonic()
+            return exchange
+
+
+# Shared by every handler, job and periodic task of the process
+exchanges = ExchangeRegistry(
+    markets_ttl=EXCHANGE_MARKETS_TTL,
+    timeout=EXCHANGE_TIMEOUT,
+    pool_size=EXCHANGE_POOL_SIZE,
+)
+
+
+def get_exchange(exchange_id):
+    """Return the shared, ready to use client of an exchange, e.g. "bybit"."""
+    return exchanges.get(exchange_id)
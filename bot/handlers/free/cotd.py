@@ -1,23 +1,21 @@
-import requests
 import logging
-import ccxt
 import datetime
 import plotly.graph_objects as go
 import numpy as np
-import pandas as pd
-import ta
-import os
+import io
 from datetime import datetime, timedelta
 
 from telegram import Update
 from telegram.ext import CallbackContext
 from bot.utils import restricted
-from config.settings import LUNARCRUSH_API_KEY
 from bot.utils import log_command_usage
-
-from cachetools import TTLCache
-
-cotd_cache = TTLCache(maxsize=1, ttl=3600)
+from bot.jobs import enqueue_job, job_handler, delete_progress
+from bot.market_data import market_data
+from bot import indicators
+from bot.exchanges import get_exchange
+from bot.singleflight import coalesce
+from bot.render_cache import shared
+from bot.lunarcrush import lunarcrush, LunarCrushError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -27,49 +25,26 @@ logger = logging.getLogger(__name__)
 class CotdHandler:
     @staticmethod
     def fetch_ohlcv_data(symbol):
-        """Fetch OHLCV data from Binance and return as a DataFrame"""
+        """Fetch the last 4 weeks of 4h candles from Bybit, and the SMA50 warm-up before them, as a DataFrame"""
         try:
-            exchange = ccxt.bybit()
-            ohlcv = exchange.fetch_ohlcv(symbol.upper() + "/USDT", "4h")
+            return market_data.frame(
+                get_exchange("bybit"),
+                symbol.upper() + "/USDT",
+                "4h",
+                # Cut to the 4 weeks once the indicators are added
+                count=4 * 7 * 6 + 50,
+            )
         except Exception as e:
             logger.exception("Error fetching OHLCV data")
             raise e
 
-        # Filter data to display only the last 4 weeks
-        two_weeks_ago = datetime.now() - timedelta(weeks=4)
-        ohlcv = [
-            entry
-            for entry in ohlcv
-            if datetime.fromtimestamp(entry[0] // 1000) >= two_weeks_ago
-        ]
-
-        # Convert timestamp to datetime objects
-        for entry in ohlcv:
-            entry[0] = datetime.fromtimestamp(entry[0] // 1000)
-
-        # Create a DataFrame and set 'Date' as the index
-        df = pd.DataFrame(
-            ohlcv, columns=["Date", "Open", "High", "Low", "Close", "Volume"]
-        )
-        df.set_index("Date", inplace=True)
-
-        return df
-
     @staticmethod
     def add_indicators(df):
         """Add RSI and moving averages to the DataFrame"""
-        # Add RSI
-        delta = df["Close"].diff()
-        gain, loss = delta.where(delta > 0, 0), delta.where(delta < 0, 0).abs()
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        df["RSI"] = rsi
-
-        # Add moving averages
-        df["SMA21"] = ta.trend.sma_indicator(df["Close"], window=21)
-        df["SMA50"] = ta.trend.sma_indicator(df["Close"], window=50)
+        close = df["Close"].to_numpy(dtype="float64")
+        df["RSI"] = indicators.rsi(close, 14)
+        df["SMA21"] = indicators.sma(close, 21)
+        df["SMA50"] = indicators.sma(close, 50)
 
         return df
 
@@ -129,23 +104,68 @@ class CotdHandler:
             margin=dict(b=40, t=40, r=40, l=40),
         )
 
-        # Save the chart as a PNG image
-        fig.write_image(f"charts/{symbol}_chart.png", scale=1.5, width=1000, height=600)
+        # Render the chart as PNG bytes
+        return fig.to_image(format="png", scale=1.5, width=1000, height=600)
+
+    @staticmethod
+    @coalesce(lambda symbol: ("cotd_chart", symbol.upper()))
+    @shared(lambda symbol: ("cotd_chart", symbol.upper()))
+    def render_chart(symbol):
+        """Fetch the candles and render the chart, shared by concurrent requests"""
+        df = CotdHandler.fetch_ohlcv_data(symbol)
+        df = CotdHandler.add_indicators(df)
+        # Only chart the last 4 weeks, the candles before them warmed the indicators up
+        df = df[df.index >= datetime.utcnow() - timedelta(weeks=4)]
+        return CotdHandler.plot_ohlcv_chart(df, symbol)
+
+    @staticmethod
+    @job_handler("cotd_chart")
+    def send_chart(bot, job):
+        """Render the Coin of the Day chart in a job worker and send it to the chat"""
+        chat_id = job["chat_id"]
+        coin_name = job["params"]["coin_name"]
+        coin_symbol = job["params"]["coin_symbol"]
+
+        # Fetch and plot the OHLCV chart
+        try:
+            chart = CotdHandler.render_chart(coin_symbol)
+        except Exception as e:
+            logger.exception("Error while plotting the OHLCV chart")
+            bot.send_message(
+                chat_id=chat_id,
+                text=f"Coin of the Day: {coin_name} ({coin_symbol}).\n\n"
+                "Can't generate the chart. Symbol not listed on available exchanges.",
+            )
+            return
+
+        # Send the chart and the Coin of the Day message
+        try:
+            bot.send_photo(chat_id=chat_id, photo=io.BytesIO(chart))
+            bot.send_message(
+                chat_id=chat_id, text=f"Coin of the Day: {coin_name} ({coin_symbol})"
+            )
+        except Exception as e:
+            logger.exception(
+                "Error while sending the chart and the Coin of the Day message"
+            )
+            bot.send_message(
+                chat_id=chat_id,
+                text="Error while sending the chart and the Coin of the Day message. Please try again later.",
+            )
+            return
+
+        # Delete the loading message
+        delete_progress(bot, job)
 
     @staticmethod
     @log_command_usage("cotd")
     def coin_of_the_day(update: Update, context: CallbackContext):
-        # Fetch Coin of the Day data from LunarCrush API
-        url = "https://lunarcrush.com/api3/coinoftheday"
-        headers = {"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"}
-
         loading_message = update.message.reply_text("Fetching Coin of the Day...", quote=True)
 
+        # Fetch Coin of the Day data from LunarCrush API (cached, see bot.lunarcrush)
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-        except requests.exceptions.RequestException as e:
+            data = lunarcrush.get("coinoftheday")
+        except LunarCrushError as e:
             logger.exception(
                 "Connection error while fetching Coin of the Day from LunarCrush API"
             )
@@ -162,48 +182,16 @@ class CotdHandler:
 
 
         if "name" in data and "symbol" in data:
-            coin_name = data["name"]
-            coin_symbol = data["symbol"]
-
-            # Fetch and plot the OHLCV chart
-            try:
-                df = CotdHandler.fetch_ohlcv_data(coin_symbol)
-                df = CotdHandler.add_indicators(df)
-                CotdHandler.plot_ohlcv_chart(df, coin_symbol)
-            except Exception as e:
-                logger.exception("Error while plotting the OHLCV chart")
-                update.message.reply_text(
-                    f"Coin of the Day: {coin_name} ({coin_symbol}).\n\n"
-                    "Can't generate the chart. Symbol not listed on available exchanges."
-                )
-                return
-
-            # Send the chart and the Coin of the Day message
-            image_path = f"charts/{coin_symbol}_chart.png"
-            try:
-                with open(image_path, "rb") as f:
-                    context.bot.send_photo(chat_id=update.effective_chat.id, photo=f)
-                update.message.reply_text(
-                    f"Coin of the Day: {coin_name} ({coin_symbol})"
-                )
-
-                # Delete the image file after sending it
-                os.remove(image_path)
-            except Exception as e:
-                logger.exception(
-                    "Error while sending the chart and the Coin of the Day message"
-                )
-                update.message.reply_text(
-                    "Error while sending the chart and the Coin of the Day message. Please try again later."
-                )
-                return
-
-            # Delete the loading message
-            context.bot.delete_message(
-                chat_id=update.effective_chat.id, message_id=loading_message.message_id
+            # The chart is rendered by the job workers, which send it along
+            # with the Coin of the Day message and delete the loading message
+            enqueue_job(
+                "cotd_chart",
+                update.effective_chat.id,
+                progress_message_id=loading_message.message_id,
+                coin_name=data["name"],
+                coin_symbol=data["symbol"],
             )
 
-
         else:
             logger.error("Error in LunarCrush API response: Required data not found")
             update.message.reply_text(
@@ -1,10 +1,9 @@
-import requests
 import logging
 from telegram import Update
 from telegram.ext import CallbackContext
 
 from bot.utils import log_command_usage, command_usage_example
-from config.settings import LUNARCRUSH_API_KEY
+from bot.lunarcrush import lunarcrush, LunarCrushError
 
 logger = logging.getLogger(__name__)
 
@@ -13,22 +12,20 @@ class GlobalTopHandler:
     @log_command_usage("global_top")
     def global_top(update: Update, context: CallbackContext):
         def fetch_top_coins(metric):
-            api_url = "https://lunarcrush.com/api3/coins/global/top"
-            headers = {"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"}
             params = {
                 "interval": "1w",
                 "order_by": metric,
                 "limit": 10,
             }
-            response = requests.get(api_url, headers=headers, params=params)
-
-            if response.status_code == 200:
-                logger.debug(response.json())
-                return response.json()["top"]
-            else:
-                logger.error(f"Error fetching top coins data: {response.status_code}")
+            try:
+                data = lunarcrush.get("coins/global/top", params)
+            except LunarCrushError as e:
+                logger.error(f"Error fetching top coins data: {e}")
                 return None
 
+            logger.debug(data)
+            return data.get("top")
+
         def format_response_message(top_coins, metric):
             if not top_coins:
                 return "An error occurred while fetching the top coins data."
@@ -1,9 +1,11 @@
 from pycoingecko import CoinGeckoAPI
 from telegram import Update
 from telegram.ext import CallbackContext
-import os
 
-from bot.utils import PlotChart, log_command_usage
+from bot.utils import log_command_usage
+from bot.jobs import enqueue_job
+from bot.market_catalog import market_catalog
+from bot.singleflight import flights
 
 cg = CoinGeckoAPI()
 
@@ -11,7 +13,8 @@ cg = CoinGeckoAPI()
 class LosersHandler:
     @log_command_usage("losers")
     def losers(update: Update, context: CallbackContext) -> None:
-        coins = cg.get_coins_markets(vs_currency="usd")
+        # /gainers and /losers arriving together share one CoinGecko call
+        coins = flights.do(("coingecko", "coins_markets", "usd"), cg.get_coins_markets, vs_currency="usd")
         losers = sorted(
             coins, key=lambda x: x["price_change_percentage_24h"], reverse=False
         )
@@ -19,30 +22,23 @@ class LosersHandler:
             update.message.reply_text(
                 f"{coin['name']}: {coin['price_change_percentage_24h']}%"
             )
-            loading_message = update.message.reply_text(
-                f"Loading OHLCV chart for {coin['name']}...", quote=True
-            )
             # Convert the coin name to the symbol for the chart. For example, "Bitcoin" -> "BTCUSDT",  "Filecoin" -> "FILUSDT"
             symbol = coin["symbol"].upper() + "USDT"
-            chart_file = PlotChart.plot_ohlcv_chart(symbol, "4h")
-            
-            # if chart_file is None delete the loading message, send a symbol not found message and continue to the next coin
-            if chart_file is None:
-                context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=loading_message.message_id,
-                )
-                update.message.reply_text(
-                    f"Symbol not listed on available exchanges."
-                )
+            if not market_catalog.is_listed(symbol):
+                update.message.reply_text("Symbol not listed on available exchanges.")
                 continue
 
-            if chart_file is not None:
-                with open(chart_file, "rb") as file:
-                    context.bot.send_photo(chat_id=update.effective_chat.id, photo=file)
-                os.remove(chart_file)  # Delete the chart file after sending it
+            loading_message = update.message.reply_text(
+                f"Loading OHLCV chart for {coin['name']}...", quote=True
+            )
 
-                context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=loading_message.message_id,
-                )
+            # The chart is rendered by the job workers, which replace the loading
+            # message with the chart (or a symbol not found message)
+            enqueue_job(
+                "chart",
+                update.effective_chat.id,
+                progress_message_id=loading_message.message_id,
+                symbol=symbol,
+                time_frame="4h",
+                not_found_text="Symbol not listed on available exchanges.",
+            )
@@ -3,6 +3,8 @@ from telegram import Update, ParseMode
 from telegram.ext import CallbackContext
 from config.settings import X_RAPIDAPI_KEY
 from bot.utils import log_command_usage
+from bot.budget import BudgetExceeded
+from bot.http_client import http_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,8 +34,11 @@ class NewsHandler:
             'X-RapidAPI-Host': "crypto-news16.p.rapidapi.com"
         }
         try:
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers, provider="rapidapi")
             response.raise_for_status()
+        except BudgetExceeded as err:
+            logger.error(f"Not fetching news: {err}")
+            return []
         except requests.exceptions.HTTPError as errh:
             logger.error(f"Http Error: {errh}")
             return []
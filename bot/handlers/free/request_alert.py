@@ -5,7 +5,8 @@ from telegram.ext import CallbackContext
 from config.settings import X_RAPIDAPI_KEY, MY_POSTGRESQL_URL
 from bot.utils import log_command_usage
 import logging
-import ccxt
+from bot.market_catalog import market_catalog
+from bot.alert_book import Alert, alert_book
 
 logger = logging.getLogger(__name__)
 
@@ -22,23 +23,22 @@ class PriceAlertHandler:
             if price_level <= 0:
                 update.message.reply_text("Invalid price level. Please enter a positive number.")
                 return
-
-            # Try to fetch the current price for the symbol
-            exchange = ccxt.bybit()
-            ticker = exchange.fetch_ticker(symbol)
-            current_price = ticker['last']
-        except (ValueError, IndexError):
+        except (ValueError, IndexError, ArithmeticError):
             update.message.reply_text("Invalid input. Please enter a symbol and a price level.")
             return
-        except ccxt.BaseError as e:
-            logger.error(f"Failed to fetch the current price for {symbol}: {e}")
+
+        # Alerts are checked against Bybit, so the market must be listed there
+        listing = market_catalog.find(symbol, "bybit")
+        if listing is None:
             update.message.reply_text(f"Invalid symbol. {symbol} is not listed on the exchange or not currently tradable.")
             return
+        symbol = listing.symbol
 
         session = Session()
         price_alert_requests = PriceAlertRequest(user_id=user_id, symbol=symbol, price_level=price_level)
         session.add(price_alert_requests)
         session.commit()
+        alert_book.add(Alert(price_alert_requests.id, user_id, symbol, price_level))
 
         update.message.reply_text(f"Your request for a price alert has been successfully set up! You will receive a notification when the price of {symbol} reaches {price_level}.")
 
@@ -70,4 +70,5 @@ class PriceAlertHandler:
         else:
             session.delete(price_alert_request)
             session.commit()
+            alert_book.remove(alert_id)
             update.message.reply_text(f"Successfully removed price alert with ID {alert_id}.")
\ No newline at end of file
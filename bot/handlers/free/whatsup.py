@@ -1,4 +1,3 @@
-import requests
 from telegram import Update
 from telegram.ext import CallbackContext
 import logging
@@ -7,7 +6,7 @@ from datetime import datetime
 import cachetools
 
 from bot.utils import log_command_usage
-from config.settings import LUNARCRUSH_API_KEY
+from bot.lunarcrush import lunarcrush, LunarCrushError, generated
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,15 +29,10 @@ class WhatsupHandler:
             update (telegram.Update): The update object containing the message data.
             context (telegram.ext.CallbackContext): The context object containing additional data.
         """
-        # Define the API URL and headers
-        url = "https://lunarcrush.com/api3/whatsup"
-        headers = {"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"}
-
         try:
-            # Fetch the data from the LunarCrush API
-            response = requests.get(url, headers=headers, timeout=20)
-            response.raise_for_status()  # Raises stored HTTPError, if one occurred.
-            response_data = response.json()
+            # Fetch the data from the LunarCrush API (cached, see bot.lunarcrush);
+            # only generated responses are cached
+            response_data = lunarcrush.get("whatsup", validate=generated)
 
             # Log the response data for debugging
             logger.debug("Response data from LunarCrush API: %s", response_data)
@@ -75,12 +69,9 @@ class WhatsupHandler:
                 # Notify the user if there's an error fetching data from LunarCrush API
                 update.message.reply_text("Error fetching data from LunarCrush API. Please try again later.")
                 logger.error("Error fetching data from LunarCrush API. Response data: %s", response_data)
-        except requests.exceptions.HTTPError as http_err:
-            logger.error(f'HTTP error occurred: {http_err}')
-            update.message.reply_text("An HTTP error occurred while processing the /whatsup command. Please try again later.")
-        except requests.exceptions.RequestException as req_err:
-            logger.error(f'Request error occurred: {req_err}')
-            update.message.reply_text("A network error occurred while processing the /whatsup command. Please check your connection and try again.")
+        except LunarCrushError as err:
+            logger.error(f'Request error occurred: {err}')
+            update.message.reply_text("Error fetching data from LunarCrush API. Please try again later.")
         except Exception as e:
             logger.exception("An error occurred while processing the /whatsup command: %s", e)
             update.message.reply_text("An unexpected error occurred while processing the /whatsup command. Please try again later.")
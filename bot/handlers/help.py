@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import CallbackContext
 
 from bot.utils import log_command_usage
+from config.settings import SCAN_TIMEFRAMES, SCAN_DEFAULT_TIMEFRAME
 
 
 class HelpHandler:
@@ -12,7 +13,7 @@ class HelpHandler:
         # A dictionary mapping each command to its detailed help text
         command_help_text = {
             "news": "/news - Stay informed with the latest news articles related to cryptocurrencies. You can also specify the number of articles you want to view, e.g. /news 10. Use the -k flag followed by your keyword to filter the news, e.g. /news -k Bitcoin.",
-            "chart": "/chart [symbol] [interval] - Plot a chart of a specific coin by its symbol and interval. Defaults to 4h if no interval is selected. Example: /chart BTCUSDT 1d. Available intervals: 1m, 5m, 15m, 1h, 4h, 1d, 1w, 1M",
+            "chart": "/chart [symbol] [interval] - Plot a chart of a specific coin by its symbol and interval. Defaults to 4h if no interval is selected. Example: /chart BTCUSDT 1d. Available intervals: 1m, 5m, 15m, 1h, 4h, 1d, 1w, 1M, and custom ones such as 2h, 12h or 3d",
             "cotd": "/cotd - Discover LunarCrush's Coin of the Day",
             "global_top": "/global_top [metric] - Retrieve top coins by the specified metric (alt_rank or social_score) over the past week. Defaults to social_volume if not provided. Example: /global_top social_score",
             "whatsup": "/whatsup - Get the latest top URLs engagement for coins, NFTs, and stocks from LunarCrush live dashboard.",
@@ -22,6 +23,7 @@ class HelpHandler:
             "positions": "/positions - Compare the largest positions on Binance Copy Trading to smaller ones.",
             "stats": "/stats [symbol] [timeframe]. view the latest stats for a specific coin. Example: /stats BTCUSDT 1d",
             "signal": "/signal [symbol] [timeframe] - View the latest Sentinel signal for a specific coin. Example: /signal BTCUSDT 1d",
+            "scan": f"/scan [timeframe] - View the most bullish and bearish coins by Sentinel signal score, updated on every candle close. Defaults to {SCAN_DEFAULT_TIMEFRAME}. Example: /scan {SCAN_TIMEFRAMES[-1]}. Available timeframes: {', '.join(SCAN_TIMEFRAMES)}",
             # "wdom": "/wdom - Track the weekly dominance change for Bitcoin and Altcoins.",
             #   "info": "/info [symbol] - Obtain detailed information about a specific coin using its symbol. Example: /info BTCUSDT",
             "set_alert": "/set_alert <Symbol> <Price_level> - Set a price alert. You will be notified when the price of the specified symbol reaches the specified level. Example: /set_alert BTCUSDT 50000",
@@ -51,6 +53,7 @@ class HelpHandler:
                 "💹 /positions - Big Positions from Binance\n"
                 "📊 /stats [symbol] [timeframe] - Coin stats\n"
                 "📈 /signal [symbol] [timeframe] - Sentinel signals\n"
+                "🔭 /scan [timeframe] - Top bullish & bearish coins\n"
                 # "🔍 /wdom - Bitcoin & Altcoin dominance\n"
                 # "🔎 /info [symbol] - Coin info. Ex: /info BTC\n"
                 "📉 /chart [symbol] [interval] - Coin chart. Ex: /chart BTCUSDT 1d.\n\n"
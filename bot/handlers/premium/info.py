@@ -1,10 +1,10 @@
 import logging
-import requests
-import os
 from telegram import Update
 from telegram.ext import CallbackContext
-from bot.utils import log_command_usage, restricted, PlotChart, command_usage_example
-from config.settings import LUNARCRUSH_API_KEY
+from bot.utils import log_command_usage, restricted, command_usage_example
+from bot.jobs import enqueue_job
+from bot.market_catalog import market_catalog
+from bot.lunarcrush import lunarcrush, LunarCrushError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -43,15 +43,10 @@ class InfoHandler:
             logger.error("Symbol mapping not found")
             return None
 
-        # Prepare API request
-        url = f"https://lunarcrush.com/api3/coins/{coin_id}"
-        headers = {"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"}
-
+        # Fetch the coin from LunarCrush API (cached, see bot.lunarcrush)
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-        except requests.exceptions.RequestException as e:
+            data = lunarcrush.get(f"coins/{coin_id}")
+        except LunarCrushError as e:
             logger.exception("Connection error while fetching coin info from LunarCrush API")
             return None
 
@@ -71,9 +66,14 @@ class InfoHandler:
         # Get the user's input
         input_arg = context.args[0]  # Assuming the symbol is passed as a command argument
 
-        # Split the input_arg into cryptocurrency symbol and currency symbol
-        symbol = input_arg[:-4]  # Get the cryptocurrency symbol (e.g., "BTC" from "BTCUSDT")
-        currency = input_arg[-4:]  # Get the currency symbol (e.g., "USDT" from "BTCUSDT")
+        # Find the market, then split it into cryptocurrency symbol and currency symbol
+        # (e.g., "BTC" and "USDT" from "BTCUSDT", "BTC/USDT" or "btc")
+        listing = market_catalog.find(input_arg)
+        if listing is None:
+            update.message.reply_text("Symbol not listed on available exchanges.")
+            return
+        market_symbol = listing.symbol
+        symbol, currency = market_symbol.split("/")
 
         # Set default time frame
         time_frame = '4h'
@@ -108,14 +108,15 @@ class InfoHandler:
             f"📊 {percent_chagne_30d}% (Change in 30 days)"
         )
 
-        # Plot chart with specified time frame
-        chart_file = PlotChart.plot_ohlcv_chart(symbol, time_frame)
-
-        # Send chart and info as a reply
-        update.message.reply_photo(open(chart_file, 'rb'), caption=message)
-
-        # Delete the image file after sending it
-        os.remove(chart_file)
-
-
-
+        # The chart is rendered by the job workers, which send it with the
+        # info as its caption (or the info alone if there is no chart)
+        loading_message = update.message.reply_text("Chart queued...", quote=True)
+        enqueue_job(
+            "chart",
+            update.effective_chat.id,
+            progress_message_id=loading_message.message_id,
+            symbol=market_symbol,
+            time_frame=time_frame,
+            caption=message,
+            not_found_text=message,
+        )
@@ -4,14 +4,14 @@ import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
 import ta
-import os
 from datetime import datetime, timedelta
 from telegram import Update
 from telegram.ext import CallbackContext
 from bot.utils import log_command_usage, restricted, command_usage_example
 from config.settings import LUNARCRUSH_API_KEY
 from bot.utils import restricted
-from bot.utils import PlotChart
+from bot.jobs import enqueue_job
+from bot.market_catalog import market_catalog
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -32,32 +32,28 @@ class ChartHandler:
             context.args[1] if len(context.args) > 1 else "4h"
         )  # Set default to 4h if not provided
 
+        # Reject symbols no exchange lists before queueing anything
+        if not market_catalog.is_listed(symbol):
+            update.message.reply_text("Symbol not listed on available exchanges.")
+            return
+
         # Send a Loading message and tag it so we can delete it later
         loading_message = update.message.reply_text(
-            "Generating chart... Please wait.", quote=True
+            "Chart queued... Please wait.", quote=True
         )
 
+        # Rendering happens in the job workers, which send the chart and
+        # delete the loading message when they are done
         try:
-            chart_file = PlotChart.plot_ohlcv_chart(symbol, time_frame)
-        except Exception as e:
-            logger.exception("Error while plotting the OHLCV chart")
-            update.message.reply_text(
-                "Error while plotting the OHLCV chart. Please try again later."
+            enqueue_job(
+                "chart",
+                update.effective_chat.id,
+                progress_message_id=loading_message.message_id,
+                symbol=symbol,
+                time_frame=time_frame,
             )
-            return
-
-        # Send the chart
-        try:
-            with open(chart_file, "rb") as f:
-                context.bot.send_photo(chat_id=update.effective_chat.id, photo=f)
         except Exception as e:
-            logger.exception("Error while sending the chart")
-            update.message.reply_text(
-                "Error while sending the chart. Please try again later."
+            logger.exception("Error while queueing the OHLCV chart")
+            loading_message.edit_text(
+                "Error while plotting the OHLCV chart. Please try again later."
             )
-            return
-
-        # Delete the image file after sending it
-        os.remove(chart_file)
-        # Delete the Loading message
-        loading_message.delete()
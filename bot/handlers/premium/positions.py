@@ -7,21 +7,22 @@
 ### Binance Futures Leaderboard Bot ###
 #######################################
 
-import requests
 import functools
 import time
 from datetime import datetime
 
 from telegram import Update, ParseMode
 from telegram.ext import CallbackContext
-from telegram import ParseMode
 
 from config.settings import X_RAPIDAPI_KEY
+from bot.budget import BudgetExceeded
+from bot.http_client import http_client
 from config.settings import TELEGRAM_API_TOKEN
 from config.settings import LUNARCRUSH_API_KEY
 from bot.utils import restricted
 from bot.database import Session, SummaryData
 from bot.utils import log_command_usage
+from bot.jobs import enqueue_job, job_handler, update_progress, delete_progress
 
 import logging
 
@@ -63,7 +64,8 @@ class PositionsHandler:
             "X-RapidAPI-Host": "binance-futures-leaderboard1.p.rapidapi.com",
         }
 
-        response = requests.get(url, headers=headers, params=querystring)
+        # Raises BudgetExceeded when refused, which is not cached
+        response = http_client.get(url, headers=headers, params=querystring, provider="rapidapi")
         if response.status_code == 200:
             return response.json(), False
         else:
@@ -74,6 +76,24 @@ class PositionsHandler:
     @restricted
     @log_command_usage("positions")
     def trader_positions(update: Update, context: CallbackContext):
+        # Send a Loading message and tag it so we can delete it later
+        loading_message = update.message.reply_text(
+            "Fetching Positions Data From Binance... Please wait.", quote=True
+        )
+
+        # The positions are fetched and aggregated by the job workers, which
+        # send the results and delete the loading message
+        enqueue_job(
+            "positions",
+            update.effective_chat.id,
+            progress_message_id=loading_message.message_id,
+        )
+
+    @staticmethod
+    @job_handler("positions")
+    def send_trader_positions(bot, job):
+        chat_id = job["chat_id"]
+
         # Get the user id
         uid_list = [
             "3AFFCB67ED4F1D1D8437BA17F4E8E5ED",
@@ -111,10 +131,7 @@ class PositionsHandler:
             "49A7275656A7ABF56830126ACC619FEB",
         ]
 
-        # Send a Loading message and tag it so we can delete it later
-        loading_message = update.message.reply_text(
-            "Fetching Positions Data From Binance... Please wait.", quote=True
-        )
+        update_progress(bot, job, "Aggregating trader positions...")
 
         total_short_below_threshold = 0
         total_long_below_threshold = 0
@@ -124,6 +141,15 @@ class PositionsHandler:
         for encrypted_uid in uid_list:
             try:
                 data, is_cached = PositionsHandler.fetch_trader_positions(encrypted_uid)
+            except BudgetExceeded as e:
+                # The other traders would be refused too, and a partial summary is misleading
+                logger.warning(f"Stopped fetching trader positions: {e}")
+                delete_progress(bot, job)
+                bot.send_message(
+                    chat_id=chat_id,
+                    text="Positions data is rate limited right now. Please try again later.",
+                )
+                return
             except Exception as e:
                 logging.error(f"Error processing UID {encrypted_uid}: {str(e)}")
                 continue
@@ -281,11 +307,12 @@ class PositionsHandler:
                         output += f"{i+1}️⃣ {row[0]}\n   💹 Entry: {float(row[1]):.5f}\n   🎯 Mark: {float(row[2]):.5f}\n   💰 PnL: ${pnl:.2f} ({float(row[4]):.2f}%)\n   🧮 Amount: ${amount:.2f}\n   ⚖️ Leverage: {row[6]}\n\n"
 
                     PositionsHandler.position_output_dict[encrypted_uid] = output
-                update.message.reply_text(output, parse_mode=ParseMode.HTML)
+                bot.send_message(chat_id=chat_id, text=output, parse_mode=ParseMode.HTML)
             else:
                 if encrypted_uid in PositionsHandler.position_output_dict:
-                    update.message.reply_text(
-                        PositionsHandler.position_output_dict[encrypted_uid],
+                    bot.send_message(
+                        chat_id=chat_id,
+                        text=PositionsHandler.position_output_dict[encrypted_uid],
                         parse_mode=ParseMode.HTML,
                     )
                 else:
@@ -339,12 +366,10 @@ class PositionsHandler:
         summary += f" Total Longs: {total_long_percent:.2f}%\n"
         summary += f" Total Shorts: {total_short_percent:.2f}%\n"
 
-        update.message.reply_text(summary, parse_mode=ParseMode.HTML)
+        bot.send_message(chat_id=chat_id, text=summary, parse_mode=ParseMode.HTML)
 
         # Delete the loading message from the chat
-        context.bot.delete_message(
-            chat_id=update.message.chat_id, message_id=loading_message.message_id
-        )
+        delete_progress(bot, job)
 
         if not is_cached:
             # Create a new session
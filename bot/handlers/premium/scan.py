@@ -0,0 +1,50 @@
+import json
+import logging
+from telegram import Update
+from telegram.ext import CallbackContext, CommandHandler
+from bot.utils import log_command_usage, restricted
+from bot.scanner import latest_scan
+from config.settings import SCAN_TIMEFRAMES, SCAN_DEFAULT_TIMEFRAME
+
+logger = logging.getLogger(__name__)
+
+
+class ScanHandler:
+    @staticmethod
+    def format_entries(entries):
+        if not entries:
+            return "None\n"
+        return "".join(
+            f"{entry['symbol']}: {entry['score']:+g} (RSI: {entry['rsi']})\n"
+            for entry in entries
+        )
+
+    @staticmethod
+    @restricted
+    @log_command_usage("scan")
+    def scan_handler(update: Update, context: CallbackContext):
+        timeframe = context.args[0] if context.args else SCAN_DEFAULT_TIMEFRAME
+        if timeframe not in SCAN_TIMEFRAMES:
+            update.message.reply_text(
+                f"Scans are available for: {', '.join(SCAN_TIMEFRAMES)}"
+            )
+            return
+
+        # The scan is computed on every candle close, see bot.scanner
+        result = latest_scan(timeframe)
+        if result is None:
+            update.message.reply_text(
+                "The market scan is not ready yet. Please try again in a few minutes."
+            )
+            return
+
+        update.message.reply_text(
+            f"Market scan {timeframe} ({result.symbols} coins, "
+            f"candle of {result.candle_time:%Y-%m-%d %H:%M} UTC)\n\n"
+            f"🟢 Bullish:\n{ScanHandler.format_entries(json.loads(result.bullish))}\n"
+            f"🔴 Bearish:\n{ScanHandler.format_entries(json.loads(result.bearish))}"
+        )
+
+    @staticmethod
+    def command_handler() -> CommandHandler:
+        return CommandHandler("scan", ScanHandler.scan_handler, pass_args=True)
@@ -1,9 +1,8 @@
-import requests
 import logging
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from config.settings import LUNARCRUSH_API_KEY
+from bot.lunarcrush import lunarcrush, LunarCrushError
 from bot.utils import restricted
 from bot.utils import log_command_usage
 
@@ -26,16 +25,17 @@ class SentimentHandler:
             )
 
         # Prepare API parameters
-        api_url = "https://lunarcrush.com/api3/coins/global/top"
-        headers = {"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"}
         params = {"interval": "1w", "order_by": "volume_24h", "limit": 10}
 
-        # Make the API request
-        response = requests.get(api_url, headers=headers, params=params)
+        # Make the API request (cached, see bot.lunarcrush)
+        try:
+            data = lunarcrush.get("coins/global/top", params)
+        except LunarCrushError as e:
+            logger.error(f"Error fetching top coins data: {e}")
+            data = None
 
         # Process the response
-        if response.status_code == 200:
-            data = response.json()
+        if data is not None:
             top_coins = data["top"]
 
             # Format the response message
@@ -60,9 +60,6 @@ class SentimentHandler:
 
 
         else:
-            logger.error(
-                f"Error fetching top coins data. Status code: {response.status_code}"
-            )
             response_message = "An error occurred while fetching the top coins data."
 
         # Send the response message
@@ -1,11 +1,10 @@
 import logging
 import requests
-import os
 from telegram import Update
 from telegram.ext import CallbackContext, CommandHandler
 from bot.utils import log_command_usage, restricted, command_usage_example
 from config.settings import X_RAPIDAPI_KEY
-from bot.utils import PlotChart
+from bot.jobs import enqueue_job
 from bot.handlers.premium.stats import StatsHandler
 
 # Set up logging
@@ -146,22 +145,17 @@ class SignalHandler:
         # If there's a divergence between price and RSI, send a warning message
 
         # Update the loading message
-        loading_message.edit_text("Generating The Chart...")
-
-        # Plot chart
-        chart_file = PlotChart.plot_ohlcv_chart(symbol, timeframe)
-
-        # Update the loading message to indicate that the chart has been generated
-        loading_message.edit_text("Chart generated. Sending chart...")
-
-        # Send chart to user and then delete it
-        if chart_file:
-            with open(chart_file, "rb") as f:
-                context.bot.send_photo(chat_id=update.effective_chat.id, photo=f)
-            os.remove(chart_file)
-
-        # Delete the loading message
-        loading_message.delete()
+        loading_message.edit_text("Chart queued...")
+
+        # The chart is rendered by the job workers, which send it to the user
+        # and then delete the loading message
+        enqueue_job(
+            "chart",
+            update.effective_chat.id,
+            progress_message_id=loading_message.message_id,
+            symbol=symbol,
+            time_frame=timeframe,
+        )
         logger.info("Stats command completed")
 
     @staticmethod
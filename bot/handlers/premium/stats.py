@@ -1,6 +1,4 @@
 import logging
-import requests
-import os
 import sys
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -8,11 +6,17 @@ import matplotlib.ticker as mticker
 import numpy as np
 import pandas as pd
 import ta
-import ccxt
 from datetime import datetime, timedelta
 from telegram import Update
 from telegram.ext import CallbackContext, CommandHandler
-from bot.utils import restricted, log_command_usage, PlotChart, command_usage_example
+from bot.utils import restricted, log_command_usage, command_usage_example
+from bot.jobs import enqueue_job
+from bot.market_data import market_data
+from bot.exchanges import get_exchange
+from bot import indicators
+from bot.singleflight import coalesce
+from bot.budget import BudgetExceeded
+from bot.http_client import http_client
 from config.settings import X_RAPIDAPI_KEY
 from cachetools import cached, TTLCache
 
@@ -27,32 +31,29 @@ logger = logging.getLogger(__name__)
 cache = TTLCache(maxsize=100, ttl=14400)
 
 
-# Fetch ohlcv data using ccxt for the given symbol and timeframe. (cache the result for 4 hours for a given symbol and timeframe)
+# Fetch ohlcv data using ccxt for the given symbol and timeframe. (only new candles are fetched, see bot.market_data)
 class SymbolOHLCVFetcher:
     @staticmethod
-    @cached(cache)
     def fetch_ohlcv_data(symbol: str, timeframe: str):
-        exchange = ccxt.bybit()
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe)
-        df = pd.DataFrame(
-            ohlcv,
-            columns=["timestamp", "open", "high", "low", "close", "volume"],
+        return market_data.frame(
+            get_exchange("bybit"),
+            symbol,
+            timeframe,
+            columns=("timestamp", "open", "high", "low", "close", "volume"),
         )
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-        df.set_index("timestamp", inplace=True)
-        return df
 
 
 class StatsHandler:
     @staticmethod
     @cached(cache)
+    @coalesce(lambda symbol, endpoint, timeframe: ("technical-study", symbol.upper(), endpoint, timeframe))
     def fetch_data(symbol: str, endpoint: str, timeframe: str):
         url = f"https://cryptocurrencies-technical-study.p.rapidapi.com/crypto/{endpoint}/{symbol}/{timeframe}"
         headers = {
             "X-RapidAPI-Key": X_RAPIDAPI_KEY,
             "X-RapidAPI-Host": "cryptocurrencies-technical-study.p.rapidapi.com",
         }
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers, provider="rapidapi")
         return response.json()
 
     @staticmethod
@@ -72,49 +73,27 @@ class StatsHandler:
         update.message.reply_text(patterns_message)
         logger.info("Patterns message sent")
 
+    # Indicators are computed locally from the cached candles, in the shape of the
+    # cryptocurrencies-technical-study API responses (see bot.indicators)
+    @staticmethod
+    def fetch_candles(symbol: str, timeframe: str):
+        return market_data.candles(get_exchange("bybit"), symbol, timeframe)
+
     @staticmethod
     def fetch_rsi_data(symbol: str, indicator: str, timeframe: str):
-        url = f"https://cryptocurrencies-technical-study.p.rapidapi.com/crypto/{indicator}/{symbol}/{timeframe}/14"
-        headers = {
-            "X-RapidAPI-Key": X_RAPIDAPI_KEY,
-            "X-RapidAPI-Host": "cryptocurrencies-technical-study.p.rapidapi.com",
-        }
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        return data
+        return indicators.rsi_data(StatsHandler.fetch_candles(symbol, timeframe), 14)
 
     @staticmethod
     def fetch_obv_data(symbol: str, indicator: str, timeframe: str):
-        url = f"https://cryptocurrencies-technical-study.p.rapidapi.com/crypto/{indicator}/{symbol}/{timeframe}/4"
-        headers = {
-            "X-RapidAPI-Key": X_RAPIDAPI_KEY,
-            "X-RapidAPI-Host": "cryptocurrencies-technical-study.p.rapidapi.com",
-        }
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        return data
+        return indicators.obv_data(StatsHandler.fetch_candles(symbol, timeframe))
 
     @staticmethod
     def fetch_mfi_data(symbol: str, indicator: str, timeframe: str):
-        url = f"https://cryptocurrencies-technical-study.p.rapidapi.com/crypto/{indicator}/{symbol}/{timeframe}/14"
-        headers = {
-            "X-RapidAPI-Key": X_RAPIDAPI_KEY,
-            "X-RapidAPI-Host": "cryptocurrencies-technical-study.p.rapidapi.com",
-        }
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        return data
+        return indicators.mfi_data(StatsHandler.fetch_candles(symbol, timeframe), 14)
 
     @staticmethod
     def fetch_macd_data(symbol: str, indicator: str, timeframe: str):
-        url = f"https://cryptocurrencies-technical-study.p.rapidapi.com/crypto/{indicator}/{symbol}/{timeframe}/5/8/3"
-        headers = {
-            "X-RapidAPI-Key": X_RAPIDAPI_KEY,
-            "X-RapidAPI-Host": "cryptocurrencies-technical-study.p.rapidapi.com",
-        }
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        return data
+        return indicators.macd_data(StatsHandler.fetch_candles(symbol, timeframe), 5, 8, 3)
 
     @staticmethod
     def check_rsi_divergence(symbol: str, timeframe: str, ohlcv_data: pd.DataFrame):
@@ -195,8 +174,12 @@ class StatsHandler:
         # Fetch OHLCV data and save it for quick access
         ohlcv_data = SymbolOHLCVFetcher.fetch_ohlcv_data(symbol, timeframe)
 
-        # Fetch pattern data
-        pattern_data = StatsHandler.fetch_data(symbol, "patterns", timeframe)
+        # Fetch pattern data (skipped when the RapidAPI budget is used up)
+        try:
+            pattern_data = StatsHandler.fetch_data(symbol, "patterns", timeframe)
+        except BudgetExceeded as e:
+            logger.warning(f"Skipping the {symbol} patterns: {e}")
+            pattern_data = {}
         patterns = StatsHandler.filter_patterns(pattern_data)
         patterns_message = StatsHandler.generate_patterns_message(symbol, patterns)
 
@@ -295,21 +278,16 @@ class StatsHandler:
         update.message.reply_text(f"{macd_status}")
 
         # Update the loading message to indicate that the chart is being generated
-        loading_message.edit_text("Generating chart...")
-        # Plot chart
-        chart_file = PlotChart.plot_ohlcv_chart(symbol, timeframe)
-
-        # Update the loading message to indicate that the chart has been generated
-        loading_message.edit_text("Sending chart...")
-
-        # Send chart to user and then delete it
-        if chart_file:
-            with open(chart_file, "rb") as f:
-                context.bot.send_photo(chat_id=update.effective_chat.id, photo=f)
-            os.remove(chart_file)
-
-        # Delete the loading message
-        loading_message.delete()
+        loading_message.edit_text("Chart queued...")
+        # The chart is rendered by the job workers, which send it to the user
+        # and then delete the loading message
+        enqueue_job(
+            "chart",
+            update.effective_chat.id,
+            progress_message_id=loading_message.message_id,
+            symbol=symbol,
+            time_frame=timeframe,
+        )
         logger.info("Stats command completed")
 
     @staticmethod
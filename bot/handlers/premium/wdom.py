@@ -1,8 +1,7 @@
-import requests
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from config.settings import LUNARCRUSH_API_KEY
+from bot.lunarcrush import lunarcrush, generated
 from bot.utils import restricted
 from bot.utils import log_command_usage
 import logging
@@ -17,22 +16,17 @@ class WdomHandler:
     """
 
     @staticmethod
-    def fetch_weekly_dom_change(url, key, headers):
+    def fetch_weekly_dom_change(endpoint, key):
         """
-        Fetch weekly dominance change data from LunarCrush API.
+        Fetch weekly dominance change data from LunarCrush API (cached, see bot.lunarcrush).
 
-        :param url: URL for the API request
+        :param endpoint: API endpoint path
         :param key: Key to access the required data from API response
-        :param headers: Headers for the API request
         :return: Weekly dominance change data or None if an error occurs
         """
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            if data['config']['generated']:
-                return data[key]
+            data = lunarcrush.get(endpoint, validate=generated)
+            return data[key]
 
         except Exception as e:
             logger.error(f"Error fetching weekly dominance change: {e}")
@@ -49,10 +43,8 @@ class WdomHandler:
         :param context: Context for the callback
         """
         try:
-            # Define the URL and headers for fetching the weekly dominance change data
-            coins_url = "https://lunarcrush.com/api3/coins/global/change"
-            headers = {"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"}
-            dom_data = WdomHandler.fetch_weekly_dom_change(coins_url, 'data', headers)
+            # Fetch the weekly dominance change data
+            dom_data = WdomHandler.fetch_weekly_dom_change("coins/global/change", 'data')
 
             # Retrieve only the required fields
             dom = [{
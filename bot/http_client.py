@@ -0,0 +1,175 @@
+import collections
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bot.budget import api_budget
+from config.settings import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRIES,
+    HTTP_BACKOFF,
+    HTTP_POOL_SIZE,
+    HTTP_MAX_RETRY_AFTER,
+)
+
+logger = logging.getLogger(__name__)
+
+# Only these are retried, repeating them has no side effects
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Responses worth another try: rate limited or a transient server error
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def retry_after(response):
+    """Seconds the Retry-After header of a response asks to wait, None without a usable one."""
+    try:
+        return max(float(response.headers["Retry-After"]), 0.0)
+    except (KeyError, ValueError):
+        # Missing, or an HTTP date
+        return None
+
+
+class HostStats:
+    """Request metrics of one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = collections.Counter()
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def record(self, duration, status=None, retry=False):
+        self.requests += 1
+        self.retries += retry
+        if status is None:
+            self.errors += 1
+        else:
+            self.statuses[status] += 1
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "statuses": dict(self.statuses),
+            "average_duration": self.total_duration / self.requests if self.requests else 0.0,
+            "max_duration": self.max_duration,
+        }
+
+
+class HttpClient:
+    """
+    Shared HTTP client of the provider APIs.
+
+    One requests session keeps a pool of keep-alive connections per host,
+    shared by all threads. Every request gets the default (connect, read)
+    timeouts unless it passes its own, so a hung provider can't block a
+    worker. Idempotent requests are retried on connection errors, timeouts
+    and 429/5xx responses, with exponential backoff plus random jitter, or
+    after the Retry-After the provider asks for; a response asking for more
+    than `max_retry_after` seconds is returned as is instead. The response
+    of the last attempt is returned, callers check its status as before.
+
+    Requests to a metered provider (`provider`) are charged to the API
+    budget (see bot.budget) on every attempt, retries included, and raise
+    BudgetExceeded when it refuses one. Every attempt is recorded in
+    per-host metrics.
+    """
+
+    def __init__(self, timeout=(5, 20), retries=2, backoff=0.5, pool_size=16, max_retry_after=5):
+        """
+        :param timeout: Default (connect, read) timeouts in seconds
+        :param retries: Retries of an idempotent request
+        :param backoff: Backoff factor in seconds: retries wait backoff * 2^n,
+            plus up to `backoff` seconds of jitter
+        :param pool_size: Connections kept alive per host
+        :param max_retry_after: Longest Retry-After in seconds worth waiting for
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.session = requests.Session()
+        # Retries are made here, so they can be charged to the budget
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats = collections.defaultdict(HostStats)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, provider=None, **kwargs):
+        """
+        Send a request through the shared session (see requests.request).
+
+        :param provider: API budget provider the request is charged to, e.g. "rapidapi"
+        :raises requests.exceptions.RequestException: When every attempt failed
+        :raises bot.budget.BudgetExceeded: When the budget refuses an attempt
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+        for attempt in range(retries + 1):
+            if provider is not None:
+                # Every attempt may be billed, so every attempt is charged
+                api_budget.spend(provider)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                duration = time.perf_counter() - started
+                self._record(host, duration, retry=attempt > 0)
+                if attempt == retries:
+                    logger.warning(f"{method} {host} failed after {attempt + 1} attempts: {e}")
+                    raise
+                logger.info(f"{method} {host} failed in {duration:.2f}s, retrying: {e}")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            duration = time.perf_counter() - started
+            self._record(host, duration, response.status_code, retry=attempt > 0)
+            logger.debug(f"{method} {host} -> {response.status_code} in {duration:.2f}s")
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            wait = retry_after(response)
+            if "Retry-After" in response.headers and (wait is None or wait > self.max_retry_after):
+                # Asked to come back later than a waiting user or worker can
+                return response
+            response.close()
+            logger.info(f"{method} {host} -> {response.status_code}, retrying")
+            time.sleep(self._backoff(attempt) if wait is None else wait)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def _backoff(self, attempt):
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+    def _record(self, host, duration, status=None, retry=False):
+        with self._lock:
+            self._stats[host].record(duration, status, retry)
+
+    def metrics(self):
+        """Request metrics by host: counts, errors, retries, statuses and durations."""
+        with self._lock:
+            return {host: stats.snapshot() for host, stats in self._stats.items()}
+
+
+# Shared by every handler and job of the process
+http_client = HttpClient(
+    timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    retries=HTTP_RETRIES,
+    backoff=HTTP_BACKOFF,
+    pool_size=HTTP_POOL_SIZE,
+    max_retry_after=HTTP_MAX_RETRY_AFTER,
+)
@@ -0,0 +1,144 @@
+# Technical indicators computed locally from OHLCV candles.
+#
+# Window sums use prefix sums (sequential np.cumsum) and the recursive
+# averages (Wilder's RMA, EMA) are updated one step at a time, so the results
+# are exactly those of updating the indicators candle by candle.
+# Every function returns an array aligned with its input, NaN during warm-up.
+
+import numpy as np
+
+from bot.market_data import CLOSE, HIGH, LOW, VOLUME
+
+
+def prefix_sums(values):
+    """Running totals with a leading 0: window sum [i, j) is sums[j] - sums[i]."""
+    return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+
+
+def window_sums(values, period):
+    """Sums of the `period` values ending at each index (NaN before the first full window)."""
+    sums = prefix_sums(values)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = sums[period:] - sums[:-period]
+    return out
+
+
+def sma(values, period):
+    return window_sums(values, period) / period
+
+
+def ema(values, period, alpha=None):
+    """
+    Exponential moving average seeded with the SMA of the first `period` values.
+
+    The recursion stays a loop on purpose: the closed form (or a filter with
+    powers of 1 - alpha) rounds differently, and these values must match the
+    candle-by-candle updates of bot.streaming_indicators exactly. It runs on
+    Python floats, which round like float64 and avoid numpy scalar overhead.
+
+    :param alpha: Smoothing factor, 2 / (period + 1) by default
+    """
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2.0 / (period + 1) if alpha is None else alpha
+    out = np.full(len(values), np.nan)
+    # Skip the leading NaNs of inputs that are themselves averages
+    start = int(np.argmax(~np.isnan(values))) if len(values) else 0
+    if len(values) - start < period:
+        return out
+    average = float(prefix_sums(values[start:start + period])[-1]) / period
+    out[start + period - 1] = average
+    averages = []
+    for value in values[start + period:].tolist():
+        average = average + alpha * (value - average)
+        averages.append(average)
+    out[start + period:] = averages
+    return out
+
+
+def rma(values, period):
+    """Wilder's moving average (an EMA with alpha = 1 / period)."""
+    return ema(values, period, alpha=1.0 / period)
+
+
+def rsi(close, period=14):
+    """Wilder's relative strength index."""
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    change = np.diff(close)
+    avg_gain = rma(np.where(change > 0, change, 0.0), period)
+    avg_loss = rma(np.where(change < 0, -change, 0.0), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = np.where(
+            avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        )
+    out[1:][np.isnan(avg_gain)] = np.nan
+    return out
+
+
+def obv(close, volume):
+    """On-balance volume, starting at 0 on the first candle."""
+    close = np.asarray(close, dtype=np.float64)
+    direction = np.sign(np.diff(close, prepend=close[:1]))
+    return np.cumsum(direction * np.asarray(volume, dtype=np.float64))
+
+
+def mfi(high, low, close, volume, period=14):
+    """Money flow index."""
+    typical = (np.asarray(high) + np.asarray(low) + np.asarray(close)) / 3.0
+    flow = typical * np.asarray(volume, dtype=np.float64)
+    direction = np.sign(np.diff(typical, prepend=typical[:1]))
+    positive = window_sums(np.where(direction > 0, flow, 0.0), period)
+    negative = window_sums(np.where(direction < 0, flow, 0.0), period)
+    # The first candle has no direction, so its window is not complete
+    if len(typical) >= period:
+        positive[period - 1] = negative[period - 1] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(negative == 0, 100.0, 100.0 - 100.0 / (1.0 + positive / negative))
+    out[np.isnan(positive)] = np.nan
+    return out
+
+
+def macd(close, fast=5, slow=8, signal=3):
+    """Returns (macd, signal, histogram)."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def defined(values):
+    """Values after the warm-up, as a list of floats."""
+    return [float(value) for value in values[~np.isnan(values)]]
+
+
+# Indicator results in the shape of the cryptocurrencies-technical-study API
+# responses the handlers used to read, from a candle array (see bot.market_data)
+
+
+def rsi_data(candles, period=14):
+    return {"rsi": defined(rsi(candles[:, CLOSE], period))}
+
+
+def obv_data(candles):
+    return {"obv": defined(obv(candles[:, CLOSE], candles[:, VOLUME]))}
+
+
+def mfi_data(candles, period=14):
+    return {
+        "mfi": defined(
+            mfi(candles[:, HIGH], candles[:, LOW], candles[:, CLOSE], candles[:, VOLUME], period)
+        )
+    }
+
+
+def macd_data(candles, fast=5, slow=8, signal=3):
+    line, signal_line, histogram = macd(candles[:, CLOSE], fast, slow, signal)
+    valid = ~np.isnan(histogram)
+    return {
+        "macd": [
+            {"macd": float(m), "signal": float(s), "histogram": float(h)}
+            for m, s, h in zip(line[valid], signal_line[valid], histogram[valid])
+        ]
+    }
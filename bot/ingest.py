@@ -0,0 +1,233 @@
+import collections
+import logging
+import threading
+import time
+
+from telegram import Update
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from bot.lanes import LANES, classify_update
+from bot.queues import QueueError
+from bot.webhook import WebhookServer
+from bot.wire import encode_update
+
+logger = logging.getLogger(__name__)
+
+# An update ready to be published: its id, the lane it is routed to, the
+# serialized body and its wire format (see bot.wire)
+OutgoingUpdate = collections.namedtuple(
+    "OutgoingUpdate",
+    ["update_id", "lane", "body", "content_type", "content_encoding"],
+)
+
+
+class UpdateBuffer:
+    """
+    Bounded, thread-safe FIFO of updates waiting to be published.
+
+    Producers block while the buffer is full, which stops the ingest side
+    from taking more updates from Telegram than it can hold. Updates that
+    could not be published are put back at the front, in their original
+    order, so a short broker outage neither loses nor reorders them.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = collections.deque()
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+    def put(self, item, timeout=None):
+        """Add an item, waiting for room. Returns False if the wait timed out."""
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: len(self._items) < self.maxsize, timeout
+            ):
+                return False
+            self._items.append(item)
+            self._condition.notify_all()
+            return True
+
+    def take(self, max_items, timeout=None):
+        """Remove and return up to max_items items, waiting for at least one."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._items, timeout)
+            batch = []
+            while self._items and len(batch) < max_items:
+                batch.append(self._items.popleft())
+            if batch:
+                self._condition.notify_all()
+            return batch
+
+    def requeue(self, items):
+        """Put unpublished items back at the front of the buffer."""
+        with self._condition:
+            self._items.extendleft(reversed(items))
+            self._condition.notify_all()
+
+
+class UpdatePublisher(threading.Thread):
+    """
+    Publishes buffered updates to the queue backend in batches.
+
+    Every update is published with its update_id as message id and is only
+    dropped from the buffer once the backend has accepted it (for RabbitMQ:
+    confirmed it). When publishing fails, the rest of the batch goes back to
+    the buffer and is retried with exponential backoff. Anything republished
+    after a lost confirm carries the same message id, so the consumer can
+    drop the duplicate.
+    """
+
+    def __init__(self, backend, buffer, batch_size=100, max_backoff=30):
+        super().__init__(name="update-publisher", daemon=True)
+        self.backend = backend
+        self.buffer = buffer
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._stopping = threading.Event()
+
+    def stop(self, timeout=None):
+        """Publish what is left in the buffer, then stop."""
+        self._stopping.set()
+        self.join(timeout)
+
+    def publish_batch(self, batch):
+        """Publish a batch; returns the number of updates the backend accepted."""
+        for published, item in enumerate(batch):
+            try:
+                self.backend.publish(
+                    item.lane,
+                    item.body,
+                    message_id=str(item.update_id),
+                    content_type=item.content_type,
+                    content_encoding=item.content_encoding,
+                )
+            except QueueError as err:
+                logger.error(f"Could not publish update {item.update_id}: {err}")
+                return published
+        return len(batch)
+
+    def run(self):
+        for lane in LANES:
+            self.declare(lane)
+        backoff = 1
+        while True:
+            batch = self.buffer.take(self.batch_size, timeout=1)
+            if not batch:
+                if self._stopping.is_set():
+                    break
+                self.backend.keepalive()
+                continue
+
+            published = self.publish_batch(batch)
+            logger.info(
+                f"Published {published} updates ({len(self.buffer)} waiting)"
+            )
+            if published < len(batch):
+                self.buffer.requeue(batch[published:])
+                logger.error(f"Retrying in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            else:
+                backoff = 1
+
+    def declare(self, queue):
+        # The broker may not be reachable yet, the backend declares the queue
+        # again when it connects
+        try:
+            self.backend.declare(queue)
+        except QueueError as err:
+            logger.error(f"Could not declare {queue}: {err}")
+
+
+class UpdateIngest:
+    """
+    Receives updates from Telegram and hands them to an UpdatePublisher.
+
+    Updates are long polled in batches (`poll`) or received by a webhook HTTP
+    server (`serve_webhook`) that can run as several replicas. Every update
+    type is forwarded, routed to a lane by subscriber tier and command cost.
+    """
+
+    def __init__(self, bot, backend, buffer_size=1000, batch_size=100):
+        self.bot = bot
+        self.buffer = UpdateBuffer(buffer_size)
+        self.publisher = UpdatePublisher(backend, self.buffer, batch_size=batch_size)
+        self._stopping = threading.Event()
+
+    def handle_update(self, update_dict, timeout=None):
+        """Buffer an update for publishing. Returns False if the wait timed out."""
+        # Compact wire format: only the fields the handlers use, optionally compressed
+        body, content_type, content_encoding = encode_update(update_dict)
+        lane = classify_update(update_dict)
+        # Waits while the buffer is full, so polling pauses and Telegram keeps
+        # the remaining updates until the queue is back
+        return self.buffer.put(
+            OutgoingUpdate(
+                update_dict["update_id"], lane, body, content_type, content_encoding
+            ),
+            timeout,
+        )
+
+    def poll(self, poll_timeout=50):
+        """Long poll updates until stop() is called."""
+        # getUpdates does not work while a webhook is set
+        self.bot.delete_webhook()
+        offset = None
+        while not self._stopping.is_set():
+            try:
+                # Passing the offset confirms every earlier update to Telegram;
+                # they are all in the buffer by then
+                updates = self.bot.get_updates(
+                    offset=offset, timeout=poll_timeout, allowed_updates=Update.ALL_TYPES
+                )
+            except RetryAfter as err:
+                time.sleep(err.retry_after)
+                continue
+            except (NetworkError, TimedOut) as err:
+                logger.error(f"Could not get updates from Telegram: {err}")
+                time.sleep(1)
+                continue
+
+            for update in updates:
+                offset = update.update_id + 1
+                logger.info(f"Received update: {update.update_id}")
+                self.handle_update(update.to_dict())
+
+    def serve_webhook(self, port, webhook_url=None, secret_token=None, webhook_path="/telegram"):
+        """Serve the webhook endpoint until the process exits."""
+        if webhook_url:
+            # Every replica registers the same URL, so this is safe to repeat
+            self.bot.set_webhook(
+                url=webhook_url + webhook_path,
+                allowed_updates=Update.ALL_TYPES,
+                api_kwargs={"secret_token": secret_token},
+            )
+
+        # Answer 503 instead of holding the request when the buffer stays full,
+        # Telegram will deliver the update again later
+        server = WebhookServer(
+            ("0.0.0.0", port),
+            lambda update_dict: self.handle_update(update_dict, timeout=5),
+            secret_token=secret_token,
+            webhook_path=webhook_path,
+        )
+        logger.info(f"Webhook server listening on port {port}")
+        server.serve_forever()
+
+    def run(self, mode="polling", **kwargs):
+        """Start publishing and receive updates in the given ingest mode."""
+        self.publisher.start()
+        logger.info(f"Listening for updates ({mode})...")
+        if mode == "webhook":
+            self.serve_webhook(**kwargs)
+        else:
+            self.poll(**kwargs)
+
+    def stop(self, timeout=None):
+        """Stop polling and publish the buffered updates."""
+        self._stopping.set()
+        self.publisher.stop(timeout)
@@ -0,0 +1,159 @@
+import json
+import logging
+import threading
+import time
+
+from bot.budget import current_priority, request_priority, BACKGROUND
+from bot.queues import QueueError, create_backend
+from bot.workers import ChatWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Queue for chart rendering and analytics jobs, consumed by tg_job_worker.py
+# (or by the consumer itself with an in-process queue backend)
+JOB_QUEUE = "jobs"
+
+# Registered job handlers by job kind
+job_handlers = {}
+
+
+def job_handler(kind):
+    """
+    Register a function as the handler of a job kind.
+
+    The handler is called on a job worker with the bot and the job
+    dict: {"kind", "chat_id", "progress_message_id", "priority", "params"}.
+    """
+
+    def decorator(func):
+        job_handlers[kind] = func
+        return func
+
+    return decorator
+
+
+def run_job(bot, job):
+    handler = job_handlers.get(job["kind"])
+    if handler is None:
+        raise ValueError(f"Unknown job kind: {job['kind']}")
+    return handler(bot, job)
+
+
+def update_progress(bot, job, text):
+    """Edit the job's progress message in place, if it has one."""
+    if job.get("progress_message_id") is None:
+        return
+    try:
+        bot.edit_message_text(
+            text, chat_id=job["chat_id"], message_id=job["progress_message_id"]
+        )
+    except Exception as e:
+        logger.warning(f"Could not update progress message: {e}")
+
+
+def delete_progress(bot, job):
+    if job.get("progress_message_id") is None:
+        return
+    try:
+        bot.delete_message(
+            chat_id=job["chat_id"], message_id=job["progress_message_id"]
+        )
+    except Exception as e:
+        logger.warning(f"Could not delete progress message: {e}")
+
+
+class JobPublisher:
+    """
+    Publishes jobs to the job queue from any thread.
+
+    The queue backend is created on first use, so importing the handlers
+    does not open a broker connection. A failed publish is retried once,
+    the RabbitMQ backend reconnects in between.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = create_backend()
+                self._backend.declare(JOB_QUEUE)
+            return self._backend
+
+    def publish(self, job):
+        body = json.dumps(job).encode("utf-8")
+        try:
+            self.backend.publish(JOB_QUEUE, body, content_type="application/json")
+        except QueueError as e:
+            logger.warning(f"Could not enqueue job, retrying: {e}")
+            self.backend.publish(JOB_QUEUE, body, content_type="application/json")
+        logger.info(f"Enqueued {job['kind']} job for chat {job['chat_id']}")
+
+
+job_publisher = JobPublisher()
+
+
+def enqueue_job(kind, chat_id, progress_message_id=None, **params):
+    """
+    Hand a heavy job over to the job workers.
+
+    :param kind: Registered job kind, e.g. "chart"
+    :param chat_id: Chat the result is sent to
+    :param progress_message_id: Message the worker edits to report progress
+        and deletes when the result has been sent
+    :param params: JSON-serializable job parameters
+    """
+    job_publisher.publish(
+        {
+            "kind": kind,
+            "chat_id": chat_id,
+            "progress_message_id": progress_message_id,
+            # Budget priority of the update that queued the job (see bot.budget)
+            "priority": current_priority(),
+            "params": params,
+        }
+    )
+
+
+def consume_jobs(backend, bot, workers=1):
+    """
+    Run the jobs of the job queue on a pool of worker threads.
+
+    Consumes at most `workers` jobs at a time. Jobs are not retried, a failed
+    render would only fail again; the user is told through the progress
+    message instead.
+
+    :return: The started ChatWorkerPool, to stop on shutdown
+    """
+
+    def execute(job):
+        started = time.perf_counter()
+        try:
+            with request_priority(job.get("priority", BACKGROUND)):
+                run_job(bot, job)
+            logger.info(
+                f"Finished {job['kind']} job in {time.perf_counter() - started:.2f}s"
+            )
+        except Exception:
+            logger.exception(f"Error while running {job.get('kind')} job")
+            update_progress(bot, job, "Something went wrong. Please try again later.")
+
+    pool = ChatWorkerPool(workers, execute, name="job-worker")
+
+    def on_message(delivery):
+        try:
+            job = json.loads(delivery.body.decode("utf-8"))
+        except ValueError as e:
+            logger.error(f"Could not decode job: {e}")
+            backend.settle(delivery)
+            return
+        pool.submit(
+            job.get("chat_id"), job, lambda job, error: backend.settle(delivery)
+        )
+
+    backend.consume(JOB_QUEUE, on_message, prefetch=workers)
+    pool.start()
+    return pool
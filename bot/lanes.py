@@ -0,0 +1,115 @@
+import logging
+import threading
+
+from cachetools import TTLCache
+
+from config.settings import (
+    PREMIUM_LANE_WEIGHT,
+    INTERACTIVE_LANE_WEIGHT,
+    BULK_LANE_WEIGHT,
+)
+from users.management import check_user_access
+
+logger = logging.getLogger(__name__)
+
+# Queues ("lanes") updates are routed to, by subscriber tier and command cost.
+# The interactive lane keeps the original queue name so that updates that
+# were published before the lanes existed are still consumed.
+#
+# Updates of one chat can land in different lanes (a free user's /chart in
+# the bulk lane, their /help in the interactive one), and every lane is
+# consumed at its own pace, so they are not delivered in chat order: a later
+# /help can run before an earlier /chart. Per-chat order only holds between
+# updates that reached the same consumer (see bot.workers.ChatWorkerPool).
+# Premium and payment updates all share the premium lane, so a subscriber's
+# updates keep their order.
+PREMIUM_LANE = "telegram.premium"
+INTERACTIVE_LANE = "telegram"
+BULK_LANE = "telegram.bulk"
+
+# Lanes in priority order, with their share of the consumer's capacity
+LANE_WEIGHTS = {
+    PREMIUM_LANE: PREMIUM_LANE_WEIGHT,
+    INTERACTIVE_LANE: INTERACTIVE_LANE_WEIGHT,
+    BULK_LANE: BULK_LANE_WEIGHT,
+}
+LANES = tuple(LANE_WEIGHTS)
+
+# Commands that render charts or fan out to many provider calls
+EXPENSIVE_COMMANDS = {
+    "gainers",
+    "losers",
+    "chart",
+    "stats",
+    "signal",
+    "positions",
+    "cotd",
+    "info",
+}
+
+# Subscriber tier lookups are cached so routing does not hit the database
+# for every update
+tier_cache = TTLCache(maxsize=10000, ttl=300)
+tier_cache_lock = threading.Lock()
+
+
+def command_name(update_dict):
+    """Return the bot command of an update ("chart" for "/chart@bot BTCUSDT"), or None."""
+    message = update_dict.get("message") or update_dict.get("edited_message") or {}
+    text = message.get("text") or ""
+    if not text.startswith("/"):
+        return None
+    return text.split()[0][1:].split("@")[0].lower()
+
+
+def is_premium_user(user_id):
+    with tier_cache_lock:
+        premium = tier_cache.get(user_id)
+    if premium is None:
+        try:
+            premium = bool(check_user_access(user_id))
+        except Exception:
+            logger.exception(f"Could not look up the subscription of user {user_id}")
+            return False
+        with tier_cache_lock:
+            tier_cache[user_id] = premium
+    return premium
+
+
+def update_user_id(update_dict):
+    for key in ("message", "edited_message", "callback_query", "pre_checkout_query",
+                "shipping_query", "inline_query", "chosen_inline_result"):
+        if update_dict.get(key):
+            return (update_dict[key].get("from") or {}).get("id")
+    return None
+
+
+def classify_update(update_dict):
+    """
+    Pick the lane for a serialized update.
+
+    Payment flows and everything sent by subscribers go to the premium lane.
+    Free users' chart and analytics commands go to the bulk lane, so a burst
+    of them cannot delay the cheap commands in the interactive lane.
+    """
+    if update_dict.get("pre_checkout_query") or update_dict.get("callback_query"):
+        return PREMIUM_LANE
+
+    user_id = update_user_id(update_dict)
+    if user_id is not None and is_premium_user(user_id):
+        return PREMIUM_LANE
+
+    if command_name(update_dict) in EXPENSIVE_COMMANDS:
+        return BULK_LANE
+    return INTERACTIVE_LANE
+
+
+def lane_priority(lane):
+    """Priority of a lane for local scheduling (lower runs first)."""
+    return LANES.index(lane) if lane in LANE_WEIGHTS else len(LANES)
+
+
+def lane_prefetch(lane, prefetch):
+    """Share of the consumer prefetch given to a lane, by weight."""
+    total = sum(LANE_WEIGHTS.values())
+    return max(1, round(prefetch * LANE_WEIGHTS[lane] / total))
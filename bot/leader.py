@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(name):
+    """Stable signed 64-bit advisory lock key for a lease name."""
+    digest = hashlib.sha1(name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class LeaderLease:
+    """
+    Leader election among the consumer replicas with a Postgres advisory lock.
+
+    The replica holding the session-level lock `lock_key(name)` is the leader.
+    The lock lives on a dedicated connection: when the leader exits or its
+    connection breaks, Postgres releases the lock and the next replica that
+    calls `refresh()` takes over. Followers keep trying on every refresh.
+
+    Databases other than Postgres have no advisory locks; the process is then
+    always the leader, which is only right for a single replica.
+    """
+
+    def __init__(self, engine, name="periodic-jobs"):
+        self.engine = engine
+        self.name = name
+        self.key = lock_key(name)
+        self.is_leader = False
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except SQLAlchemyError:
+                pass  # Ignore errors when closing a broken connection
+        self._connection = None
+
+    def refresh(self):
+        """Check that the lease is still held, or try to take it. Returns is_leader."""
+        with self._lock:
+            was_leader = self.is_leader
+            if self.engine.dialect.name != "postgresql":
+                self.is_leader = True
+            else:
+                try:
+                    if self._connection is None:
+                        # Autocommit, so the connection never sits idle in a transaction
+                        self._connection = self.engine.connect().execution_options(
+                            isolation_level="AUTOCOMMIT"
+                        )
+                    if self.is_leader:
+                        # The lock is held as long as the session is alive
+                        self._connection.execute(text("SELECT 1"))
+                    else:
+                        self.is_leader = bool(
+                            self._connection.execute(
+                                text("SELECT pg_try_advisory_lock(:key)"),
+                                {"key": self.key},
+                            ).scalar()
+                        )
+                except SQLAlchemyError as e:
+                    logger.error(f"Lost the {self.name} lease connection: {e}")
+                    self._close()
+                    self.is_leader = False
+
+            if self.is_leader and not was_leader:
+                logger.info(f"Became the leader for {self.name}")
+            elif was_leader and not self.is_leader:
+                logger.warning(f"No longer the leader for {self.name}")
+            return self.is_leader
+
+    def release(self):
+        """Give up the lease so another replica can take over right away."""
+        with self._lock:
+            if self.is_leader and self._connection is not None:
+                try:
+                    self._connection.execute(
+                        text("SELECT pg_advisory_unlock(:key)"), {"key": self.key}
+                    )
+                except SQLAlchemyError as e:
+                    logger.warning(f"Could not release the {self.name} lease: {e}")
+            self.is_leader = False
+            self._close()
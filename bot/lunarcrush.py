@@ -0,0 +1,160 @@
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from cachetools import LRUCache
+
+from bot.budget import BudgetExceeded
+from bot.http_client import http_client
+from bot.singleflight import flights
+from config.settings import (
+    LUNARCRUSH_API_KEY,
+    LUNARCRUSH_CACHE_SIZE,
+    LUNARCRUSH_MAX_STALE,
+    LUNARCRUSH_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://lunarcrush.com/api3/"
+
+# Seconds a response is fresh, per endpoint (DEFAULT_TTL for the others,
+# e.g. coins/{id})
+ENDPOINT_TTLS = {
+    "coinoftheday": 3600,
+    "coins/global/top": 900,
+    "coins/global/change": 3600,
+    "whatsup": 600,
+}
+DEFAULT_TTL = 300
+
+# A cached response and the time.monotonic() it was fetched at
+Entry = collections.namedtuple("Entry", ["data", "fetched_at"])
+
+
+class LunarCrushError(Exception):
+    """The API could not be reached or returned an unusable response, and nothing is cached."""
+
+
+def generated(data):
+    """Validator of the endpoints that flag complete responses with config.generated."""
+    return bool((data.get("config") or {}).get("generated"))
+
+
+class LunarCrushClient:
+    """
+    LunarCrush API client with a shared stale-while-revalidate cache.
+
+    Responses are cached per endpoint and parameters. A fresh response (see
+    ENDPOINT_TTLS) is returned as is. An expired one is still returned right
+    away while a background thread refetches it, unless it is older than
+    `max_stale` seconds; then the caller waits for the fetch. Concurrent
+    fetches of a request are coalesced into one call (see bot.singleflight).
+    When a fetch fails the last good response is kept and returned, however
+    old it is, so commands keep answering through an API outage and the
+    daily credits are only spent once per TTL. Calls are accounted for in
+    the shared API budget (see bot.budget); a refused call counts as a
+    failure.
+    """
+
+    def __init__(self, api_key, timeout=10, max_stale=86400, max_entries=256):
+        """
+        :param api_key: LunarCrush API key
+        :param timeout: Request timeout in seconds
+        :param max_stale: Seconds past which an expired response is refetched
+            before answering instead of in the background
+        :param max_entries: Number of cached responses
+        """
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_stale = max_stale
+        self._entries = LRUCache(maxsize=max_entries)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lunarcrush")
+
+    def get(self, endpoint, params=None, validate=None):
+        """
+        Return the JSON response of an endpoint, from the cache when possible.
+
+        :param endpoint: Path under API_URL, e.g. "coins/global/top"
+        :param params: Query parameters
+        :param validate: Callable telling whether a response is complete;
+            incomplete ones are treated as failures and not cached
+        :raises LunarCrushError: When the fetch fails and nothing is cached
+        """
+        key = (endpoint, tuple(sorted((params or {}).items())))
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL):
+                return entry.data
+            if age < self.max_stale:
+                self._refresh_later(key, endpoint, params, validate)
+                return entry.data
+
+        try:
+            return self._refresh(key, endpoint, params, validate)
+        except LunarCrushError:
+            if entry is None:
+                raise
+            logger.warning(f"Serving the last good {endpoint} response")
+            return entry.data
+
+    def _refresh_later(self, key, endpoint, params, validate):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._refresh(key, endpoint, params, validate)
+            except LunarCrushError:
+                pass  # Logged by _fetch, the stale response stays cached
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def _refresh(self, key, endpoint, params, validate):
+        data = flights.do(("lunarcrush",) + key, self._fetch, endpoint, params, validate)
+        with self._lock:
+            self._entries[key] = Entry(data, time.monotonic())
+        return data
+
+    def _fetch(self, endpoint, params, validate):
+        try:
+            # Every call costs a credit, background refreshes are refused first
+            response = http_client.get(
+                API_URL + endpoint,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                params=params,
+                timeout=self.timeout,
+                provider="lunarcrush",
+            )
+            response.raise_for_status()
+            data = response.json()
+        except BudgetExceeded as e:
+            raise LunarCrushError(str(e)) from e
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error fetching {endpoint} from LunarCrush: {e}")
+            raise LunarCrushError(str(e)) from e
+        if not isinstance(data, dict) or (validate is not None and not validate(data)):
+            logger.error(f"Incomplete {endpoint} response from LunarCrush: {data}")
+            raise LunarCrushError(f"Incomplete {endpoint} response")
+        return data
+
+
+# Shared by every handler and job of the process
+lunarcrush = LunarCrushClient(
+    LUNARCRUSH_API_KEY,
+    timeout=LUNARCRUSH_TIMEOUT,
+    max_stale=LUNARCRUSH_MAX_STALE,
+    max_entries=LUNARCRUSH_CACHE_SIZE,
+)
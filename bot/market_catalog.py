@@ -0,0 +1,183 @@
+import collections
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import ccxt
+
+from bot.exchanges import get_exchange
+from config.settings import (
+    MARKET_CATALOG_PATH,
+    MARKET_CATALOG_EXCHANGES,
+    MARKET_CATALOG_MAX_AGE,
+    MARKET_CATALOG_MAX_STALE,
+)
+
+logger = logging.getLogger(__name__)
+
+# A market of an exchange: the exchange id, the unified ccxt symbol
+# ("BTC/USDT") and the exchange's own market id ("BTCUSDT")
+Listing = collections.namedtuple("Listing", ["exchange_id", "symbol", "market_id"])
+
+# Quote currency assumed when only a base currency is given ("btc")
+DEFAULT_QUOTE = "USDT"
+
+SEPARATORS = re.compile(r"[\s/_:-]")
+
+
+def normalize(symbol):
+    """Catalog key of a symbol: "btc/usdt", "BTC-USDT" and "BTCUSDT" all give "BTCUSDT"."""
+    return SEPARATORS.sub("", symbol or "").upper()
+
+
+class MarketCatalog:
+    """
+    Index of the spot markets listed by the chart exchanges.
+
+    Maps normalized symbols to the exchanges that list them, in exchange
+    preference order, so handlers can route a request straight to a
+    supporting exchange, or reject an unknown symbol, without a network call.
+    A bare base currency ("btc") resolves against DEFAULT_QUOTE.
+
+    The index is built from the markets of the shared exchange clients and
+    persisted to a JSON file, so a restarted process starts with the last
+    catalog. Once it is older than `max_age` seconds it is rebuilt in the
+    background; lookups keep using the old one meanwhile. Only a process
+    without a usable catalog builds it before answering: a persisted one is
+    not used when it indexes other exchanges or is older than `max_stale`
+    seconds, since listings change.
+    """
+
+    def __init__(self, path, exchange_ids=("binance", "bybit", "kucoin"), max_age=21600, max_stale=604800):
+        """
+        :param path: JSON file the catalog is persisted to
+        :param exchange_ids: Exchanges to index, most preferred first
+        :param max_age: Seconds after which the catalog is rebuilt
+        :param max_stale: Age in seconds past which a persisted catalog is not loaded
+        """
+        self.path = path
+        self.exchange_ids = tuple(exchange_ids)
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self.markets = None
+        self.updated_at = 0
+        self._retry_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+
+    def load(self):
+        """Load the persisted catalog. Returns False if there is none that can be used."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if tuple(data["exchanges"]) != self.exchange_ids:
+                logger.info("Ignoring the persisted market catalog of other exchanges")
+                return False
+            updated_at = data["updated_at"]
+            if time.time() - updated_at >= self.max_stale:
+                logger.info("Ignoring the stale persisted market catalog")
+                return False
+            markets = {
+                key: [Listing(*listing) for listing in listings]
+                for key, listings in data["markets"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+        with self._lock:
+            self.markets = markets
+            self.updated_at = updated_at
+        logger.info(f"Loaded market catalog with {len(self.markets)} symbols")
+        return True
+
+    def save(self):
+        with self._lock:
+            data = {
+                "updated_at": self.updated_at,
+                "exchanges": list(self.exchange_ids),
+                "markets": self.markets,
+            }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so readers never see a partial catalog
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """Rebuild the catalog from the exchanges' markets and persist it."""
+        markets = collections.defaultdict(list)
+        for exchange_id in self.exchange_ids:
+            try:
+                exchange = get_exchange(exchange_id)
+            except ccxt.BaseError as e:
+                logger.warning(f"Could not load {exchange_id} markets for the catalog: {e}")
+                continue
+            for market in exchange.markets.values():
+                if not market.get("spot") or market.get("active") is False:
+                    continue
+                key = normalize(market["base"] + market["quote"])
+                markets[key].append(Listing(exchange_id, market["symbol"], market["id"]))
+        if not markets:
+            logger.error("Could not build the market catalog, no exchange answered")
+            return
+        with self._lock:
+            self.markets = dict(markets)
+            self.updated_at = time.time()
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning(f"Could not persist the market catalog: {e}")
+        logger.info(f"Refreshed market catalog with {len(markets)} symbols")
+
+    def _refresh_once(self):
+        # Skip the refresh when another thread is already doing it
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            self.refresh()
+        finally:
+            self._refreshing.release()
+
+    def _ensure_loaded(self):
+        if self.markets is None:
+            with self._refreshing:
+                if self.markets is None and not self.load():
+                    self.refresh()
+        now = time.time()
+        if now - self.updated_at >= self.max_age and now >= self._retry_at:
+            # Don't start another refresh for a minute if this one fails
+            self._retry_at = now + 60
+            threading.Thread(
+                target=self._refresh_once, name="market-catalog", daemon=True
+            ).start()
+
+    def resolve(self, symbol):
+        """Return the listings of a symbol, most preferred exchange first."""
+        self._ensure_loaded()
+        key = normalize(symbol)
+        markets = self.markets or {}
+        return markets.get(key) or markets.get(key + DEFAULT_QUOTE) or []
+
+    def find(self, symbol, exchange_id=None):
+        """Return the preferred listing of a symbol (on a given exchange), or None."""
+        for listing in self.resolve(symbol):
+            if exchange_id is None or listing.exchange_id == exchange_id:
+                return listing
+        return None
+
+    def is_listed(self, symbol):
+        return bool(self.resolve(symbol))
+
+
+# Shared by every handler and job of the process
+market_catalog = MarketCatalog(
+    MARKET_CATALOG_PATH,
+    exchange_ids=MARKET_CATALOG_EXCHANGES,
+    max_age=MARKET_CATALOG_MAX_AGE,
+    max_stale=MARKET_CATALOG_MAX_STALE,
+)
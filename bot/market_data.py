@@ -0,0 +1,356 @@
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+from bot import timeframes
+from bot.candle_store import CandleStore
+from config.settings import (
+    CANDLE_BASE_SIZE,
+    CANDLE_BASE_TIMEFRAMES,
+    CANDLE_CACHE_SERIES,
+    CANDLE_CACHE_SIZE,
+    CANDLE_DEFAULT_COUNT,
+    CANDLE_FETCH_LIMIT,
+    CANDLE_MIN_REFRESH,
+    CANDLE_STORE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Columns of the candle arrays, in ccxt's OHLCV order
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+# Column names of the frames used by the chart handlers
+CHART_COLUMNS = ("Date", "Open", "High", "Low", "Close", "Volume")
+
+
+class MarketData:
+    """
+    Shared OHLCV candle cache, per (exchange, symbol, timeframe).
+
+    The first request for a series fetches the exchange's default history.
+    Later requests only fetch the candles from the last cached one on (ccxt
+    `since`), which replaces the last cached candle while it is still open.
+    A series fetched less than `min_refresh` seconds ago is served from the
+    cache without a network call. Requests for the same series wait for each
+    other, so a burst of /chart commands makes one exchange call.
+
+    Candles are kept as read-only float64 arrays with the columns of ccxt's
+    OHLCV rows (timestamp in ms, open, high, low, close, volume).
+
+    With a CandleStore, closed candles are also written to disk. A series
+    that is not cached yet then starts from the stored candles and only
+    fetches what is newer, so restarts don't re-download the history, and
+    `history` serves ranges longer than the in-memory window.
+
+    With base timeframes, only those are fetched (and stored) per symbol;
+    any other timeframe made of whole base candles, including ones the
+    exchange does not offer (2h, 3d, 12h), is resampled from the longest
+    such base. Callers say how many candles they read (`count`, chart range
+    plus indicator warm-up), and a series only pages through the exchange
+    history back to what that takes, `fetch_limit` candles per call. A
+    longer request later extends it backward, up to `base_candles`.
+    """
+
+    def __init__(self, max_series=256, max_candles=1000, min_refresh=10, max_pages=10, store=None,
+                 base_timeframes=(), base_candles=None, default_count=200, fetch_limit=1000):
+        """
+        :param max_series: Number of series kept, least recently used are dropped
+        :param max_candles: Number of most recent candles kept per series
+        :param min_refresh: Seconds during which a fetched series is not refetched
+        :param max_pages: Maximum number of fetches to catch up with a stale series
+        :param store: Optional CandleStore persisting the closed candles
+        :param base_timeframes: Timeframes fetched from the exchanges, the
+            others are resampled from the longest one they are made of
+        :param base_candles: Most candles kept per series, however many are requested
+        :param default_count: Candles of a resampled timeframe built when the
+            caller does not say how many it reads
+        :param fetch_limit: Candles asked for per exchange call when paging
+        """
+        self.store = store
+        self.max_candles = max_candles
+        self.min_refresh = min_refresh
+        self.max_pages = max_pages
+        self.base_timeframes = tuple(base_timeframes)
+        self.base_candles = max(base_candles or max_candles, max_candles)
+        self.default_count = default_count
+        self.fetch_limit = fetch_limit
+        self._series = LRUCache(maxsize=max_series)
+        self._resampled = LRUCache(maxsize=max_series)
+        # Series whose whole exchange history is cached, nothing older to page to
+        self._complete = set()
+        self._locks = collections.defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def _series_lock(self, key):
+        with self._lock:
+            return self._locks[key]
+
+    def base_timeframe(self, exchange, timeframe):
+        """Timeframe of the series `timeframe` candles are built from (itself when fetched as is)."""
+        if not timeframes.is_valid(timeframe):
+            # Left for the exchange to reject
+            return timeframe
+        bases = [
+            base for base in self.base_timeframes
+            if not exchange.timeframes or base in exchange.timeframes
+        ]
+        return timeframes.base_for(timeframe, bases) or timeframe
+
+    def candles(self, exchange, symbol, timeframe, count=None):
+        """
+        Return the cached candles of a series, fetching the new ones first.
+
+        Timeframes made of a base timeframe are resampled from the base
+        series, so every timeframe of a symbol comes from one exchange series.
+
+        :param exchange: ccxt exchange client
+        :param count: Number of candles the caller reads, older ones are
+            fetched when the series is shorter (the exchange's default
+            history when None)
+        :raises ccxt.BaseError: When the exchange does not list the market
+        """
+        base = self.base_timeframe(exchange, timeframe)
+        if base == timeframe:
+            return self._candles(exchange, symbol, timeframe, count)
+
+        # One more candle, the first one may only be partly covered
+        ratio = timeframes.duration(timeframe) / timeframes.duration(base)
+        base_count = int(np.ceil(((count or self.default_count) + 1) * ratio))
+        base_candles = self._candles(exchange, symbol, base, base_count)
+        key = (exchange.id, symbol, timeframe)
+        with self._lock:
+            cached = self._resampled.get(key)
+        if cached is not None and cached[0] is base_candles:
+            return cached[1]
+        candles = resample(base_candles, timeframe)
+        with self._lock:
+            self._resampled[key] = (base_candles, candles)
+        return candles
+
+    def _candles(self, exchange, symbol, timeframe, count=None):
+        key = (exchange.id, symbol, timeframe)
+        count = min(count, self.base_candles) if count else None
+        with self._series_lock(key):
+            with self._lock:
+                cached = self._series.get(key)
+            long_enough = (
+                count is None or cached is None or len(cached[1]) >= count or key in self._complete
+            )
+            if cached is not None and long_enough and time.monotonic() - cached[0] < self.min_refresh:
+                return cached[1]
+
+            if cached is None and self.store is not None:
+                stored = self.store.read(exchange.id, symbol, timeframe)
+                cached = (None, np.array(stored[-self.base_candles:]))
+
+            candles = cached and cached[1]
+            # Series keep what they have, up to base_candles, so a short
+            # request does not drop the history a longer one fetched
+            size = min(max(self.max_candles, count or 0, len(candles) if candles is not None else 0),
+                       self.base_candles)
+            candles = self._fetch(exchange, symbol, timeframe, size, candles, count)
+            if count and 0 < len(candles) < count and key not in self._complete:
+                candles = self._extend(exchange, symbol, timeframe, candles, count, size)
+            if self.store is not None:
+                self._persist(exchange, symbol, timeframe, candles)
+            with self._lock:
+                self._series[key] = (time.monotonic(), candles)
+            return candles
+
+    def _fetch(self, exchange, symbol, timeframe, size, candles=None, count=None):
+        if (candles is None or not len(candles)) and count:
+            return self._backfill(exchange, symbol, timeframe, count, size)
+        if candles is None or not len(candles):
+            candles = self._merge(None, exchange.fetch_ohlcv(symbol, timeframe), size)
+            logger.debug(f"Fetched {len(candles)} {symbol} {timeframe} candles from {exchange.id}")
+            return candles
+
+        # Catch up from the last cached candle, page by page if the series is stale
+        period = exchange.parse_timeframe(timeframe) * 1000
+        fetched = 0
+        for _ in range(self.max_pages):
+            since = int(candles[-1, TIMESTAMP])
+            rows = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=self.fetch_limit)
+            candles = self._merge(candles, rows, size)
+            fetched += len(rows)
+            if not rows or rows[-1][TIMESTAMP] <= since:
+                break
+            if candles[-1, TIMESTAMP] >= exchange.milliseconds() - 2 * period:
+                break
+        else:
+            # Too far behind to page through, start over from the recent history
+            logger.info(f"{symbol} {timeframe} candles are stale, refetching them")
+            return self._fetch(exchange, symbol, timeframe, size, count=count)
+        logger.debug(f"Fetched {fetched} new {symbol} {timeframe} candles from {exchange.id}")
+        return candles
+
+    def _backfill(self, exchange, symbol, timeframe, count, size):
+        # Page forward from `count` periods ago until the open candle
+        period = exchange.parse_timeframe(timeframe) * 1000
+        now = exchange.milliseconds()
+        candles = self._page(exchange, symbol, timeframe, now - count * period, now, size)
+        if len(candles) < count:
+            # The market is younger than that
+            self._complete.add((exchange.id, symbol, timeframe))
+        logger.debug(f"Fetched {len(candles)} {symbol} {timeframe} candles from {exchange.id}")
+        return candles
+
+    def _extend(self, exchange, symbol, timeframe, candles, count, size):
+        # Page through the history before the first cached candle, so the
+        # series holds `count` candles
+        period = exchange.parse_timeframe(timeframe) * 1000
+        first = int(candles[0, TIMESTAMP])
+        older = self._page(exchange, symbol, timeframe, first - (count - len(candles)) * period, first, size)
+        older = older[older[:, TIMESTAMP] < first]
+        if len(older) + len(candles) < count:
+            self._complete.add((exchange.id, symbol, timeframe))
+        logger.debug(f"Fetched {len(older)} older {symbol} {timeframe} candles from {exchange.id}")
+        extended = np.concatenate([older, candles])[-size:]
+        extended.flags.writeable = False
+        return extended
+
+    def _page(self, exchange, symbol, timeframe, since, until, size):
+        # Candles opened from `since` on, fetched page by page until one
+        # opens at or after `until`
+        period = exchange.parse_timeframe(timeframe) * 1000
+        candles = None
+        while True:
+            rows = exchange.fetch_ohlcv(symbol, timeframe, since=int(since), limit=self.fetch_limit)
+            candles = self._merge(candles, rows, size)
+            if not rows or rows[-1][TIMESTAMP] < since or rows[-1][TIMESTAMP] + period > until:
+                break
+            since = int(rows[-1][TIMESTAMP]) + period
+        return candles
+
+    def _persist(self, exchange, symbol, timeframe, candles):
+        # Only closed candles are stored, the last one may still change
+        period = exchange.parse_timeframe(timeframe) * 1000
+        closed = candles[candles[:, TIMESTAMP] + period <= exchange.milliseconds()]
+        if not len(closed):
+            return
+        stored = self.store.read(exchange.id, symbol, timeframe)
+        if len(stored) and closed[0, TIMESTAMP] > stored[-1, TIMESTAMP] + period:
+            # The store would get a gap, keep only the recent history
+            logger.info(f"Resetting the stored {symbol} {timeframe} candles after a gap")
+            self.store.reset(exchange.id, symbol, timeframe)
+        try:
+            self.store.append(exchange.id, symbol, timeframe, closed)
+        except OSError as e:
+            logger.warning(f"Could not store {symbol} {timeframe} candles: {e}")
+
+    def history(self, exchange, symbol, timeframe, start=None):
+        """
+        Return all known candles of a series from `start` (datetime, UTC) on.
+
+        The cached series is first fetched back to `start` (up to
+        `base_candles`). Reads the stored candles (memory-mapped, no copy when
+        nothing else is cached) and adds the cached ones before and after
+        them, including the open candle. Resampled timeframes are built from
+        the history of their base series.
+        """
+        base = self.base_timeframe(exchange, timeframe)
+        if base != timeframe:
+            if start is not None:
+                # Start at the open of the first candle, so it is complete
+                start_ms = timeframes.bucket_starts([pd.Timestamp(start).timestamp() * 1000], timeframe)[0]
+                start = pd.Timestamp(int(start_ms), unit="ms")
+            return resample(self.history(exchange, symbol, base, start), timeframe)
+
+        count = None
+        if start is not None:
+            start_ms = pd.Timestamp(start).timestamp() * 1000
+            count = int((exchange.milliseconds() - start_ms) // timeframes.duration(timeframe)) + 1
+        candles = self.candles(exchange, symbol, timeframe, count)
+        if self.store is None:
+            stored = candles[:0]
+        else:
+            stored = self.store.read(exchange.id, symbol, timeframe)
+        if start is not None:
+            stored = stored[np.searchsorted(stored[:, TIMESTAMP], start_ms):]
+            candles = candles[candles[:, TIMESTAMP] >= start_ms]
+        if len(stored):
+            # The store only grows forward, history fetched backward is only cached
+            before = candles[candles[:, TIMESTAMP] < stored[0, TIMESTAMP]]
+            after = candles[candles[:, TIMESTAMP] > stored[-1, TIMESTAMP]]
+            if not len(before) and not len(after):
+                return stored
+            return np.concatenate([before, stored, after])
+        return candles
+
+    def _merge(self, candles, rows, size):
+        new = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        if candles is not None and len(new):
+            # Fetched candles replace cached ones from their first timestamp on
+            candles = candles[candles[:, TIMESTAMP] < new[0, TIMESTAMP]]
+            new = np.concatenate([candles, new])
+        elif candles is not None:
+            new = candles
+        new = np.array(new[-size:])
+        new.flags.writeable = False
+        return new
+
+    def frame(self, exchange, symbol, timeframe, start=None, columns=CHART_COLUMNS, count=None):
+        """
+        Return the candles of a series as a DataFrame indexed by candle time (UTC).
+
+        :param start: Only keep candles opened at or after this datetime (UTC)
+        :param columns: Names of the index and the OHLCV columns
+        :param count: Number of candles read, see candles
+        """
+        return to_frame(self.candles(exchange, symbol, timeframe, count), start, columns)
+
+
+def resample(candles, timeframe):
+    """
+    Aggregate candles into `timeframe` candles, aligned as the exchanges do
+    (see bot.timeframes).
+
+    A leading candle the input does not cover from its open is dropped; the
+    last one is still open when the last input candle is.
+    """
+    if not len(candles):
+        return candles
+    starts = timeframes.bucket_starts(candles[:, TIMESTAMP], timeframe)
+    # Index of the first input candle of every output candle
+    first = np.flatnonzero(np.concatenate(([True], starts[1:] != starts[:-1])))
+    last = np.append(first[1:], len(candles)) - 1
+    out = np.empty((len(first), 6))
+    out[:, TIMESTAMP] = starts[first]
+    out[:, OPEN] = candles[first, OPEN]
+    out[:, HIGH] = np.maximum.reduceat(candles[:, HIGH], first)
+    out[:, LOW] = np.minimum.reduceat(candles[:, LOW], first)
+    out[:, CLOSE] = candles[last, CLOSE]
+    out[:, VOLUME] = np.add.reduceat(candles[:, VOLUME], first)
+    if candles[0, TIMESTAMP] != starts[0]:
+        out = out[1:]
+    out.flags.writeable = False
+    return out
+
+
+def to_frame(candles, start=None, columns=CHART_COLUMNS):
+    """Convert a candle array into a DataFrame indexed by candle time (UTC)."""
+    if start is not None:
+        candles = candles[candles[:, TIMESTAMP] >= pd.Timestamp(start).timestamp() * 1000]
+    df = pd.DataFrame(candles[:, OPEN:], columns=list(columns[1:]))
+    df.index = pd.to_datetime(candles[:, TIMESTAMP].astype(np.int64), unit="ms")
+    df.index.name = columns[0]
+    return df
+
+
+# Shared by every handler and job of the process
+market_data = MarketData(
+    max_series=CANDLE_CACHE_SERIES,
+    max_candles=CANDLE_CACHE_SIZE,
+    min_refresh=CANDLE_MIN_REFRESH,
+    store=CandleStore(CANDLE_STORE_PATH) if CANDLE_STORE_PATH else None,
+    base_timeframes=CANDLE_BASE_TIMEFRAMES,
+    base_candles=CANDLE_BASE_SIZE,
+    default_count=CANDLE_DEFAULT_COUNT,
+    fetch_limit=CANDLE_FETCH_LIMIT,
+)
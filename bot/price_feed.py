@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+
+from config.settings import PRICE_FEED, PRICE_FEED_REPLAY_PATH, PRICE_FEED_SOCKET
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tick(line):
+    """
+    Parse a tick line of a replay file or socket feed.
+
+    Accepts JSON ({"market": "BTC/USDT", "price": 27000.5, "timestamp": ms})
+    or CSV ("timestamp,market,price"). Returns (market, price, timestamp).
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        tick = json.loads(line)
+        return tick["market"], float(tick["price"]), tick.get("timestamp")
+    timestamp, market, price = line.split(",")
+    return market, float(price), int(timestamp)
+
+
+class TickSource:
+    """
+    Source of price ticks for StreamingAlerts.
+
+    `run` blocks, calling `emit(market, price, timestamp)` for every tick,
+    until `stop` is called. `subscribe` sets the markets the source should
+    follow; it may be called at any time from another thread.
+    """
+
+    def __init__(self):
+        self.markets = set()
+        self._stopping = threading.Event()
+
+    def subscribe(self, markets):
+        self.markets = set(markets)
+
+    def run(self, emit):
+        raise NotImplementedError
+
+    def stop(self):
+        self._stopping.set()
+
+
+class ReplaySource(TickSource):
+    """
+    Replays recorded ticks from a file, for tests and offline benchmarks.
+
+    With `speed` None the ticks are emitted as fast as they are read,
+    otherwise at `speed` times the recorded pace.
+    """
+
+    def __init__(self, path, speed=None):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+
+    def run(self, emit):
+        first_tick = started = None
+        with open(self.path) as f:
+            for line in f:
+                if self._stopping.is_set():
+                    break
+                if not line.strip():
+                    continue
+                market, price, timestamp = parse_tick(line)
+                if self.speed and timestamp is not None:
+                    if first_tick is None:
+                        first_tick, started = timestamp, time.monotonic()
+                    delay = (timestamp - first_tick) / 1000 / self.speed - (
+                        time.monotonic() - started
+                    )
+                    if delay > 0:
+                        time.sleep(delay)
+                emit(market, price, timestamp)
+        logger.info(f"Finished replaying {self.path}")
+
+
+class SocketSource(TickSource):
+    """Reads tick lines (see parse_tick) from a TCP socket, reconnecting when it drops."""
+
+    def __init__(self, host, port, max_backoff=30):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.max_backoff = max_backoff
+
+    def run(self, emit):
+        backoff = 1
+        while not self._stopping.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=30) as conn:
+                    backoff = 1
+                    for line in conn.makefile("r", encoding="utf-8"):
+                        if self._stopping.is_set():
+                            return
+                        if not line.strip():
+                            continue
+                        try:
+                            tick = parse_tick(line)
+                        except (ValueError, KeyError) as e:
+                            # A bad line does not drop the connection
+                            logger.warning(f"Skipping malformed price feed line {line.strip()!r}: {e}")
+                            continue
+                        emit(*tick)
+            except (OSError, ValueError) as e:
+                logger.error(f"Price feed socket failed, reconnecting in {backoff}s: {e}")
+            self._stopping.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+class WebsocketSource(TickSource):
+    """
+    Streams tickers of the subscribed markets from an exchange websocket
+    (ccxt.pro), one watch task per market on a private event loop.
+    """
+
+    def __init__(self, exchange_id="bybit", resubscribe_interval=5):
+        super().__init__()
+        self.exchange_id = exchange_id
+        self.resubscribe_interval = resubscribe_interval
+
+    async def _watch(self, exchange, market, emit):
+        while True:
+            try:
+                ticker = await exchange.watch_ticker(market)
+                if ticker.get("last") is not None:
+                    emit(market, ticker["last"], ticker.get("timestamp"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ticker stream of {market} failed: {e}")
+                await asyncio.sleep(5)
+
+    async def _run(self, emit):
+        import ccxt.pro
+
+        exchange = getattr(ccxt.pro, self.exchange_id)({"enableRateLimit": True})
+        tasks = {}
+        try:
+            while not self._stopping.is_set():
+                # Follow the subscriptions: start and cancel watch tasks
+                markets = set(self.markets)
+                for market in markets - set(tasks):
+                    tasks[market] = asyncio.ensure_future(self._watch(exchange, market, emit))
+                for market in set(tasks) - markets:
+                    tasks.pop(market).cancel()
+                await asyncio.sleep(self.resubscribe_interval)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await exchange.close()
+
+    def run(self, emit):
+        asyncio.run(self._run(emit))
+
+
+class StreamingAlerts:
+    """
+    Evaluates price alerts on pushed ticks instead of polled tickers.
+
+    The source thread only records ticks: per market the lowest, highest and
+    last price since the previous evaluation. An evaluator thread takes them
+    every `interval` seconds at most and runs each market's range through the
+    alert book, so wicks between evaluations still trigger alerts while the
+    CPU spent stays bounded by the number of markets, whatever the tick rate.
+    """
+
+    def __init__(self, source, book, on_alert, active=None, interval=0.25):
+        """
+        :param source: TickSource to read from
+        :param book: AlertBook to evaluate
+        :param on_alert: Called with (alert, price) for every triggered alert
+        :param active: Callable returning False while alerts must not be
+            evaluated (e.g. when this process is not the leader)
+        :param interval: Minimum seconds between evaluations
+        """
+        self.source = source
+        self.book = book
+        self.on_alert = on_alert
+        self.active = active
+        self.interval = interval
+        self.ticks = 0
+        self.evaluations = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def push(self, market, price, timestamp=None):
+        with self._lock:
+            self.ticks += 1
+            pending = self._pending.get(market)
+            if pending is None:
+                self._pending[market] = [price, price, price]
+            else:
+                pending[0] = min(pending[0], price)
+                pending[1] = max(pending[1], price)
+                pending[2] = price
+        self._ready.set()
+
+    def evaluate(self):
+        """Run the pending price ranges through the alert book."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._ready.clear()
+        if self.active is not None and not self.active():
+            return
+        for market, prices in pending.items():
+            self.evaluations += 1
+            for price in prices:
+                for alert in self.book.update_price(market, price):
+                    try:
+                        self.on_alert(alert, price)
+                    except Exception:
+                        logger.exception(f"Could not send price alert {alert.alert_id}")
+
+    def _evaluate_loop(self):
+        while not self._stopping.is_set():
+            self._ready.wait(1)
+            self.evaluate()
+            self._stopping.wait(self.interval)
+
+    def _run_source(self):
+        try:
+            self.source.run(self.push)
+        except Exception:
+            logger.exception("Price feed stopped")
+
+    def start(self):
+        for target, name in ((self._run_source, "price-feed"), (self._evaluate_loop, "price-alerts")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self.source.stop()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.evaluate()
+
+
+def create_price_source(kind=PRICE_FEED):
+    """Create the tick source configured by PRICE_FEED, or None for ticker polling."""
+    if kind == "websocket":
+        return WebsocketSource("bybit")
+    if kind == "replay":
+        return ReplaySource(PRICE_FEED_REPLAY_PATH)
+    if kind == "socket":
+        host, port = PRICE_FEED_SOCKET.rsplit(":", 1)
+        return SocketSource(host, int(port))
+    return None
@@ -0,0 +1,58 @@
+import threading
+
+from config.settings import (
+    QUEUE_BACKEND,
+    CLOUDAMQP_URL,
+    LOCAL_QUEUE_SIZE,
+    RABBITMQ_ACK_BATCH,
+    RABBITMQ_ACK_INTERVAL,
+    RABBITMQ_DEAD_LETTER_QUEUE,
+)
+from bot.queues.base import Delivery, QueueBackend, QueueError
+from bot.queues.local import AsyncioQueueBackend
+from bot.queues.memory import MemoryQueueBackend
+from bot.queues.rabbitmq import RabbitMQBackend
+
+__all__ = [
+    "Delivery",
+    "QueueBackend",
+    "QueueError",
+    "AsyncioQueueBackend",
+    "MemoryQueueBackend",
+    "RabbitMQBackend",
+    "create_backend",
+]
+
+# In-process backends are shared by everything in the process, since their
+# queues only exist in memory
+_shared_backends = {}
+_shared_lock = threading.Lock()
+
+
+def create_backend(name=QUEUE_BACKEND):
+    """
+    Create the queue backend configured by QUEUE_BACKEND.
+
+    "rabbitmq" returns a new backend with its own connection on every call.
+    "local" (asyncio) and "memory" return the process-wide instance.
+    """
+    if name == "rabbitmq":
+        return RabbitMQBackend(
+            CLOUDAMQP_URL,
+            dead_letter_queue=RABBITMQ_DEAD_LETTER_QUEUE,
+            # Capped by the backend below the smallest consumer prefetch
+            ack_batch=RABBITMQ_ACK_BATCH,
+            ack_interval=RABBITMQ_ACK_INTERVAL,
+        )
+    with _shared_lock:
+        if name not in _shared_backends:
+            if name == "local":
+                _shared_backends[name] = AsyncioQueueBackend(
+                    maxsize=LOCAL_QUEUE_SIZE,
+                    dead_letter_queue=RABBITMQ_DEAD_LETTER_QUEUE,
+                )
+            elif name == "memory":
+                _shared_backends[name] = MemoryQueueBackend()
+            else:
+                raise ValueError(f"Unknown queue backend: {name}")
+        return _shared_backends[name]
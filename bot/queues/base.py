@@ -0,0 +1,62 @@
+import collections
+
+# A message handed to a consumer callback. `tag` identifies the delivery to
+# the backend that produced it and must be passed back through settle().
+Delivery = collections.namedtuple(
+    "Delivery",
+    ["queue", "body", "message_id", "content_type", "content_encoding", "tag"],
+)
+
+
+class QueueError(Exception):
+    """Raised when a message could not be handed over to the queue backend."""
+
+
+class QueueBackend:
+    """
+    Interface of the message queue used between the publisher, the consumer
+    and the job workers.
+
+    `publish` may be called from any thread and returns once the backend has
+    taken responsibility for the message (raising QueueError otherwise).
+    Consumer callbacks run on the backend's own thread and must not block;
+    deliveries are settled later, from any thread, through `settle`.
+    """
+
+    # True when publishers and consumers have to live in the same process
+    in_process = False
+
+    def declare(self, queue):
+        """Make sure a queue exists."""
+        raise NotImplementedError
+
+    def publish(self, queue, body, message_id=None, content_type=None, content_encoding=None):
+        """Publish a message, waiting until the backend has accepted it."""
+        raise NotImplementedError
+
+    def keepalive(self):
+        """Called by idle publishers to keep their connection alive."""
+
+    def consume(self, queue, callback, prefetch=1):
+        """
+        Register a consumer, started by `run`.
+
+        :param callback: Called with a Delivery for every message
+        :param prefetch: Maximum number of unsettled deliveries for this consumer
+        """
+        raise NotImplementedError
+
+    def settle(self, delivery, success=True):
+        """Acknowledge a delivery, or dead-letter it when processing failed."""
+        raise NotImplementedError
+
+    def run(self):
+        """Deliver messages to the registered consumers until `stop` is called."""
+        raise NotImplementedError
+
+    def stop(self):
+        """Make `run` return. Safe to call from any thread."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the backend's resources."""
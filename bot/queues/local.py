@@ -0,0 +1,121 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+from bot.queues.base import Delivery, QueueBackend, QueueError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncioQueueBackend(QueueBackend):
+    """
+    In-process queue backend for single-node deployments.
+
+    Queues are bounded asyncio queues on an event loop running in its own
+    thread, so publishers in any thread wait for room instead of growing the
+    queue without limit. Each consumer holds at most `prefetch` unsettled
+    deliveries, like a RabbitMQ prefetch window. Messages are lost when the
+    process exits; use RabbitMQ where that matters.
+    """
+
+    in_process = True
+
+    def __init__(self, maxsize=10000, dead_letter_queue=None, publish_timeout=None):
+        """
+        :param maxsize: Maximum number of messages held per queue
+        :param dead_letter_queue: Queue that receives failed deliveries, or None
+        :param publish_timeout: Seconds a publish waits for room before failing
+        """
+        self.maxsize = maxsize
+        self.dead_letter_queue = dead_letter_queue
+        self.publish_timeout = publish_timeout
+        self.loop = asyncio.new_event_loop()
+        self._queues = {}
+        self._consumers = []
+        self._tasks = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="local-queue", daemon=True
+        )
+        self._thread.start()
+        if dead_letter_queue:
+            self.declare(dead_letter_queue)
+
+    def _call(self, coro, timeout=None):
+        """Run a coroutine on the event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def _declare(self, queue):
+        if queue not in self._queues:
+            self._queues[queue] = asyncio.Queue(self.maxsize)
+        return self._queues[queue]
+
+    def declare(self, queue):
+        self._call(self._declare(queue))
+
+    async def _put(self, queue, delivery):
+        await (await self._declare(queue)).put(delivery)
+
+    def publish(self, queue, body, message_id=None, content_type=None, content_encoding=None):
+        delivery = Delivery(queue, body, message_id, content_type, content_encoding, None)
+        future = asyncio.run_coroutine_threadsafe(self._put(queue, delivery), self.loop)
+        try:
+            future.result(self.publish_timeout)
+        except concurrent.futures.TimeoutError as err:
+            future.cancel()
+            raise QueueError(f"Queue {queue} is full") from err
+
+    def consume(self, queue, callback, prefetch=1):
+        self.declare(queue)
+        self._consumers.append((queue, callback, prefetch))
+
+    async def _consume(self, queue, callback, prefetch):
+        window = asyncio.Semaphore(prefetch)
+        source = self._queues[queue]
+        while True:
+            await window.acquire()
+            delivery = await source.get()
+            # The delivery carries the window it counts against, settle()
+            # releases it again
+            try:
+                callback(delivery._replace(tag=window))
+            except Exception:
+                logger.exception(f"Consumer of {queue} failed")
+                window.release()
+
+    def _settle(self, delivery, success):
+        delivery.tag.release()
+        if success:
+            return
+        dead_letters = self._queues.get(self.dead_letter_queue)
+        if dead_letters is None or dead_letters.full():
+            logger.warning(f"Dropped failed message {delivery.message_id} from {delivery.queue}")
+            return
+        dead_letters.put_nowait(delivery._replace(tag=None))
+        logger.warning(f"Moved message {delivery.message_id} to {self.dead_letter_queue}")
+
+    def settle(self, delivery, success=True):
+        self.loop.call_soon_threadsafe(self._settle, delivery, success)
+
+    async def _start(self):
+        for queue, callback, prefetch in self._consumers:
+            self._tasks.append(asyncio.ensure_future(self._consume(queue, callback, prefetch)))
+
+    def run(self):
+        self._stopped.clear()
+        self._call(self._start())
+        self._stopped.wait()
+
+    async def _cancel(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def stop(self):
+        self._call(self._cancel())
+        self._stopped.set()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
@@ -0,0 +1,83 @@
+import collections
+import threading
+
+from bot.queues.base import Delivery, QueueBackend
+
+
+class MemoryQueueBackend(QueueBackend):
+    """
+    Synchronous in-memory stand-in for tests and local benchmarks.
+
+    Published messages wait in plain deques. `drain()` delivers them on the
+    calling thread, so a test controls exactly when consumers run, and
+    settled deliveries are kept in `acked` and `dead_letters` for
+    inspection. `run()` keeps draining until `stop()` for code that expects
+    a blocking backend.
+    """
+
+    in_process = True
+
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)
+        self.acked = []
+        self.dead_letters = []
+        self._consumers = []
+        self._unsettled = collections.Counter()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def declare(self, queue):
+        with self._condition:
+            self.queues[queue]
+
+    def publish(self, queue, body, message_id=None, content_type=None, content_encoding=None):
+        with self._condition:
+            self.queues[queue].append(
+                Delivery(queue, body, message_id, content_type, content_encoding, None)
+            )
+            self._condition.notify_all()
+
+    def consume(self, queue, callback, prefetch=1):
+        self.declare(queue)
+        self._consumers.append((queue, callback, prefetch))
+
+    def settle(self, delivery, success=True):
+        with self._condition:
+            self._unsettled[delivery.tag] -= 1
+            (self.acked if success else self.dead_letters).append(delivery)
+            self._condition.notify_all()
+
+    def _next(self):
+        """Take the next delivery a consumer has room for, or None."""
+        for index, (queue, callback, prefetch) in enumerate(self._consumers):
+            if self.queues[queue] and self._unsettled[index] < prefetch:
+                self._unsettled[index] += 1
+                return callback, self.queues[queue].popleft()._replace(tag=index)
+        return None
+
+    def drain(self):
+        """Deliver messages until no consumer can take more. Returns the number delivered."""
+        delivered = 0
+        while True:
+            with self._condition:
+                pending = self._next()
+            if pending is None:
+                return delivered
+            callback, delivery = pending
+            callback(delivery)
+            delivered += 1
+
+    def run(self):
+        with self._condition:
+            self._stopped = False
+        while True:
+            self.drain()
+            with self._condition:
+                if self._stopped:
+                    return
+                self._condition.wait(timeout=1)
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
@@ -0,0 +1,201 @@
+import functools
+import logging
+import ssl
+import threading
+
+import pika
+from pika.exceptions import AMQPError
+
+from bot.acks import AckBatcher
+from bot.queues.base import Delivery, QueueBackend, QueueError
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection to the broker is gone
+CONNECTION_ERRORS = (AMQPError, ssl.SSLError, OSError)
+
+
+def ack_batch_size(batch, consumers):
+    """
+    Cap an ack batch below the prefetch of every consumer.
+
+    A consumer holds at most its prefetch of unacknowledged deliveries, so
+    when only its queue has traffic a larger batch never fills and every
+    ack waits for the flush timer.
+    """
+    prefetches = [prefetch for _, _, prefetch in consumers]
+    if not prefetches:
+        return max(1, batch)
+    return max(1, min(batch, min(prefetches) // 2))
+
+
+class RabbitMQBackend(QueueBackend):
+    """
+    Queue backend on a RabbitMQ broker.
+
+    The connection is opened on first use, not when the backend is created,
+    and reopened by the next publish after it broke. Publishes wait for the
+    broker's confirm. Consumed deliveries are acknowledged in batches through
+    an AckBatcher; failed ones go to the dead letter queue.
+
+    pika connections are not thread safe: one instance either publishes or
+    consumes. Publishing is serialized with a lock, and settling from the
+    worker threads is handed over to the connection thread.
+    """
+
+    def __init__(self, url, heartbeat=30, dead_letter_queue=None, ack_batch=1, ack_interval=0.5):
+        """
+        :param url: AMQP URL of the broker
+        :param heartbeat: Heartbeat interval in seconds, keeps idle connections open
+        :param dead_letter_queue: Queue that receives failed deliveries, or None
+        :param ack_batch: Number of ready deliveries acknowledged at once, at
+            most half the smallest prefetch of the consumers
+        :param ack_interval: Seconds between flushes of an incomplete ack batch
+        """
+        self.params = pika.URLParameters(url)
+        self.params.heartbeat = heartbeat
+        self.dead_letter_queue = dead_letter_queue
+        self.ack_batch = ack_batch
+        self.ack_interval = ack_interval
+        self.connection = None
+        self.channel = None
+        self.acks = None
+        self._queues = []
+        self._consumers = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.connection is not None and self.connection.is_open:
+            return
+        self.connection = pika.BlockingConnection(self.params)
+        self.channel = self.connection.channel()
+        for queue in self._queues:
+            self.channel.queue_declare(queue=queue)
+        self.channel.confirm_delivery()
+
+    def _reset(self):
+        try:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        except CONNECTION_ERRORS:
+            pass  # Ignore errors when closing a broken connection
+        self.connection = None
+        self.channel = None
+
+    def declare(self, queue):
+        with self._lock:
+            if queue not in self._queues:
+                self._queues.append(queue)
+            if self.channel is None:
+                return
+            try:
+                self.channel.queue_declare(queue=queue)
+            except CONNECTION_ERRORS as err:
+                self._reset()
+                raise QueueError(f"Could not declare {queue}: {err}") from err
+
+    def publish(self, queue, body, message_id=None, content_type=None, content_encoding=None):
+        with self._lock:
+            try:
+                self._connect()
+                # Blocks until the broker confirms the message
+                self.channel.basic_publish(
+                    exchange="",
+                    routing_key=queue,
+                    body=body,
+                    properties=pika.BasicProperties(
+                        message_id=message_id,
+                        content_type=content_type,
+                        content_encoding=content_encoding,
+                    ),
+                    mandatory=True,
+                )
+            except CONNECTION_ERRORS as err:
+                self._reset()
+                raise QueueError(f"Could not publish to {queue}: {err}") from err
+
+    def keepalive(self):
+        with self._lock:
+            if self.connection is None:
+                return
+            try:
+                self.connection.process_data_events(0)
+            except CONNECTION_ERRORS as err:
+                logger.error(f"RabbitMQ connection lost: {err}")
+                self._reset()
+
+    def consume(self, queue, callback, prefetch=1):
+        self.declare(queue)
+        self._consumers.append((queue, callback, prefetch))
+
+    def _on_message(self, queue, callback, ch, method, properties, body):
+        self.acks.track(method.delivery_tag)
+        callback(
+            Delivery(
+                queue,
+                body,
+                properties.message_id,
+                properties.content_type,
+                properties.content_encoding,
+                method.delivery_tag,
+            )
+        )
+
+    def _settle(self, delivery, success):
+        properties = None
+        if not success:
+            properties = pika.BasicProperties(
+                message_id=delivery.message_id,
+                content_type=delivery.content_type,
+                content_encoding=delivery.content_encoding,
+            )
+        self.acks.settle(delivery.tag, delivery.body, success=success, properties=properties)
+
+    def settle(self, delivery, success=True):
+        # The channel is not thread safe, so deliveries are settled on the
+        # connection thread
+        self.connection.add_callback_threadsafe(
+            functools.partial(self._settle, delivery, success)
+        )
+
+    def _flush_acks(self):
+        # Ack the deliveries that are ready even when the batch is not full
+        self.acks.flush()
+        self.connection.call_later(self.ack_interval, self._flush_acks)
+
+    def run(self):
+        with self._lock:
+            self._connect()
+            if self.dead_letter_queue:
+                self.channel.queue_declare(queue=self.dead_letter_queue)
+            self.acks = AckBatcher(
+                self.channel,
+                batch_size=ack_batch_size(self.ack_batch, self._consumers),
+                dead_letter_queue=self.dead_letter_queue,
+            )
+            # basic_qos applies to the consumers started after it, so every
+            # consumer gets its own prefetch window
+            for queue, callback, prefetch in self._consumers:
+                self.channel.basic_qos(prefetch_count=prefetch)
+                self.channel.basic_consume(
+                    queue=queue,
+                    on_message_callback=functools.partial(self._on_message, queue, callback),
+                    auto_ack=False,
+                )
+            self.connection.call_later(self.ack_interval, self._flush_acks)
+        self.channel.start_consuming()
+
+    def stop(self):
+        if self.connection is not None and self.connection.is_open:
+            self.connection.add_callback_threadsafe(self.channel.stop_consuming)
+
+    def close(self):
+        with self._lock:
+            if self.acks is not None and self.connection is not None and self.connection.is_open:
+                try:
+                    # Settle what the workers finished before closing the connection
+                    self.connection.process_data_events()
+                    self.acks.flush()
+                except CONNECTION_ERRORS as err:
+                    logger.error(f"Could not settle the remaining deliveries: {err}")
+            self._reset()
@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+
+import telegram
+from cachetools import TTLCache
+from telegram.error import RetryAfter
+from telegram.utils.helpers import DEFAULT_NONE
+
+from bot.workers import blocking
+from config.settings import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_GROUP_RATE,
+    TELEGRAM_GROUP_BURST,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods that send, edit or delete messages and count towards the
+# Telegram flood limits (sendMessage, editMessageText, deleteMessage, ...)
+LIMITED_METHOD_PREFIXES = ("send", "edit", "delete", "copy", "forward")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Callers
+    reserve a token and sleep outside of the lock, so waiting callers are
+    served in the order they asked and never hold the lock while sleeping.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """Hold back every caller of this bucket for the given number of seconds."""
+        with self._lock:
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + seconds
+            )
+
+
+class RateLimitedBot(telegram.Bot):
+    """
+    Bot that throttles outgoing messages to stay within the Telegram limits.
+
+    Every send/edit/delete call waits for a token from the bucket of its chat
+    (about one message per second in private chats, 20 per minute in groups)
+    and from the global bucket (about 30 messages per second). A RetryAfter
+    from Telegram only holds back the chat it was raised for; the call is
+    retried once the wait is over. On a ChatWorkerPool worker, every wait
+    (for a token or after a RetryAfter) hands the other chats of its shard
+    to a spare thread (see bot.workers.blocking), instead of stalling them
+    behind the throttled chat.
+    """
+
+    def __init__(self, *args, max_retries=3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_RATE)
+        # Idle chats fall out of the cache, which is the same as a full bucket
+        self._chat_buckets = TTLCache(maxsize=10000, ttl=600)
+        self._chat_buckets_lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id):
+        try:
+            # Numeric ids may come as strings
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        with self._chat_buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                if isinstance(chat_id, int) and chat_id > 0:
+                    bucket = TokenBucket(TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST)
+                else:
+                    # Groups, supergroups and channels (negative or @username ids)
+                    bucket = TokenBucket(TELEGRAM_GROUP_RATE, TELEGRAM_GROUP_BURST)
+            # Re-insert on every use so that active chats stay cached
+            self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    @staticmethod
+    def _take(bucket):
+        # Waits run in blocking(), so a chat sending a burst on a worker
+        # doesn't hold back the other chats of its shard
+        wait = bucket.reserve()
+        if wait > 0:
+            with blocking():
+                time.sleep(wait)
+
+    def _post(self, endpoint, data=None, timeout=DEFAULT_NONE, api_kwargs=None):
+        if not endpoint.startswith(LIMITED_METHOD_PREFIXES):
+            return super()._post(
+                endpoint, data, timeout=timeout, api_kwargs=api_kwargs
+            )
+
+        chat_id = (data or {}).get("chat_id") or (api_kwargs or {}).get("chat_id")
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+
+        attempt = 0
+        while True:
+            if chat_bucket is not None:
+                self._take(chat_bucket)
+            self._take(self._global_bucket)
+            try:
+                return super()._post(
+                    endpoint, data, timeout=timeout, api_kwargs=api_kwargs
+                )
+            except RetryAfter as err:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(
+                    f"Flood limit hit on {endpoint} for chat {chat_id}, "
+                    f"retrying in {err.retry_after}s"
+                )
+                if chat_bucket is not None:
+                    chat_bucket.block(err.retry_after)
+                with blocking():
+                    time.sleep(err.retry_after)
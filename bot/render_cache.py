@@ -0,0 +1,148 @@
+import fcntl
+import functools
+import logging
+import os
+import re
+import time
+
+from config.settings import RENDER_CACHE_PATH, RENDER_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Rendered charts shared by the processes of a host, for `ttl` seconds.
+
+    SingleFlight only coalesces the renders of one process, and the job
+    workers are separate processes. A render holds an exclusive lock on its
+    key's lock file and writes the image next to it; processes asking for
+    the same key meanwhile wait on the lock, then read that image instead
+    of rendering it again. None results (nothing to render) are not cached.
+    """
+
+    def __init__(self, directory, ttl=60):
+        """
+        :param directory: Directory of the images and lock files, caching is
+            disabled when empty
+        :param ttl: Seconds a rendered image is reused
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self._writes = 0
+
+    def path(self, key):
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", "-".join(str(part) for part in key))
+        return os.path.join(self.directory, name)
+
+    def get(self, key, render, *args, **kwargs):
+        """
+        Return the image cached for `key`, or render(*args, **kwargs) and cache it.
+
+        :param key: Tuple of the normalized request, e.g. ("chart", "BTCUSDT", "4h")
+        """
+        if not self.directory:
+            return render(*args, **kwargs)
+        path = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(path + ".lock", "a")
+        except OSError as e:
+            logger.warning(f"Render cache unavailable: {e}")
+            return render(*args, **kwargs)
+
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._read(path)
+                if data is not None:
+                    return data
+                data = render(*args, **kwargs)
+                if data is not None:
+                    self._write(path, data)
+                return data
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, path, data):
+        try:
+            # Readers never see a partly written image
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not cache {path}: {e}")
+            return
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        """
+        Remove the images that expired more than a minute ago, and the lock
+        files of the keys left without an image.
+        """
+        cutoff = time.time() - self.ttl - 60
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        locks = []
+        for entry in entries:
+            if entry.name.endswith(".lock"):
+                locks.append(entry)
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+        for entry in locks:
+            try:
+                # Lock files are never written, their time is their creation
+                if os.path.exists(entry.path[:-len(".lock")]) or entry.stat().st_mtime >= cutoff:
+                    continue
+                self._remove_lock(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_lock(path):
+        with open(path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # A render holds it
+            # A process that opened it before the removal may still render
+            # the key a second time, nothing worse
+            os.remove(path)
+
+def shared(key, cache=None):
+    """
+    Decorator caching a render function's result across processes (see RenderCache).
+
+    :param key: Callable building the request key from the call's arguments
+    :param cache: RenderCache to use, the shared `render_cache` by default
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return (cache or render_cache).get(key(*args, **kwargs), func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Shared by every handler and job of the process
+render_cache = RenderCache(RENDER_CACHE_PATH, ttl=RENDER_CACHE_TTL)
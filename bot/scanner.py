@@ -0,0 +1,191 @@
+import json
+import logging
+from datetime import datetime
+
+import ccxt
+import numpy as np
+
+from bot.database import ScanResult, Session
+from bot.exchanges import get_exchange
+from bot.market_data import MarketData, market_data
+from bot.streaming_indicators import indicator_states
+from config.settings import (
+    CANDLE_CACHE_SIZE,
+    CANDLE_MIN_REFRESH,
+    SCAN_EXCHANGE,
+    SCAN_TIMEFRAMES,
+    SCAN_TOP,
+    SCAN_UNIVERSE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def composite_scores(rsi, obv, previous_obv, mfi, histogram, previous_histogram):
+    """
+    Composite signal scores of /signal, for arrays of indicator values.
+
+    RSI overbought/oversold counts 1.5, OBV rising/falling, MFI
+    overbought/oversold and MACD histogram rising/falling count 1 each.
+    Indicators still warming up (NaN) count 0.
+    """
+    rsi, mfi = np.asarray(rsi), np.asarray(mfi)
+    with np.errstate(invalid="ignore"):
+        score = 1.5 * (rsi < 30) - 1.5 * (rsi > 70)
+        score += (mfi < 20).astype(float) - (mfi > 80)
+        score += np.nan_to_num(np.sign(np.asarray(obv) - previous_obv))
+        score += np.nan_to_num(np.sign(np.asarray(histogram) - previous_histogram))
+    return score
+
+
+def rank(symbols, scores, rsi, top=10):
+    """
+    Return the (bullish, bearish) entries with the highest and lowest scores.
+
+    Symbols are given most liquid first, which breaks ties between equal scores.
+    """
+    entries = [
+        {"symbol": symbol, "score": float(score),
+         "rsi": None if np.isnan(value) else round(float(value), 2)}
+        for symbol, score, value in zip(symbols, scores, rsi)
+    ]
+    bullish = sorted((entry for entry in entries if entry["score"] > 0), key=lambda entry: -entry["score"])
+    bearish = sorted((entry for entry in entries if entry["score"] < 0), key=lambda entry: entry["score"])
+    return bullish[:top], bearish[:top]
+
+
+class MarketScanner:
+    """
+    Scores the whole tracked universe with the /signal composite score.
+
+    The universe is the `universe_size` spot USDT markets of the exchange with
+    the highest 24h quote volume. `scan` is meant to run periodically: a
+    timeframe is only rescanned once a new candle has closed, each series
+    then advances its indicator state (see bot.streaming_indicators) by the
+    candles that closed, and the scores of all the symbols are computed at
+    once from the latest indicator values. The ranking is stored in the
+    scan_results table, so /scan on any consumer replica is a single row
+    lookup.
+    """
+
+    def __init__(self, exchange_id="bybit", timeframes=("1h", "4h", "1d"), universe_size=200, top=10):
+        """
+        :param exchange_id: Exchange the candles are fetched from
+        :param timeframes: Timeframes to scan
+        :param universe_size: Number of markets scanned
+        :param top: Number of bullish and bearish symbols kept
+        """
+        self.exchange_id = exchange_id
+        self.timeframes = tuple(timeframes)
+        self.universe_size = universe_size
+        self.top = top
+        # A candle cache of its own, so scanning hundreds of series does not
+        # evict the ones the chart handlers use
+        self.market_data = MarketData(
+            max_series=universe_size * len(self.timeframes),
+            max_candles=CANDLE_CACHE_SIZE,
+            min_refresh=CANDLE_MIN_REFRESH,
+            store=market_data.store,
+            base_timeframes=market_data.base_timeframes,
+            base_candles=market_data.base_candles,
+            default_count=market_data.default_count,
+            fetch_limit=market_data.fetch_limit,
+        )
+        self._next_close = {}
+
+    def universe(self, exchange):
+        """Symbols of the most traded spot USDT markets, most traded first."""
+        markets = [
+            market["symbol"] for market in exchange.markets.values()
+            if market.get("spot") and market.get("active", True) and market.get("quote") == "USDT"
+        ]
+        tickers = exchange.fetch_tickers()
+        markets.sort(key=lambda symbol: (tickers.get(symbol) or {}).get("quoteVolume") or 0, reverse=True)
+        return markets[:self.universe_size]
+
+    def due(self, now):
+        """Timeframes that have a candle closed since they were last scanned."""
+        return [timeframe for timeframe in self.timeframes if now >= self._next_close.get(timeframe, 0)]
+
+    def scan(self):
+        exchange = get_exchange(self.exchange_id)
+        timeframes = self.due(exchange.milliseconds())
+        if not timeframes:
+            return
+        symbols = self.universe(exchange)
+        for timeframe in timeframes:
+            self.scan_timeframe(exchange, symbols, timeframe)
+
+    def scan_timeframe(self, exchange, symbols, timeframe):
+        period = exchange.parse_timeframe(timeframe) * 1000
+        # Same rule as the candle store: a candle is closed once its period is over
+        closed_before = exchange.milliseconds() - period + 1
+
+        # Only the scoring below is vectorized. The candles are collected per
+        # symbol: exchanges have no batched OHLCV request, and each series is
+        # brought up to date (store, cache, then the missing candles) on its own
+        scanned = []
+        values = []
+        for symbol in symbols:
+            try:
+                candles = self.market_data.candles(exchange, symbol, timeframe)
+            except ccxt.BaseError as e:
+                logger.warning(f"Could not scan {symbol} {timeframe}: {e}")
+                continue
+            state = indicator_states.advance(
+                (exchange.id, symbol, timeframe), candles, closed_before
+            )
+            if state.previous is None:
+                continue
+            current, previous = state.values(), state.previous
+            scanned.append((symbol, state.last_timestamp))
+            values.append((
+                current["rsi"], current["obv"], previous["obv"], current["mfi"],
+                current["macd_histogram"], previous["macd_histogram"],
+            ))
+        if not scanned:
+            logger.warning(f"No {timeframe} series to scan")
+            return
+
+        rsi, obv, previous_obv, mfi, histogram, previous_histogram = np.array(values).T
+        scores = composite_scores(rsi, obv, previous_obv, mfi, histogram, previous_histogram)
+        bullish, bearish = rank([symbol for symbol, _ in scanned], scores, rsi, self.top)
+
+        # Candle times differ when a market lags, rescan when the earliest one can close
+        last_closed = min(timestamp for _, timestamp in scanned)
+        self._next_close[timeframe] = last_closed + 2 * period
+        self.save(timeframe, max(timestamp for _, timestamp in scanned), len(scanned), bullish, bearish)
+        logger.info(f"Scanned {len(scanned)} {timeframe} series")
+
+    def save(self, timeframe, candle_time, symbols, bullish, bearish):
+        session = Session()
+        try:
+            session.merge(ScanResult(
+                timeframe=timeframe,
+                candle_time=datetime.utcfromtimestamp(candle_time / 1000),
+                computed_at=datetime.utcnow(),
+                symbols=symbols,
+                bullish=json.dumps(bullish),
+                bearish=json.dumps(bearish),
+            ))
+            session.commit()
+        finally:
+            session.close()
+
+
+def latest_scan(timeframe):
+    """Return the stored ScanResult of a timeframe, or None before its first scan."""
+    session = Session()
+    try:
+        return session.get(ScanResult, timeframe)
+    finally:
+        session.close()
+
+
+# Run by the consumer's leader, see tg_bot_queue_consumer
+market_scanner = MarketScanner(
+    exchange_id=SCAN_EXCHANGE,
+    timeframes=SCAN_TIMEFRAMES,
+    universe_size=SCAN_UNIVERSE_SIZE,
+    top=SCAN_TOP,
+)
@@ -0,0 +1,133 @@
+import functools
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.schedulers.background import BackgroundScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class JobStats:
+    """Run statistics of one periodic job."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    @property
+    def average_duration(self):
+        return self.total_duration / self.runs if self.runs else None
+
+
+class PeriodicScheduler:
+    """
+    Runs the periodic jobs of a process on one APScheduler thread pool.
+
+    Every job runs at most once at a time: a run that is still going when
+    the next one is due makes the scheduler skip that one instead of
+    starting an overlapping run. Runs missed while the process was busy are
+    coalesced into a single run, and a small random jitter keeps the jobs
+    of several processes from firing in lockstep. The duration of each run
+    is logged and kept in `stats`.
+
+    With a LeaderLease, jobs added with `leader_only=True` only run in the
+    process that currently holds the lease, so running several replicas does
+    not run them several times. The lease is refreshed every
+    `lease_interval` seconds.
+    """
+
+    def __init__(self, max_workers=4, leader=None, lease_interval=10):
+        self.scheduler = BackgroundScheduler(
+            executors={"default": {"type": "threadpool", "max_workers": max_workers}},
+            job_defaults={"max_instances": 1, "coalesce": True},
+            timezone="UTC",
+        )
+        self.scheduler.add_listener(
+            self._on_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+        )
+        self.stats = {}
+        self.leader = leader
+        self._lock = threading.Lock()
+        if leader is not None:
+            self.add_job(leader.refresh, lease_interval, name="leader_lease", jitter=0)
+
+    def add_job(self, func, seconds, name=None, jitter=None, run_now=True, leader_only=False):
+        """
+        Run a function every `seconds` seconds.
+
+        :param name: Job name used in logs and stats, defaults to the function name
+        :param jitter: Maximum random delay of each run in seconds,
+            defaults to a tenth of the interval
+        :param run_now: Start the first run right away instead of after one interval
+        :param leader_only: Only run while this process holds the leader lease
+        """
+        name = name or func.__name__
+        self.stats[name] = JobStats()
+        options = {}
+        if run_now:
+            options["next_run_time"] = datetime.now(timezone.utc)
+        self.scheduler.add_job(
+            functools.partial(self._run, name, func, leader_only),
+            "interval",
+            seconds=seconds,
+            id=name,
+            name=name,
+            jitter=seconds / 10 if jitter is None else jitter,
+            # A run that could not start within one interval is dropped,
+            # the next one is due by then anyway
+            misfire_grace_time=max(1, int(seconds)),
+            **options,
+        )
+
+    def _run(self, name, func, leader_only=False):
+        if leader_only and self.leader is not None and not self.leader.is_leader:
+            logger.debug(f"Not the leader, skipping periodic job {name}")
+            return
+        stats = self.stats[name]
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            with self._lock:
+                stats.failures += 1
+            logger.exception(f"Periodic job {name} failed")
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                stats.runs += 1
+                stats.last_duration = duration
+                stats.max_duration = max(stats.max_duration, duration)
+                stats.total_duration += duration
+            logger.info(f"Periodic job {name} took {duration:.2f}s")
+
+    def _on_skipped(self, event):
+        stats = self.stats.get(event.job_id)
+        if stats is not None:
+            with self._lock:
+                stats.skipped += 1
+        # APScheduler logs these as well, they are counted for the stats
+        logger.debug(
+            f"Skipped a run of periodic job {event.job_id}, the previous run is still going"
+            if event.code == EVENT_JOB_MAX_INSTANCES
+            else f"Missed a run of periodic job {event.job_id}"
+        )
+
+    def start(self):
+        if self.leader is not None:
+            # Know whether this process leads before the first runs are due
+            self.leader.refresh()
+        self.scheduler.start()
+        logger.info(f"Started periodic jobs: {', '.join(self.stats)}")
+
+    def shutdown(self, wait=True):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=wait)
+        if self.leader is not None:
+            self.leader.release()
@@ -1,11 +1,11 @@
-import ccxt
-from decimal import Decimal
 
 from telegram.ext import CallbackContext
 from telegram.error import BadRequest
 
 # setup database
 from bot.database import PriceAlertRequest, Session, PatternData, User
+from bot.exchanges import get_exchange
+from bot.alert_book import alert_book
 
 # setup logging
 import logging
@@ -17,30 +17,74 @@ class PriceAlerts:
     @staticmethod
     def check_price_alerts(bot):
         session = Session()
-        price_alert_requests = session.query(PriceAlertRequest).all()
-
-        to_delete = []
-        for price_alert_request in price_alert_requests:
-            exchange = ccxt.bybit()
-            ticker = exchange.fetch_ticker(price_alert_request.symbol)
-            current_price = ticker["last"]
-
-            # If the current price is within 0.5% of the price alert request, send a message to the user
-            if current_price >= price_alert_request.price_level * Decimal(
-                "0.995"
-            ) and current_price <= price_alert_request.price_level * Decimal("1.005"):
+        try:
+            alert_book.sync(session, PriceAlertRequest)
+            exchange = get_exchange("bybit")
+
+            # One ticker request for every market that has alerts
+            markets = [market for market in alert_book.markets() if market in exchange.markets]
+            if not markets:
+                return
+            tickers = exchange.fetch_tickers(markets)
+
+            for market, ticker in tickers.items():
+                if ticker.get("last") is None:
+                    continue
+                current_price = ticker["last"]
+
+                # Alerts whose level the price crossed since the last check, or is within 0.5% of
+                for alert in alert_book.update_price(market, current_price):
+                    PriceAlerts.notify(bot, alert, current_price, session)
+        finally:
+            session.close()
+
+    @staticmethod
+    def notify(bot, alert, current_price, session=None):
+        """
+        Delete a triggered alert and tell its user, unless it is already gone.
+
+        Deleting the row claims the alert, so only one process sends it. If
+        the message cannot be sent, the row is put back and the alert triggers
+        again at a later check.
+        """
+        own_session = session is None
+        if own_session:
+            session = Session()
+        try:
+            # Another process may have removed or triggered the alert already
+            if not session.query(PriceAlertRequest).filter_by(id=alert.alert_id).delete():
+                return
+            session.commit()
+            try:
                 bot.send_message(
-                    chat_id=price_alert_request.user_id,
-                    text=f"🔔 Price Alert! 🔔\n\nThe price of {price_alert_request.symbol} has reached your set level of {price_alert_request.price_level}. The current price is now: {current_price}.",
+                    chat_id=alert.user_id,
+                    text=f"🔔 Price Alert! 🔔\n\nThe price of {alert.symbol} has reached your set level of {alert.price_level}. The current price is now: {current_price}.",
                 )
+            except Exception as e:
+                logger.error(f"Failed to send price alert {alert.alert_id} to user {alert.user_id}, keeping it: {e}")
+                session.add(
+                    PriceAlertRequest(
+                        id=alert.alert_id,
+                        user_id=alert.user_id,
+                        symbol=alert.symbol,
+                        price_level=alert.price_level,
+                    )
+                )
+                session.commit()
+                alert_book.add(alert)
+        finally:
+            if own_session:
+                session.close()
 
-                # Add the price alert request to the list of requests to be deleted
-                to_delete.append(price_alert_request)
-
-        # Delete all the price alert requests in the list
-        for alert in to_delete:
-            session.delete(alert)
-        session.commit()
+    @staticmethod
+    def sync_price_stream(source):
+        """Catch up with the alert table and stream the markets that have alerts."""
+        session = Session()
+        try:
+            alert_book.sync(session, PriceAlertRequest)
+        finally:
+            session.close()
+        source.subscribe(alert_book.markets())
 
 
 
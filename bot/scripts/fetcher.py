@@ -1,12 +1,13 @@
 from sqlalchemy import create_engine, Column, Integer, String, DateTime
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-import requests
 from datetime import datetime
 import hashlib
 
 from config.settings import X_RAPIDAPI_KEY
 from config.settings import MY_POSTGRESQL_URL
+from bot.budget import BudgetExceeded
+from bot.http_client import http_client
 
 # Set up database
 engine = create_engine(MY_POSTGRESQL_URL)
@@ -36,7 +37,11 @@ def fetch_pattern_data(context=None):
     session = Session()
 
     for symbol in symbols:
-        response = requests.get(url.format(symbol), headers=headers)
+        # Runs as a background job, so it is the first to be refused
+        try:
+            response = http_client.get(url.format(symbol), headers=headers, provider="rapidapi")
+        except BudgetExceeded:
+            break
         data = response.json()
 
         timestamp = datetime.fromtimestamp(data['timestamp'] / 1000)
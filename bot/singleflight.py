@@ -0,0 +1,83 @@
+import functools
+import threading
+
+
+class _Call:
+    # A computation in flight and its outcome
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key.
+
+    The first caller of a key runs the computation; callers arriving while
+    it is in flight wait for it and get the same result (or exception)
+    instead of running it again. Nothing is kept once the call completes,
+    so a later caller computes afresh; caching stays with the callers.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs), or wait for the call in flight for `key`.
+
+        :param key: Hashable key of the normalized request, e.g.
+            ("chart", "BTCUSDT", "4h")
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """Number of calls currently in flight."""
+        with self._lock:
+            return len(self._calls)
+
+
+def coalesce(key, flight=None):
+    """
+    Decorator coalescing concurrent calls of a function (see SingleFlight).
+
+    :param key: Callable building the request key from the call's arguments
+    :param flight: SingleFlight to use, the shared `flights` by default
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return (flight or flights).do(key(*args, **kwargs), func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Shared by every handler and job of the process, keys start with the kind
+# of request ("chart", "technical-study", ...)
+flights = SingleFlight()
@@ -0,0 +1,247 @@
+import collections
+import math
+import threading
+
+from bot import indicators
+from bot.market_data import TIMESTAMP, HIGH, LOW, CLOSE, VOLUME
+
+NAN = float("nan")
+
+# Incremental versions of the indicators of bot.indicators. Each update takes
+# O(1) time and performs the same floating point operations, in the same
+# order, as the batch functions, so after feeding the same candles the values
+# are bit for bit equal to the last values of the batch computation.
+
+
+def sign(value):
+    return (value > 0) - (value < 0)
+
+
+class WindowSum:
+    """Sum of the last `period` values, from running prefix sums."""
+
+    def __init__(self, period):
+        self.period = period
+        self.total = 0.0
+        self.prefixes = collections.deque([0.0], maxlen=period + 1)
+
+    def update(self, value):
+        self.total = self.total + value
+        self.prefixes.append(self.total)
+        if len(self.prefixes) <= self.period:
+            return NAN
+        return self.total - self.prefixes[0]
+
+
+class SMA:
+    def __init__(self, period):
+        self.period = period
+        self.sums = WindowSum(period)
+        self.value = NAN
+
+    def update(self, value):
+        self.value = self.sums.update(value) / self.period
+        return self.value
+
+
+class EMA:
+    """EMA seeded with the SMA of the first `period` values."""
+
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = 2.0 / (period + 1) if alpha is None else alpha
+        self.count = 0
+        self.seed = 0.0
+        self.value = NAN
+
+    def update(self, value):
+        self.count += 1
+        if self.count < self.period:
+            self.seed = self.seed + value
+        elif self.count == self.period:
+            self.seed = self.seed + value
+            self.value = self.seed / self.period
+        else:
+            self.value = self.value + self.alpha * (value - self.value)
+        return self.value
+
+
+class RMA(EMA):
+    """Wilder's moving average."""
+
+    def __init__(self, period):
+        super().__init__(period, alpha=1.0 / period)
+
+
+class RSI:
+    def __init__(self, period=14):
+        self.gains = RMA(period)
+        self.losses = RMA(period)
+        self.previous = None
+        self.value = NAN
+
+    def update(self, close):
+        if self.previous is not None:
+            change = close - self.previous
+            avg_gain = self.gains.update(change if change > 0 else 0.0)
+            avg_loss = self.losses.update(-change if change < 0 else 0.0)
+            if math.isnan(avg_gain):
+                self.value = NAN
+            elif avg_loss == 0:
+                self.value = 100.0
+            else:
+                self.value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        self.previous = close
+        return self.value
+
+
+class OBV:
+    def __init__(self):
+        self.previous = None
+        self.value = 0.0
+
+    def update(self, close, volume):
+        direction = 0 if self.previous is None else sign(close - self.previous)
+        self.value = self.value + float(direction) * volume
+        self.previous = close
+        return self.value
+
+
+class MFI:
+    def __init__(self, period=14):
+        self.period = period
+        self.positive = WindowSum(period)
+        self.negative = WindowSum(period)
+        self.previous = None
+        self.count = 0
+        self.value = NAN
+
+    def update(self, high, low, close, volume):
+        typical = (high + low + close) / 3.0
+        flow = typical * volume
+        direction = 0 if self.previous is None else sign(typical - self.previous)
+        positive = self.positive.update(flow if direction > 0 else 0.0)
+        negative = self.negative.update(flow if direction < 0 else 0.0)
+        self.previous = typical
+        self.count += 1
+        # The first candle has no direction, so its window is not complete
+        if self.count <= self.period:
+            self.value = NAN
+        elif negative == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + positive / negative)
+        return self.value
+
+
+class MACD:
+    def __init__(self, fast=5, slow=8, signal=3):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, close):
+        line = self.fast.update(close) - self.slow.update(close)
+        if math.isnan(line):
+            return self.value
+        signal = self.signal.update(line)
+        self.value = (line, signal, line - signal)
+        return self.value
+
+
+class IndicatorSet:
+    """
+    The indicators of one series (RSI 14, OBV, MFI 14, MACD 5/8/3, SMA 21/50),
+    advanced one closed candle at a time.
+    """
+
+    def __init__(self):
+        self.rsi = RSI(14)
+        self.obv = OBV()
+        self.mfi = MFI(14)
+        self.macd = MACD(5, 8, 3)
+        self.sma21 = SMA(21)
+        self.sma50 = SMA(50)
+        self.last_timestamp = None
+        # Values before the last candle, to tell rising from falling
+        self.previous = None
+
+    def update(self, candle):
+        self.previous = self.values()
+        close, volume = float(candle[CLOSE]), float(candle[VOLUME])
+        self.rsi.update(close)
+        self.obv.update(close, volume)
+        self.mfi.update(float(candle[HIGH]), float(candle[LOW]), close, volume)
+        self.macd.update(close)
+        self.sma21.update(close)
+        self.sma50.update(close)
+        self.last_timestamp = candle[TIMESTAMP]
+
+    def values(self):
+        macd, signal, histogram = self.macd.value
+        return {
+            "rsi": self.rsi.value,
+            "obv": self.obv.value,
+            "mfi": self.mfi.value,
+            "macd": macd,
+            "macd_signal": signal,
+            "macd_histogram": histogram,
+            "sma21": self.sma21.value,
+            "sma50": self.sma50.value,
+        }
+
+
+def batch_values(candles):
+    """Last values of the batch indicators, to check an IndicatorSet against."""
+    close, volume = candles[:, CLOSE], candles[:, VOLUME]
+    macd, signal, histogram = indicators.macd(close, 5, 8, 3)
+    return {
+        "rsi": float(indicators.rsi(close, 14)[-1]),
+        "obv": float(indicators.obv(close, volume)[-1]),
+        "mfi": float(indicators.mfi(candles[:, HIGH], candles[:, LOW], close, volume, 14)[-1]),
+        "macd": float(macd[-1]),
+        "macd_signal": float(signal[-1]),
+        "macd_histogram": float(histogram[-1]),
+        "sma21": float(indicators.sma(close, 21)[-1]),
+        "sma50": float(indicators.sma(close, 50)[-1]),
+    }
+
+
+class IndicatorStates:
+    """
+    Indicator state per series, advanced with the candles that closed since
+    the last call, so tracking a series costs O(1) per closed candle.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def advance(self, key, candles, closed_before):
+        """
+        Feed the closed candles of a series that the state has not seen yet.
+
+        :param key: Series key, e.g. (exchange_id, symbol, timeframe)
+        :param candles: Candle array of the series (see bot.market_data)
+        :param closed_before: Only candles opened before this timestamp (ms) are closed
+        :return: The series' IndicatorSet
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None or (
+                # The cached window moved past the state, start over
+                len(candles) and state.last_timestamp is not None
+                and candles[0, TIMESTAMP] > state.last_timestamp
+            ):
+                state = self._states[key] = IndicatorSet()
+            for candle in candles:
+                if candle[TIMESTAMP] >= closed_before:
+                    break
+                if state.last_timestamp is None or candle[TIMESTAMP] > state.last_timestamp:
+                    state.update(candle)
+            return state
+
+
+# Shared by the scanners of the process
+indicator_states = IndicatorStates()
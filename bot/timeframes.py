@@ -0,0 +1,80 @@
+import re
+
+import numpy as np
+
+# Candle timeframes in ccxt notation ("15m", "4h", "3d", "1w", "1M") and
+# their boundaries, as the exchanges align them: fixed-length timeframes
+# from the Unix epoch in UTC, weeks from Monday 00:00 UTC and months (and
+# years) on calendar months.
+
+SECOND = 1000
+UNIT_MS = {"s": SECOND, "m": 60 * SECOND, "h": 3600 * SECOND, "d": 86400 * SECOND, "w": 7 * 86400 * SECOND}
+# The epoch is a Thursday, weeks start 4 days later
+MONDAY = 4 * UNIT_MS["d"]
+# Calendar units, in months, and their nominal length in days
+CALENDAR_UNITS = {"M": 1, "y": 12}
+CALENDAR_DAYS = {"M": 30, "y": 365}
+
+TIMEFRAME = re.compile(r"^(\d+)([smhdwMy])$")
+
+
+def parse(timeframe):
+    """Split a timeframe into (amount, unit): "15m" gives (15, "m")."""
+    match = TIMEFRAME.match(timeframe or "")
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+    return int(match.group(1)), match.group(2)
+
+
+def is_valid(timeframe):
+    try:
+        parse(timeframe)
+    except ValueError:
+        return False
+    return True
+
+
+def duration(timeframe):
+    """Length of a timeframe in ms (30 days per month, 365 per year, like ccxt)."""
+    amount, unit = parse(timeframe)
+    if unit in CALENDAR_UNITS:
+        return amount * CALENDAR_DAYS[unit] * UNIT_MS["d"]
+    return amount * UNIT_MS[unit]
+
+
+def bucket_starts(timestamps, timeframe):
+    """Open time (ms) of the `timeframe` candle containing each timestamp (ms)."""
+    amount, unit = parse(timeframe)
+    timestamps = np.asarray(timestamps).astype(np.int64)
+    if unit in CALENDAR_UNITS:
+        months = timestamps.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+        step = amount * CALENDAR_UNITS[unit]
+        months = months // step * step
+        return months.astype("datetime64[M]").astype("datetime64[ms]").astype(np.int64)
+    period = amount * UNIT_MS[unit]
+    offset = MONDAY if unit == "w" else 0
+    return (timestamps - offset) // period * period + offset
+
+
+def divides(base, timeframe):
+    """Whether every `timeframe` candle is made of whole `base` candles."""
+    base_amount, base_unit = parse(base)
+    amount, unit = parse(timeframe)
+    if base_unit in CALENDAR_UNITS:
+        return unit in CALENDAR_UNITS and (
+            amount * CALENDAR_UNITS[unit] % (base_amount * CALENDAR_UNITS[base_unit]) == 0
+        )
+    base_period = base_amount * UNIT_MS[base_unit]
+    if unit in CALENDAR_UNITS or unit == "w":
+        # Weeks and months start at midnight
+        return UNIT_MS["d"] % base_period == 0
+    return (amount * UNIT_MS[unit]) % base_period == 0
+
+
+def base_for(timeframe, bases):
+    """
+    Return the longest of `bases` that `timeframe` candles can be built from,
+    or None.
+    """
+    candidates = [base for base in bases if divides(base, timeframe) and duration(base) <= duration(timeframe)]
+    return max(candidates, key=duration, default=None)
@@ -5,9 +5,8 @@ from users.management import check_user_access
 import ccxt
 import plotly.graph_objects as go
 import numpy as np
-import pandas as pd
-import ta
 import os
+import io
 from datetime import datetime, timedelta
 import requests
 from config.settings import LUNARCRUSH_API_KEY
@@ -15,6 +14,13 @@ from config.settings import LUNARCRUSH_API_KEY
 
 import functools
 from bot.database import Session, CommandUsage
+from bot.jobs import job_handler, update_progress, delete_progress
+from bot.market_data import market_data, to_frame, CLOSE
+from bot import indicators, timeframes
+from bot.exchanges import get_exchange
+from bot.market_catalog import market_catalog, normalize
+from bot.singleflight import coalesce
+from bot.render_cache import shared
 
 
 def restricted(func):
@@ -84,25 +90,26 @@ def command_usage_example(example_text: str):
     return decorator
 
 
+def chart_key(symbol, time_frame):
+    """Key of a chart render, the same for every spelling of a market ("btc", "BTC/USDT", "BTCUSDT")."""
+    listing = market_catalog.find(symbol)
+    return ("chart", normalize(listing.symbol if listing is not None else symbol), time_frame)
+
+
 class PlotChart:
     @staticmethod
+    @coalesce(chart_key)
+    @shared(chart_key)
     def plot_ohlcv_chart(symbol, time_frame):
-        # Define the list of exchanges
-        exchanges = [
-            ccxt.binance(),
-            ccxt.bybit(),
-            ccxt.kucoin(),
-        ]
-
-        # Fetch OHLCV data from the first exchange that supports the market
-        for exchange in exchanges:
-            try:
-                ohlcv = exchange.fetch_ohlcv(symbol.upper(), time_frame)
-                break
-            except ccxt.BaseError:
-                continue
-        else:
+        # Concurrent requests for the same chart share one render, within the
+        # process (see bot.singleflight) and across the job worker processes
+        # (see bot.render_cache)
+        # Exchanges listing the market, most preferred first
+        listings = market_catalog.resolve(symbol)
+        if not listings:
             return None  # Return None if no exchange supports the market
+        if not timeframes.is_valid(time_frame):
+            return None
 
         # Define the time horizon for each time frame
         time_horizon = {
@@ -115,37 +122,41 @@ class PlotChart:
             "1w": timedelta(weeks=80),
             "1M": timedelta(weeks=324),
         }
-
-        # Filter data based on the selected time frame
-        start_time = datetime.now() - time_horizon.get(time_frame, timedelta(weeks=4))
-        ohlcv = [
-            entry
-            for entry in ohlcv
-            if datetime.fromtimestamp(entry[0] // 1000) >= start_time
-        ]
-
-        # Convert timestamp to datetime objects
-        for entry in ohlcv:
-            entry[0] = datetime.fromtimestamp(entry[0] // 1000)
-
-        # Create a DataFrame and set 'Date' as the index
-        df = pd.DataFrame(
-            ohlcv, columns=["Date", "Open", "High", "Low", "Close", "Volume"]
+        # Other (resampled) timeframes show their last 120 candles
+        horizon = time_horizon.get(
+            time_frame, timedelta(milliseconds=timeframes.duration(time_frame) * 120)
         )
-        df.set_index("Date", inplace=True)
+        start_time = datetime.utcnow() - horizon
+
+        # Fetch OHLCV data from the first exchange that supports the market,
+        # from the SMA50 warm-up before the chart on. Long ranges are read
+        # from the candle store rather than the in-memory window.
+        warm_up_start = start_time - timedelta(milliseconds=timeframes.duration(time_frame) * 50)
+        for listing in listings:
+            try:
+                candles = market_data.history(
+                    get_exchange(listing.exchange_id), listing.symbol, time_frame, warm_up_start
+                )
+                break
+            except ccxt.BaseError:
+                continue
+        else:
+            return None  # Return None if no exchange supports the market
 
-        # Add RSI
-        delta = df["Close"].diff()
-        gain, loss = delta.where(delta > 0, 0), delta.where(delta < 0, 0).abs()
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        df["RSI"] = rsi
+        # Add RSI and moving averages, computed over the warm-up too so the
+        # lines start at the left edge of the chart
+        close = candles[:, CLOSE]
+        indicator_columns = {
+            "RSI": indicators.rsi(close, 14),
+            "SMA21": indicators.sma(close, 21),
+            "SMA50": indicators.sma(close, 50),
+        }
+        df = to_frame(candles)
+        for name, values in indicator_columns.items():
+            df[name] = values
 
-        # Add moving averages
-        df["SMA21"] = ta.trend.sma_indicator(df["Close"], window=21)
-        df["SMA50"] = ta.trend.sma_indicator(df["Close"], window=50)
+        # Filter data based on the selected time frame
+        df = df[df.index >= start_time]
 
         # Create a Plotly figure
         fig = go.Figure()
@@ -200,8 +211,34 @@ class PlotChart:
             margin=dict(b=40, t=40, r=40, l=40),
         )
 
-        # Save the chart as a PNG image
-        chart_file = f"charts/{symbol}_chart_{time_frame}.png"
-        fig.write_image(chart_file, scale=1.5, width=1000, height=600)
+        # Render the chart as PNG bytes, no file is shared between renders
+        return fig.to_image(format="png", scale=1.5, width=1000, height=600)
+
+
+@job_handler("chart")
+def send_chart(bot, job):
+    """
+    Render an OHLCV chart in a job worker and send it to the chat.
+
+    Job params: symbol, time_frame and optionally caption (sent with the
+    photo) and not_found_text (sent when no exchange lists the symbol).
+    """
+    params = job["params"]
+    update_progress(bot, job, f"Generating {params['symbol']} chart...")
+
+    chart = PlotChart.plot_ohlcv_chart(params["symbol"], params["time_frame"])
+    if chart is None:
+        delete_progress(bot, job)
+        bot.send_message(
+            chat_id=job["chat_id"],
+            text=params.get("not_found_text")
+            or "Symbol not listed on available exchanges.",
+        )
+        return
+
+    update_progress(bot, job, "Sending chart...")
+    bot.send_photo(
+        chat_id=job["chat_id"], photo=io.BytesIO(chart), caption=params.get("caption")
+    )
 
-        return chart_file
+    delete_progress(bot, job)
@@ -0,0 +1,100 @@
+import hmac
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """
+    Receives Telegram webhook calls and hands every update to the server's
+    `on_update` callback.
+
+    Responses follow what Telegram expects: 200 once the update has been
+    accepted, 403 when the secret token does not match, 400 for a body that
+    is not an update, and 503 when the update could not be accepted right now
+    or 500 when accepting it failed (Telegram then redelivers it later).
+    """
+
+    def _respond(self, status, text=""):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Health check for load balancers
+        if self.path == "/health":
+            self._respond(200, "OK")
+        else:
+            self._respond(404, "Not Found")
+
+    def do_POST(self):
+        if self.path != self.server.webhook_path:
+            self._respond(404, "Not Found")
+            return
+
+        if not hmac.compare_digest(
+            self.headers.get(SECRET_TOKEN_HEADER, ""), self.server.secret_token
+        ):
+            logger.warning(f"Rejected webhook call from {self.client_address[0]}")
+            self._respond(403, "Forbidden")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            update_dict = json.loads(self.rfile.read(length).decode("utf-8"))
+            if not isinstance(update_dict, dict) or "update_id" not in update_dict:
+                raise ValueError("not an update")
+        except ValueError as err:
+            logger.error(f"Invalid webhook body: {err}")
+            self._respond(400, "Bad Request")
+            return
+
+        try:
+            accepted = self.server.on_update(update_dict)
+        except Exception:
+            logger.exception(f"Could not accept update {update_dict['update_id']}")
+            self._respond(500, "Internal Server Error")
+            return
+        if not accepted:
+            self._respond(503, "Busy")
+            return
+        self._respond(200, "OK")
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.client_address[0], format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Small HTTP server for Telegram webhook ingestion.
+
+    It holds no state besides the callback, so any number of replicas can run
+    behind a load balancer. It can be exercised with any local HTTP client by
+    posting update JSON to `webhook_path`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, on_update, secret_token=None, webhook_path="/telegram"):
+        """
+        :param address: (host, port) to listen on
+        :param on_update: Callable taking the update dict; returns False if the
+            update could not be accepted
+        :param secret_token: Expected value of the secret token header
+        :param webhook_path: Path Telegram posts updates to
+        :raises ValueError: Without a secret token
+        """
+        if not secret_token:
+            # The endpoint is public, anyone could post forged updates
+            raise ValueError("The webhook server needs a secret token")
+        super().__init__(address, WebhookRequestHandler)
+        self.on_update = on_update
+        self.secret_token = secret_token
+        self.webhook_path = webhook_path
@@ -0,0 +1,95 @@
+import json
+import zlib
+
+from config.settings import WIRE_COMPRESSION, WIRE_COMPRESSION_MIN_BYTES
+
+# Wire format of the updates queued between the publisher and the consumer.
+# v1 is compact JSON holding only the update fields the handlers read,
+# optionally deflate-compressed (signalled by the content encoding).
+CONTENT_TYPE = "application/vnd.cryptosentinel.update.v1+json"
+# Updates published before the wire format was versioned: full PTB JSON
+LEGACY_CONTENT_TYPES = (None, "application/json")
+DEFLATE = "deflate"
+
+# Fields kept for each object, with the projection of nested objects
+# (None keeps the value as is)
+USER_FIELDS = {"id": None, "is_bot": None, "first_name": None, "username": None}
+CHAT_FIELDS = {"id": None, "type": None}
+ENTITY_FIELDS = {"type": None, "offset": None, "length": None}
+MESSAGE_FIELDS = {
+    "message_id": None,
+    "date": None,
+    "chat": CHAT_FIELDS,
+    "from": USER_FIELDS,
+    "text": None,
+    "entities": ENTITY_FIELDS,
+    "successful_payment": None,
+}
+UPDATE_FIELDS = {
+    "update_id": None,
+    "message": MESSAGE_FIELDS,
+    "edited_message": MESSAGE_FIELDS,
+    "callback_query": {
+        "id": None,
+        "from": USER_FIELDS,
+        "chat_instance": None,
+        "data": None,
+        "message": MESSAGE_FIELDS,
+    },
+    "pre_checkout_query": {
+        "id": None,
+        "from": USER_FIELDS,
+        "currency": None,
+        "total_amount": None,
+        "invoice_payload": None,
+    },
+}
+
+
+def project(value, fields):
+    """Keep only the given fields of a (list of) dict, recursively."""
+    if fields is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    return {
+        key: project(value[key], sub_fields)
+        for key, sub_fields in fields.items()
+        if value.get(key) is not None
+    }
+
+
+def project_update(update_dict):
+    """
+    Trim an update to the fields the handlers use.
+
+    Update types the bot has no handler for are passed on untouched.
+    """
+    if not any(key in update_dict for key in UPDATE_FIELDS if key != "update_id"):
+        return update_dict
+    return project(update_dict, UPDATE_FIELDS)
+
+
+def encode_update(update_dict):
+    """
+    Serialize an update for the queue.
+
+    :return: (body, content_type, content_encoding)
+    """
+    body = json.dumps(
+        project_update(update_dict), separators=(",", ":"), default=str
+    ).encode("utf-8")
+    if WIRE_COMPRESSION and len(body) >= WIRE_COMPRESSION_MIN_BYTES:
+        return zlib.compress(body), CONTENT_TYPE, DEFLATE
+    return body, CONTENT_TYPE, None
+
+
+def decode_update(body, content_type=None, content_encoding=None):
+    """Deserialize a queued update into a dict ready for telegram.Update.de_json."""
+    if content_type != CONTENT_TYPE and content_type not in LEGACY_CONTENT_TYPES:
+        raise ValueError(f"Unsupported update content type: {content_type}")
+    if content_encoding == DEFLATE:
+        body = zlib.decompress(body)
+    elif content_encoding is not None:
+        raise ValueError(f"Unsupported update content encoding: {content_encoding}")
+    return json.loads(body)
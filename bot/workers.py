@@ -0,0 +1,222 @@
+import collections
+import contextlib
+import heapq
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Chat key of the item that stops a worker
+_STOP = object()
+
+# Pool and shard of the worker running on the current thread
+_current = threading.local()
+
+
+class _Shard:
+    # Items waiting on one worker: a FIFO per chat, and a heap of the chats
+    # that have items, by the priority and sequence of their oldest item.
+    # A chat whose item is running keeps its FIFO but is off the heap until
+    # the item is done. `threads` serve the shard, `blocked` of them are in
+    # a long wait (see blocking)
+    def __init__(self, index):
+        self.index = index
+        self.chats = {}
+        self.ready = []
+        self.condition = threading.Condition()
+        self.threads = 0
+        self.blocked = 0
+
+
+@contextlib.contextmanager
+def blocking():
+    """
+    Context manager around a long wait of the item running on this thread.
+
+    Other chats of the worker's shard don't wait behind it: a spare thread
+    serves them meanwhile, and retires once the wait is over. The items of
+    the waiting chat stay queued behind the running one. Does nothing
+    outside of a ChatWorkerPool worker.
+    """
+    worker = getattr(_current, "worker", None)
+    if worker is None:
+        yield
+        return
+    pool, shard = worker
+    pool._block(shard)
+    try:
+        yield
+    finally:
+        pool._unblock(shard)
+
+
+class ChatWorkerPool:
+    """
+    Fixed-size pool of worker threads that processes updates sharded by chat.
+
+    Every chat is pinned to one worker (chat_id % size), so updates from the
+    same chat are processed one after another in the order they were
+    submitted, while updates from different chats run in parallel. A worker
+    picks the chat whose oldest waiting item has the best priority (then the
+    oldest such item), so priorities order different chats but never the
+    items of one chat: an update in a higher priority lane still waits for
+    the earlier updates of its chat that this pool already received. Updates
+    still in another lane's queue are not waited for (see bot.lanes).
+
+    An item that has to wait a long time (e.g. for a Telegram flood limit)
+    does so in `blocking()`, and up to `spare_threads` extra threads keep
+    its shard going meanwhile.
+    """
+
+    def __init__(self, size, handler, name="update-worker", spare_threads=None):
+        """
+        :param size: Number of worker threads
+        :param handler: Callable invoked with each submitted item
+        :param name: Prefix for the worker thread names
+        :param spare_threads: Most threads started for blocked workers at a
+            time, `size` by default
+        """
+        self.size = max(1, int(size))
+        self.handler = handler
+        self.name = name
+        self.spare_threads = self.size if spare_threads is None else spare_threads
+        self._shards = [_Shard(index) for index in range(self.size)]
+        self._threads = []
+        self._threads_lock = threading.Lock()
+        self._spares = 0
+        self._sequence = itertools.count()
+
+    def start(self):
+        for shard in self._shards:
+            with shard.condition:
+                shard.threads += 1
+            self._start_thread(shard, f"{self.name}-{shard.index}")
+        logger.info(f"Started {self.size} update workers")
+
+    def _start_thread(self, shard, name):
+        thread = threading.Thread(target=self._run, args=(shard,), name=name, daemon=True)
+        with self._threads_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def stop(self, timeout=None):
+        """Let the workers finish their queued items and wait for them to exit."""
+        for shard in self._shards:
+            self._put(shard, _STOP, float("inf"), None)
+        while True:
+            with self._threads_lock:
+                threads = [t for t in self._threads if t.is_alive()]
+                self._threads = threads
+            if not threads:
+                break
+            for thread in threads:
+                thread.join(timeout)
+            if timeout is not None:
+                break
+        self._threads = []
+        self._spares = 0
+
+    def shard_for(self, chat_id):
+        if chat_id is None:
+            return 0
+        return abs(int(chat_id)) % self.size
+
+    def submit(self, chat_id, item, on_done=None, priority=0):
+        """
+        Queue an item on the worker that owns the given chat.
+
+        :param chat_id: Chat the item belongs to, or None for chatless updates
+        :param item: Item passed to the handler
+        :param on_done: Optional callable invoked with (item, error) once the
+            handler has returned; error is None on success
+        :param priority: Items with a lower priority are processed first,
+            unless an earlier item of the same chat is still waiting
+        """
+        self._put(self._shards[self.shard_for(chat_id)], chat_id, priority, (item, on_done))
+
+    def _put(self, shard, chat_id, priority, task):
+        entry = (priority, next(self._sequence), task)
+        with shard.condition:
+            items = shard.chats.get(chat_id)
+            if items is None:
+                items = shard.chats[chat_id] = collections.deque()
+                heapq.heappush(shard.ready, (entry[0], entry[1], chat_id))
+            # A chat with a running item goes back on the heap when it is done
+            items.append(entry)
+            shard.condition.notify()
+
+    def _take(self, shard):
+        # Oldest item of the chat with the best oldest item, or None when the
+        # thread should exit: the pool stops, or the shard has a spare thread
+        # and this one is no longer needed
+        with shard.condition:
+            while True:
+                if shard.threads - shard.blocked > 1:
+                    shard.threads -= 1
+                    with self._threads_lock:
+                        self._spares -= 1
+                    return None
+                if shard.ready:
+                    break
+                shard.condition.wait()
+            if shard.ready[0][2] is _STOP:
+                # Left queued for the other threads of the shard
+                shard.threads -= 1
+                return None
+            _, _, chat_id = heapq.heappop(shard.ready)
+            _, _, task = shard.chats[chat_id].popleft()
+            return chat_id, task
+
+    def _done(self, shard, chat_id):
+        with shard.condition:
+            items = shard.chats[chat_id]
+            if items:
+                heapq.heappush(shard.ready, (items[0][0], items[0][1], chat_id))
+                shard.condition.notify()
+            else:
+                del shard.chats[chat_id]
+
+    def _block(self, shard):
+        with shard.condition:
+            shard.blocked += 1
+            if shard.threads - shard.blocked >= 1:
+                return
+            with self._threads_lock:
+                if self._spares >= self.spare_threads:
+                    return
+                self._spares += 1
+            shard.threads += 1
+        self._start_thread(shard, f"{self.name}-{shard.index}-spare")
+
+    def _unblock(self, shard):
+        with shard.condition:
+            shard.blocked -= 1
+            # Lets a surplus thread retire
+            shard.condition.notify_all()
+
+    def _run(self, shard):
+        _current.worker = (self, shard)
+        while True:
+            taken = self._take(shard)
+            if taken is None:
+                break
+            chat_id, (item, on_done) = taken
+            try:
+                self._process(item, on_done)
+            finally:
+                self._done(shard, chat_id)
+
+    def _process(self, item, on_done):
+        error = None
+        try:
+            self.handler(item)
+        except Exception as err:
+            logger.exception("Error while processing update")
+            error = err
+        if on_done is not None:
+            try:
+                on_done(item, error)
+            except Exception:
+                logger.exception("Error in update completion callback")
@@ -31,3 +31,167 @@ TELEGRAM_IDS = os.getenv("TELEGRAM_IDS")
 
 # Load cloudamqp connection
 CLOUDAMQP_URL = os.getenv("CLOUDAMQP_URL")
+
+# Number of worker threads the queue consumer uses to process updates.
+# Updates are sharded by chat, so each chat is still handled in order.
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+
+# Outgoing Telegram rate limits (messages per second)
+# Telegram allows about 30 messages per second overall, about one message per
+# second in a private chat (with short bursts) and 20 per minute in a group.
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "5"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+TELEGRAM_GROUP_BURST = int(os.getenv("TELEGRAM_GROUP_BURST", "5"))
+
+# RabbitMQ consumer settings
+# Number of unacknowledged updates the broker may push to one consumer
+RABBITMQ_PREFETCH = int(os.getenv("RABBITMQ_PREFETCH", "32"))
+# Processed updates are acknowledged together once this many are ready ...
+RABBITMQ_ACK_BATCH = int(os.getenv("RABBITMQ_ACK_BATCH", "8"))
+# ... or after this many seconds, whichever comes first
+RABBITMQ_ACK_INTERVAL = float(os.getenv("RABBITMQ_ACK_INTERVAL", "0.5"))
+# Queue that receives updates that failed to process (empty to reject them instead)
+RABBITMQ_DEAD_LETTER_QUEUE = os.getenv("RABBITMQ_DEAD_LETTER_QUEUE", "telegram.dead")
+
+# Relative share of the consumer capacity for each update lane
+# (premium subscribers, free cheap commands, free chart/analytics commands)
+PREMIUM_LANE_WEIGHT = int(os.getenv("PREMIUM_LANE_WEIGHT", "6"))
+INTERACTIVE_LANE_WEIGHT = int(os.getenv("INTERACTIVE_LANE_WEIGHT", "3"))
+BULK_LANE_WEIGHT = int(os.getenv("BULK_LANE_WEIGHT", "1"))
+
+# Number of job worker processes rendering charts and running analytics jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Update publisher settings
+# Maximum number of updates buffered while RabbitMQ is unavailable
+PUBLISH_BUFFER_SIZE = int(os.getenv("PUBLISH_BUFFER_SIZE", "1000"))
+# Maximum number of updates published in one batch
+PUBLISH_BATCH_SIZE = int(os.getenv("PUBLISH_BATCH_SIZE", "100"))
+# Long polling timeout for getUpdates, in seconds
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "50"))
+
+# How the publisher receives updates from Telegram: "polling" or "webhook"
+INGEST_MODE = os.getenv("INGEST_MODE", "polling")
+# Public base URL the webhook is registered with (not registered when empty)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Secret token Telegram sends with every webhook call (required in webhook mode)
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_PORT = int(os.getenv("PORT", "8443"))
+
+# Compress queued updates larger than WIRE_COMPRESSION_MIN_BYTES
+WIRE_COMPRESSION = os.getenv("WIRE_COMPRESSION", "true").lower() == "true"
+WIRE_COMPRESSION_MIN_BYTES = int(os.getenv("WIRE_COMPRESSION_MIN_BYTES", "1024"))
+
+# Queue between the publisher, the consumer and the job workers:
+# "rabbitmq", "local" (in-process, single node) or "memory" (tests)
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "rabbitmq")
+# Maximum number of messages held per queue by the local backend
+LOCAL_QUEUE_SIZE = int(os.getenv("LOCAL_QUEUE_SIZE", "10000"))
+
+# Intervals of the consumer's periodic jobs, in seconds
+SUBSCRIPTION_CHECK_INTERVAL = int(os.getenv("SUBSCRIPTION_CHECK_INTERVAL", "300"))
+PRICE_ALERT_INTERVAL = int(os.getenv("PRICE_ALERT_INTERVAL", "30"))
+# Seconds between checks of the leader lease; only the consumer replica holding
+# it runs the periodic jobs, another one takes over within this time when it dies
+LEADER_LEASE_INTERVAL = int(os.getenv("LEADER_LEASE_INTERVAL", "10"))
+
+# OHLCV candle cache: number of series kept, candles kept per series, and seconds
+# during which a series is served from the cache without asking the exchange
+CANDLE_CACHE_SERIES = int(os.getenv("CANDLE_CACHE_SERIES", "256"))
+CANDLE_CACHE_SIZE = int(os.getenv("CANDLE_CACHE_SIZE", "1000"))
+CANDLE_MIN_REFRESH = int(os.getenv("CANDLE_MIN_REFRESH", "10"))
+
+# Shared exchange clients: seconds between market reloads, request timeout in
+# milliseconds, and connections kept alive per exchange
+EXCHANGE_MARKETS_TTL = int(os.getenv("EXCHANGE_MARKETS_TTL", "3600"))
+EXCHANGE_TIMEOUT = int(os.getenv("EXCHANGE_TIMEOUT", "10000"))
+EXCHANGE_POOL_SIZE = int(os.getenv("EXCHANGE_POOL_SIZE", "16"))
+
+# Market catalog: file it is persisted to, exchanges it indexes (most preferred
+# first), seconds after which it is rebuilt, and age in seconds past which a
+# persisted catalog is not used at all
+MARKET_CATALOG_PATH = os.getenv("MARKET_CATALOG_PATH", "charts/market_catalog.json")
+MARKET_CATALOG_EXCHANGES = os.getenv("MARKET_CATALOG_EXCHANGES", "binance,bybit,kucoin").split(",")
+MARKET_CATALOG_MAX_AGE = int(os.getenv("MARKET_CATALOG_MAX_AGE", "21600"))
+MARKET_CATALOG_MAX_STALE = int(os.getenv("MARKET_CATALOG_MAX_STALE", "604800"))
+
+# How price alerts get prices: "polling" (fetch tickers every PRICE_ALERT_INTERVAL),
+# or pushed ticks from "websocket" (exchange stream), "replay" (PRICE_FEED_REPLAY_PATH)
+# or "socket" (tick lines from PRICE_FEED_SOCKET, host:port)
+PRICE_FEED = os.getenv("PRICE_FEED", "polling")
+PRICE_FEED_REPLAY_PATH = os.getenv("PRICE_FEED_REPLAY_PATH", "ticks.jsonl")
+PRICE_FEED_SOCKET = os.getenv("PRICE_FEED_SOCKET", "localhost:9100")
+
+# Directory of the on-disk candle store (empty to keep candles in memory only)
+CANDLE_STORE_PATH = os.getenv("CANDLE_STORE_PATH", "candles")
+
+# Market scanner (/scan): exchange and timeframes scanned, number of most traded
+# USDT markets scored, symbols listed per side, and seconds between checks for
+# closed candles
+SCAN_EXCHANGE = os.getenv("SCAN_EXCHANGE", "bybit")
+SCAN_TIMEFRAMES = os.getenv("SCAN_TIMEFRAMES", "1h,4h,1d").split(",")
+# Timeframe of /scan without an argument
+SCAN_DEFAULT_TIMEFRAME = os.getenv(
+    "SCAN_DEFAULT_TIMEFRAME", "4h" if "4h" in SCAN_TIMEFRAMES else SCAN_TIMEFRAMES[0]
+)
+SCAN_UNIVERSE_SIZE = int(os.getenv("SCAN_UNIVERSE_SIZE", "200"))
+SCAN_TOP = int(os.getenv("SCAN_TOP", "10"))
+SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL", "60"))
+
+# Timeframes fetched from the exchanges; the others are resampled from them
+# (e.g. 5m from 1m, 30m from 15m, 4h and 12h from 1h, 1w and 1M from 1d).
+# Series are only fetched back as far as their readers need, up to
+# CANDLE_BASE_SIZE candles, which the default /chart windows fit in with their
+# indicator warm-up (15m has a base of its own: 3 days of it are ~5000 1m);
+# CANDLE_DEFAULT_COUNT candles of a resampled timeframe are built for readers
+# that don't say how many they need, and history is paged CANDLE_FETCH_LIMIT
+# candles per exchange call (exchanges with a lower limit return fewer)
+CANDLE_BASE_TIMEFRAMES = [timeframe for timeframe in os.getenv("CANDLE_BASE_TIMEFRAMES", "1m,15m,1h,1d").split(",") if timeframe]
+CANDLE_BASE_SIZE = int(os.getenv("CANDLE_BASE_SIZE", "5000"))
+CANDLE_DEFAULT_COUNT = int(os.getenv("CANDLE_DEFAULT_COUNT", "200"))
+CANDLE_FETCH_LIMIT = int(os.getenv("CANDLE_FETCH_LIMIT", "1000"))
+
+# Rendered charts shared by the job worker processes of a host (see
+# bot.render_cache): directory (empty to disable) and seconds they are reused
+RENDER_CACHE_PATH = os.getenv("RENDER_CACHE_PATH", "charts/cache")
+RENDER_CACHE_TTL = int(os.getenv("RENDER_CACHE_TTL", "60"))
+
+# LunarCrush response cache (see bot.lunarcrush): request timeout in seconds,
+# seconds after which an expired response is refetched before answering
+# instead of in the background, and number of responses kept
+LUNARCRUSH_TIMEOUT = int(os.getenv("LUNARCRUSH_TIMEOUT", "20"))
+LUNARCRUSH_MAX_STALE = int(os.getenv("LUNARCRUSH_MAX_STALE", "86400"))
+LUNARCRUSH_CACHE_SIZE = int(os.getenv("LUNARCRUSH_CACHE_SIZE", "256"))
+
+# Provider API budgets (see bot.budget): requests per second and calls per
+# month for RapidAPI, requests per second and credits per day for LunarCrush
+RAPIDAPI_RATE = float(os.getenv("RAPIDAPI_RATE", "5"))
+RAPIDAPI_MONTHLY_QUOTA = int(os.getenv("RAPIDAPI_MONTHLY_QUOTA", "10000"))
+LUNARCRUSH_RATE = float(os.getenv("LUNARCRUSH_RATE", "1"))
+LUNARCRUSH_DAILY_CREDITS = int(os.getenv("LUNARCRUSH_DAILY_CREDITS", "2000"))
+# Number of processes calling the providers, which share the request rates:
+# every consumer replica and every job worker process of every render replica
+CONSUMER_REPLICAS = int(os.getenv("CONSUMER_REPLICAS", "1"))
+JOB_WORKER_REPLICAS = int(os.getenv("JOB_WORKER_REPLICAS", "1"))
+API_BUDGET_PROCESSES = int(
+    os.getenv("API_BUDGET_PROCESSES", str(CONSUMER_REPLICAS + JOB_WORKER_REPLICAS * JOB_WORKERS))
+)
+# Share of each quota held back from the premium, interactive, bulk and
+# background priorities, so the last calls of a period go to premium users
+API_BUDGET_RESERVE = [float(share) for share in os.getenv("API_BUDGET_RESERVE", "0,0.05,0.1,0.2").split(",")]
+# Seconds a call waits for the request rate before it is refused
+API_BUDGET_MAX_WAIT = float(os.getenv("API_BUDGET_MAX_WAIT", "10"))
+
+# Shared HTTP client of the provider APIs (see bot.http_client): connect and
+# read timeouts in seconds, retries of idempotent requests, backoff factor in
+# seconds, connections kept alive per host, and longest Retry-After in seconds
+# a retry waits for (longer ones return the response)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", "5"))
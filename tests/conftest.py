@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import, set them before any bot module is imported:
+# a throwaway SQLite database, in-process queues and no on-disk caches
+_workdir = tempfile.mkdtemp(prefix="cryptosentinel-tests-")
+os.environ.setdefault("MY_POSTGRESQL_URL", f"sqlite:///{os.path.join(_workdir, 'bot.db')}")
+os.environ.setdefault("CLOUDAMQP_URL", "amqp://localhost")
+os.environ.setdefault("QUEUE_BACKEND", "memory")
+os.environ.setdefault("CANDLE_STORE_PATH", "")
+os.environ.setdefault("RENDER_CACHE_PATH", "")
+os.environ.setdefault("MARKET_CATALOG_PATH", os.path.join(_workdir, "market_catalog.json"))
@@ -0,0 +1,66 @@
+from bot.acks import AckBatcher
+from bot.queues.rabbitmq import ack_batch_size
+
+
+class FakeChannel:
+    def __init__(self):
+        self.calls = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.calls.append(("ack", delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.calls.append(("nack", delivery_tag, requeue))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.calls.append(("publish", routing_key, body))
+
+
+def test_acks_wait_for_the_contiguous_run():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, batch_size=2)
+    for tag in (1, 2, 3):
+        acks.track(tag)
+    acks.settle(3)
+    acks.settle(2)
+    assert channel.calls == []
+    acks.settle(1)
+    assert channel.calls == [("ack", 3, True)]
+
+
+def test_flush_acks_an_incomplete_batch():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, batch_size=8)
+    acks.track(1)
+    acks.settle(1)
+    assert channel.calls == []
+    acks.flush()
+    assert channel.calls == [("ack", 1, True)]
+    acks.flush()
+    assert len(channel.calls) == 1
+
+
+def test_failed_delivery_goes_to_the_dead_letter_queue():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, batch_size=1, dead_letter_queue="telegram.dead")
+    acks.track(1)
+    acks.settle(1, b"update", success=False)
+    assert channel.calls == [("publish", "telegram.dead", b"update"), ("ack", 1, True)]
+
+
+def test_failed_delivery_is_rejected_without_a_dead_letter_queue():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, batch_size=1)
+    acks.track(1)
+    acks.track(2)
+    acks.settle(1, b"update", success=False)
+    acks.settle(2)
+    assert channel.calls == [("nack", 1, False), ("ack", 2, True)]
+
+
+def test_ack_batch_stays_below_every_prefetch():
+    consumers = [("telegram.premium", None, 19), ("telegram", None, 10), ("telegram.bulk", None, 3)]
+    assert ack_batch_size(8, consumers) == 1
+    assert ack_batch_size(8, [("telegram", None, 32)]) == 8
+    assert ack_batch_size(8, [("jobs", None, 1)]) == 1
+    assert ack_batch_size(8, []) == 8
@@ -0,0 +1,155 @@
+import threading
+
+import pytest
+
+from bot.alert_book import Alert, AlertBook
+from bot.database import PriceAlertRequest, Session
+from bot.scripts import alerts
+
+
+@pytest.fixture(autouse=True)
+def plain_markets(monkeypatch):
+    # Keep the market catalog (and its exchange requests) out of the tests
+    monkeypatch.setattr(AlertBook, "market", staticmethod(lambda symbol: symbol))
+
+
+@pytest.fixture
+def session():
+    session = Session()
+    session.query(PriceAlertRequest).delete()
+    session.commit()
+    yield session
+    session.query(PriceAlertRequest).delete()
+    session.commit()
+    session.close()
+
+
+def insert(session, alert_id, price_level, symbol="BTCUSDT"):
+    session.add(PriceAlertRequest(id=alert_id, user_id=1, symbol=symbol, price_level=price_level))
+    session.commit()
+
+
+def ids(alerts):
+    return sorted(alert.alert_id for alert in alerts)
+
+
+def test_crossed_and_nearby_levels_trigger_once():
+    book = AlertBook(band=0.005)
+    book.add(Alert(1, 1, "BTCUSDT", 100))
+    book.add(Alert(2, 1, "BTCUSDT", 110))
+    book.add(Alert(3, 1, "BTCUSDT", 130))
+
+    assert ids(book.update_price("BTCUSDT", 100.2)) == [1]
+    assert ids(book.update_price("BTCUSDT", 120)) == [2]
+    assert book.update_price("BTCUSDT", 120) == []
+    assert len(book) == 1
+
+
+def test_removed_alert_does_not_trigger():
+    book = AlertBook()
+    book.add(Alert(1, 1, "BTCUSDT", 100))
+    book.remove(1)
+
+    assert book.update_price("BTCUSDT", 100) == []
+    assert book.markets() == []
+
+
+def test_sync_picks_up_rows_committed_out_of_id_order(session):
+    book = AlertBook()
+    book.sync(session, PriceAlertRequest)
+    insert(session, 2, 100)
+    book.sync(session, PriceAlertRequest)
+
+    # Id 1 was allocated first but its transaction commits after the sync
+    insert(session, 1, 200)
+    book.sync(session, PriceAlertRequest)
+
+    assert len(book) == 2
+    assert ids(book.update_price("BTCUSDT", 200)) == [1]
+
+
+def test_sync_does_not_duplicate_known_alerts(session):
+    book = AlertBook()
+    insert(session, 1, 100)
+    book.sync(session, PriceAlertRequest)
+    book.sync(session, PriceAlertRequest)
+
+    assert ids(book.update_price("BTCUSDT", 100)) == [1]
+    assert len(book) == 0
+
+
+def test_full_reload_drops_alerts_removed_elsewhere(session):
+    book = AlertBook(resync_interval=0)
+    insert(session, 1, 100)
+    insert(session, 2, 100, symbol="ETHUSDT")
+    book.sync(session, PriceAlertRequest)
+    session.query(PriceAlertRequest).filter_by(id=2).delete()
+    session.commit()
+    book.sync(session, PriceAlertRequest)
+
+    assert book.markets() == ["BTCUSDT"]
+
+
+def test_market_lookup_does_not_hold_the_book(session, monkeypatch):
+    book = AlertBook()
+    insert(session, 2, 100)
+    answered = []
+
+    def slow_market(symbol):
+        # Another thread using the book while the catalog is being built
+        reader = threading.Thread(target=lambda: answered.append(book.markets()))
+        reader.start()
+        reader.join(5)
+        return symbol
+
+    monkeypatch.setattr(book, "market", slow_market)
+    book.add(Alert(3, 1, "SOLUSDT", 100))
+    book.sync(session, PriceAlertRequest)
+
+    assert len(answered) == 2
+    # The first sync is a full reload from the table
+    assert book.markets() == ["BTCUSDT"]
+
+
+class Bot:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    def send_message(self, chat_id, text):
+        if self.fail:
+            raise RuntimeError("telegram down")
+        self.sent.append(chat_id)
+
+
+@pytest.fixture
+def book(monkeypatch):
+    book = AlertBook()
+    monkeypatch.setattr(alerts, "alert_book", book)
+    return book
+
+
+def test_notified_alert_is_deleted(session, book):
+    insert(session, 1, 100)
+    bot = Bot()
+    alerts.PriceAlerts.notify(bot, Alert(1, 1, "BTCUSDT", 100), 100)
+
+    assert bot.sent == [1]
+    assert session.query(PriceAlertRequest).count() == 0
+
+
+def test_alert_is_kept_when_the_message_fails(session, book):
+    insert(session, 1, 100)
+    alert = Alert(1, 1, "BTCUSDT", 100)
+    alerts.PriceAlerts.notify(Bot(fail=True), alert, 100)
+
+    session.expire_all()
+    assert [row.id for row in session.query(PriceAlertRequest)] == [1]
+    # Triggers again at the next check
+    assert ids(book.update_price("BTCUSDT", 100)) == [1]
+
+
+def test_alert_gone_elsewhere_is_not_sent(session, book):
+    bot = Bot()
+    alerts.PriceAlerts.notify(bot, Alert(1, 1, "BTCUSDT", 100), 100)
+    assert bot.sent == []
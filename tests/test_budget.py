@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from bot.budget import (
+    BACKGROUND,
+    ApiBudget,
+    BudgetExceeded,
+    PriorityBucket,
+    Provider,
+    current_priority,
+    request_priority,
+)
+from bot.database import ApiUsage, Session
+
+PREMIUM = 0
+
+
+@pytest.fixture(autouse=True)
+def clear_usage():
+    session = Session()
+    session.query(ApiUsage).delete()
+    session.commit()
+    session.close()
+
+
+def test_premium_is_served_before_background_below_one_call_per_second():
+    bucket = PriorityBucket(rate=0.25, burst=0.25)
+    # A background call only takes a token from a full bucket...
+    assert bucket.acquire(BACKGROUND, timeout=0)
+    # ...and leaves one for premium, which background may not take
+    assert not bucket.acquire(BACKGROUND, timeout=0)
+    assert bucket.acquire(PREMIUM, timeout=0)
+    assert not bucket.acquire(PREMIUM, timeout=0)
+
+
+def test_bucket_refills_at_its_rate():
+    bucket = PriorityBucket(rate=20, burst=1)
+    assert bucket.acquire(PREMIUM, timeout=0)
+    assert bucket.acquire(PREMIUM, timeout=0)
+    started = time.monotonic()
+    assert bucket.acquire(PREMIUM, timeout=1)
+    assert time.monotonic() - started == pytest.approx(0.05, abs=0.04)
+
+
+def test_acquire_gives_up_after_the_timeout():
+    bucket = PriorityBucket(rate=0.1, burst=1)
+    bucket.acquire(PREMIUM, timeout=0)
+    bucket.acquire(PREMIUM, timeout=0)
+    assert not bucket.acquire(PREMIUM, timeout=0.05)
+
+
+def budget(quota, reserve=(0,)):
+    return ApiBudget([Provider("test", 1000, quota, "day")], reserve=reserve, max_wait=1)
+
+
+def test_quota_is_exact_across_threads():
+    api_budget = budget(quota=50)
+    granted = []
+    lock = threading.Lock()
+
+    def spend():
+        for _ in range(10):
+            try:
+                api_budget.spend("test", priority=PREMIUM)
+            except BudgetExceeded:
+                continue
+            with lock:
+                granted.append(1)
+
+    threads = [threading.Thread(target=spend) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert len(granted) == 50
+    assert api_budget.remaining("test")["remaining"] == 0
+
+
+def test_reserve_keeps_the_end_of_the_quota_for_premium():
+    api_budget = budget(quota=10, reserve=(0, 0.5))
+    for _ in range(5):
+        api_budget.spend("test", priority=BACKGROUND)
+    with pytest.raises(BudgetExceeded) as refused:
+        api_budget.spend("test", priority=BACKGROUND)
+    assert refused.value.reason == "quota used up"
+    for _ in range(5):
+        api_budget.spend("test", priority=PREMIUM)
+    with pytest.raises(BudgetExceeded):
+        api_budget.spend("test", priority=PREMIUM)
+
+
+def test_request_priority_is_per_thread_and_restored():
+    seen = []
+    with request_priority(PREMIUM):
+        thread = threading.Thread(target=lambda: seen.append(current_priority()))
+        thread.start()
+        thread.join()
+        assert current_priority() == PREMIUM
+    assert current_priority() == BACKGROUND
+    assert seen == [BACKGROUND]
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+
+from bot.candle_store import ROW_BYTES, CandleStore
+
+
+def candles(*timestamps):
+    return np.array([[t, 1.0, 2.0, 0.5, 1.5, 10.0] for t in timestamps])
+
+
+def test_missing_series_reads_empty(tmp_path):
+    assert CandleStore(str(tmp_path)).read("binance", "BTC/USDT", "1h").shape == (0, 6)
+
+
+def test_appends_only_add_newer_candles(tmp_path):
+    store = CandleStore(str(tmp_path))
+    assert store.append("binance", "BTC/USDT", "1h", candles(1, 2, 3)) == 3
+    assert store.append("binance", "BTC/USDT", "1h", candles(2, 3, 4, 5)) == 2
+    assert store.append("binance", "BTC/USDT", "1h", candles()) == 0
+    stored = store.read("binance", "BTC/USDT", "1h")
+    np.testing.assert_array_equal(stored, candles(1, 2, 3, 4, 5))
+
+
+def test_series_are_kept_apart(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append("binance", "BTC/USDT", "1h", candles(1))
+    store.append("binance", "BTC/USDT", "4h", candles(2))
+    store.append("bybit", "BTC/USDT", "1h", candles(3))
+    assert store.read("binance", "BTC/USDT", "4h")[0, 0] == 2
+    assert store.read("bybit", "BTC/USDT", "1h")[0, 0] == 3
+    assert os.path.basename(os.path.dirname(store.path("binance", "BTC/USDT", "1h"))) == "BTC_USDT"
+
+
+def test_incomplete_row_is_dropped_before_the_next_append(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append("binance", "BTC/USDT", "1h", candles(1, 2))
+    with open(store.path("binance", "BTC/USDT", "1h"), "ab") as f:
+        f.write(b"\0" * (ROW_BYTES // 2))
+    # Readers ignore the partial row
+    assert len(store.read("binance", "BTC/USDT", "1h")) == 2
+    store.append("binance", "BTC/USDT", "1h", candles(3))
+    np.testing.assert_array_equal(store.read("binance", "BTC/USDT", "1h"), candles(1, 2, 3))
+
+
+def test_reset_keeps_mapped_arrays_readable(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append("binance", "BTC/USDT", "1h", candles(1, 2))
+    mapped = store.read("binance", "BTC/USDT", "1h")
+    store.reset("binance", "BTC/USDT", "1h")
+    assert len(store.read("binance", "BTC/USDT", "1h")) == 0
+    np.testing.assert_array_equal(mapped, candles(1, 2))
@@ -0,0 +1,121 @@
+import threading
+import time
+import types
+
+import ccxt
+import pytest
+
+from bot import exchanges as exchanges_module
+from bot.exchanges import ExchangeRegistry
+
+
+class FakeExchange:
+    def __init__(self, exchange_id):
+        self.id = exchange_id
+        self.markets = None
+        self.loads = 0
+        self.fail = False
+
+    def load_markets(self, reload=False):
+        self.loads += 1
+        # Slow enough for concurrent callers to pile up
+        time.sleep(0.05)
+        if self.fail:
+            raise ccxt.NetworkError("exchange down")
+        self.markets = {"BTC/USDT": {"load": self.loads}}
+        return self.markets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(exchanges_module, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ExchangeRegistry(markets_ttl=60)
+    monkeypatch.setattr(registry, "_create", FakeExchange)
+    return registry
+
+
+def test_one_client_per_exchange(registry, clock):
+    bybit = registry.get("bybit")
+    assert registry.get("bybit") is bybit
+    assert registry.get("binance") is not bybit
+    assert bybit.loads == 1
+
+
+def test_clients_are_created_with_a_pooled_session():
+    exchange = ExchangeRegistry(pool_size=4)._create("bybit")
+    assert isinstance(exchange, ccxt.bybit)
+    assert exchange.session.get_adapter("https://api.bybit.com")._pool_maxsize == 4
+
+
+def test_markets_are_reloaded_after_the_ttl(registry, clock):
+    exchange = registry.get("bybit")
+    clock.now += 59
+    registry.get("bybit")
+    assert exchange.loads == 1
+    clock.now += 1
+    registry.get("bybit")
+    assert exchange.loads == 2
+    assert exchange.markets["BTC/USDT"]["load"] == 2
+
+
+def test_failed_reload_keeps_the_old_markets(registry, clock):
+    exchange = registry.get("bybit")
+    exchange.fail = True
+    clock.now += 60
+    assert registry.get("bybit").markets["BTC/USDT"]["load"] == 1
+    # Not retried on every call, only after the next interval
+    registry.get("bybit")
+    assert exchange.loads == 2
+
+
+def test_failed_first_load_raises(registry, monkeypatch):
+    def create(exchange_id):
+        exchange = FakeExchange(exchange_id)
+        exchange.fail = True
+        return exchange
+
+    monkeypatch.setattr(registry, "_create", create)
+    with pytest.raises(ccxt.NetworkError):
+        registry.get("bybit")
+
+
+def get_concurrently(registry, callers=8):
+    barrier = threading.Barrier(callers)
+    clients = []
+
+    def get():
+        barrier.wait()
+        clients.append(registry.get("bybit"))
+
+    threads = [threading.Thread(target=get) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(clients) == callers
+    return clients
+
+
+def test_concurrent_callers_load_the_markets_once(registry, clock):
+    clients = get_concurrently(registry)
+    assert all(client is clients[0] for client in clients)
+    assert clients[0].loads == 1
+    assert all(client.markets is not None for client in clients)
+
+    clock.now += 60
+    get_concurrently(registry)
+    assert clients[0].loads == 2
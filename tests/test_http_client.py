@@ -0,0 +1,133 @@
+import http.server
+import threading
+import time
+
+import pytest
+import requests
+
+from bot import http_client as http_client_module
+from bot.budget import ApiBudget, BudgetExceeded, Provider
+from bot.database import ApiUsage, Session
+from bot.http_client import HttpClient
+
+
+class ScriptedHandler(http.server.BaseHTTPRequestHandler):
+    """Answers each request with the next (status, headers, delay) of the server's script."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            status, headers, delay = server.script.pop(0) if server.script else (200, {}, 0)
+        time.sleep(delay)
+        body = b'{"ok": true}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = 0
+    server.script = []
+    server.url = f"http://127.0.0.1:{server.server_port}/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    session = Session()
+    session.query(ApiUsage).delete()
+    session.commit()
+    session.close()
+    api_budget = ApiBudget([Provider("metered", 1000, 1000, "day")], max_wait=1)
+    monkeypatch.setattr(http_client_module, "api_budget", api_budget)
+    return api_budget
+
+
+def client(**kwargs):
+    kwargs.setdefault("timeout", (1, 0.3))
+    kwargs.setdefault("backoff", 0.01)
+    return HttpClient(**kwargs)
+
+
+def test_transient_errors_are_retried(server):
+    server.script = [(503, {}, 0), (502, {}, 0)]
+    response = client(retries=2).get(server.url)
+    assert response.status_code == 200
+    assert server.hits == 3
+
+
+def test_last_response_is_returned_when_retries_run_out(server):
+    server.script = [(503, {}, 0)] * 3
+    response = client(retries=1).get(server.url)
+    assert response.status_code == 503
+    assert server.hits == 2
+
+
+def test_read_timeout_is_retried_then_raised(server):
+    server.script = [(200, {}, 1)] * 2
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client(retries=1).get(server.url)
+    assert server.hits == 2
+
+
+def test_short_retry_after_is_waited_for(server):
+    server.script = [(429, {"Retry-After": "0.2"}, 0)]
+    started = time.monotonic()
+    response = client().get(server.url)
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.2
+
+
+def test_long_retry_after_returns_the_response(server):
+    server.script = [(429, {"Retry-After": "120"}, 0)]
+    started = time.monotonic()
+    response = client(max_retry_after=5).get(server.url)
+    assert response.status_code == 429
+    assert server.hits == 1
+    assert time.monotonic() - started < 1
+
+
+def test_metered_requests_are_charged_per_attempt(server, budget):
+    server.script = [(503, {}, 0), (429, {}, 0)]
+    response = client(retries=2).get(server.url, provider="metered")
+    assert response.status_code == 200
+    assert budget.remaining("metered")["used"] == 3
+
+
+def test_refused_attempt_raises_without_a_request(server, budget):
+    budget.providers["metered"] = Provider("metered", 1000, 1, "day")
+    server.script = [(503, {}, 0)]
+    with pytest.raises(BudgetExceeded):
+        client(retries=2).get(server.url, provider="metered")
+    assert server.hits == 1
+
+
+def test_metrics_per_host(server):
+    server.script = [(503, {}, 0)]
+    http = client(retries=1)
+    http.get(server.url)
+    http.get(server.url)
+    stats = http.metrics()[f"127.0.0.1:{server.server_port}"]
+    assert stats["requests"] == 3
+    assert stats["retries"] == 1
+    assert stats["statuses"] == {503: 1, 200: 2}
+    assert stats["errors"] == 0
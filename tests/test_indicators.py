@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bot import indicators
+
+CLOSE = np.array([44.34, 44.09, 44.15, 43.61, 44.33, 44.83, 45.10, 45.42, 45.84, 46.08,
+                  45.89, 46.03, 45.61, 46.28, 46.28, 46.00, 46.03, 46.41, 46.22, 45.64])
+
+
+def test_sma_matches_a_rolling_mean():
+    expected = pd.Series(CLOSE).rolling(5).mean().to_numpy()
+    np.testing.assert_allclose(indicators.sma(CLOSE, 5), expected, rtol=1e-12)
+
+
+def test_ema_is_seeded_with_the_sma():
+    out = indicators.ema(CLOSE, 5)
+    assert np.isnan(out[:4]).all()
+    assert out[4] == pytest.approx(CLOSE[:5].mean())
+    assert out[5] == pytest.approx(out[4] + (CLOSE[5] - out[4]) / 3)
+
+
+def test_rsi_starts_from_the_average_gain_and_loss():
+    # First 14 changes: gains add up to 3.34 and losses to 1.40
+    out = indicators.rsi(CLOSE, 14)
+    assert np.isnan(out[:14]).all()
+    assert out[14] == pytest.approx(100 - 100 / (1 + 3.34 / 1.40))
+    # Then Wilder's smoothing of the next change (-0.28)
+    gain, loss = 3.34 / 14 * 13 / 14, (1.40 / 14 * 13 + 0.28) / 14
+    assert out[15] == pytest.approx(100 - 100 / (1 + gain / loss))
+
+
+def test_rsi_of_a_falling_series_is_0_and_rising_100():
+    assert indicators.rsi(np.arange(20.0, 0, -1), 14)[-1] == 0
+    assert indicators.rsi(np.arange(1.0, 21), 14)[-1] == 100
+
+
+def test_obv_adds_volume_on_up_closes():
+    close = np.array([10.0, 11, 11, 9, 12])
+    volume = np.array([5.0, 1, 2, 3, 4])
+    np.testing.assert_array_equal(indicators.obv(close, volume), [0, 1, 1, -2, 2])
+
+
+def test_mfi_is_100_without_negative_flow():
+    close = np.arange(1.0, 21)
+    out = indicators.mfi(close + 0.5, close - 0.5, close, np.ones(20), 14)
+    assert np.isnan(out[:14]).all()
+    assert (out[14:] == 100).all()
+
+
+def test_macd_histogram_is_line_minus_signal():
+    line, signal, histogram = indicators.macd(CLOSE, 5, 8, 3)
+    np.testing.assert_array_equal(histogram, line - signal)
+    # The signal warms up on the first defined MACD values
+    assert np.isnan(signal[:9]).all() and not np.isnan(signal[9])
+
+
+def test_api_shaped_results_drop_the_warm_up():
+    candles = np.zeros((len(CLOSE), 6))
+    candles[:, 4] = CLOSE
+    candles[:, 5] = 1.0
+    assert len(indicators.rsi_data(candles)["rsi"]) == len(CLOSE) - 14
+    assert len(indicators.macd_data(candles)["macd"]) == len(CLOSE) - 9
@@ -0,0 +1,88 @@
+import types
+
+import pytest
+
+from bot import ingest
+from bot.ingest import OutgoingUpdate, UpdateBuffer, UpdatePublisher
+from bot.queues import QueueError
+
+
+class FlakyBackend:
+    """Backend failing the publishes listed in `failures` (by attempt number)."""
+
+    def __init__(self, failures=()):
+        self.failures = set(failures)
+        self.attempts = 0
+        self.published = []
+
+    def declare(self, queue):
+        pass
+
+    def keepalive(self):
+        pass
+
+    def publish(self, queue, body, message_id=None, content_type=None, content_encoding=None):
+        self.attempts += 1
+        if self.attempts in self.failures:
+            raise QueueError("connection lost")
+        self.published.append(int(message_id))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ingest, "time", types.SimpleNamespace(sleep=sleeps.append))
+    return sleeps
+
+
+def update(update_id):
+    return OutgoingUpdate(update_id, "telegram", b"{}", None, None)
+
+
+def publish_all(backend, update_ids, batch_size=100, max_backoff=30):
+    buffer = UpdateBuffer(1000)
+    for update_id in update_ids:
+        buffer.put(update(update_id))
+    publisher = UpdatePublisher(backend, buffer, batch_size=batch_size, max_backoff=max_backoff)
+    publisher.start()
+    publisher.stop(timeout=5)
+    assert not publisher.is_alive()
+    return buffer
+
+
+def test_requeued_items_go_back_in_front_in_order():
+    buffer = UpdateBuffer(10)
+    for update_id in range(1, 6):
+        buffer.put(update_id)
+    batch = buffer.take(3)
+    buffer.requeue(batch[1:])
+    assert buffer.take(10) == [2, 3, 4, 5]
+
+
+def test_full_buffer_times_out():
+    buffer = UpdateBuffer(1)
+    assert buffer.put(1, timeout=0.01)
+    assert not buffer.put(2, timeout=0.01)
+
+
+def test_only_the_unconfirmed_tail_is_retried(sleeps):
+    backend = FlakyBackend(failures={3})
+    publish_all(backend, range(1, 6))
+    assert backend.published == [1, 2, 3, 4, 5]
+    # 5 updates, one failed attempt
+    assert backend.attempts == 6
+
+
+def test_failures_back_off_exponentially_up_to_the_cap(sleeps):
+    backend = FlakyBackend(failures={1, 2, 3, 4, 5, 7})
+    publish_all(backend, [1, 2], batch_size=1, max_backoff=8)
+    assert backend.published == [1, 2]
+    # The backoff starts over after a successful batch
+    assert sleeps == [1, 2, 4, 8, 8, 1]
+
+
+def test_stop_drains_the_buffer(sleeps):
+    backend = FlakyBackend()
+    buffer = publish_all(backend, range(250), batch_size=100)
+    assert backend.published == list(range(250))
+    assert len(buffer) == 0
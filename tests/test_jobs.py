@@ -0,0 +1,99 @@
+import json
+import signal
+import threading
+import types
+
+import pytest
+
+from bot import jobs
+from bot.jobs import JOB_QUEUE, consume_jobs, job_handler
+from bot.queues import MemoryQueueBackend
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    def edit_message_text(self, text, chat_id, message_id):
+        self.calls.append(("edit", chat_id, message_id, text))
+
+    def delete_message(self, chat_id, message_id):
+        self.calls.append(("delete", chat_id, message_id))
+
+
+@pytest.fixture
+def ran():
+    ran = types.SimpleNamespace(texts=[], finished=threading.Event())
+
+    @job_handler("test-echo")
+    def echo(bot, job):
+        ran.texts.append(job["params"]["text"])
+        ran.finished.set()
+
+    @job_handler("test-fail")
+    def fail(bot, job):
+        ran.finished.set()
+        raise RuntimeError("render failed")
+
+    yield ran
+    jobs.job_handlers.pop("test-echo")
+    jobs.job_handlers.pop("test-fail")
+
+
+def publish(backend, kind, **params):
+    job = {"kind": kind, "chat_id": 42, "progress_message_id": 7, "priority": 0, "params": params}
+    backend.publish(JOB_QUEUE, json.dumps(job).encode("utf-8"))
+
+
+def run_jobs(backend, bot):
+    pool = consume_jobs(backend, bot, workers=1)
+    backend.drain()
+    pool.stop(timeout=5)
+
+
+def test_jobs_run_and_are_settled(ran):
+    backend = MemoryQueueBackend()
+    publish(backend, "test-echo", text="hello")
+    run_jobs(backend, FakeBot())
+    assert ran.texts == ["hello"]
+    assert len(backend.acked) == 1
+
+
+def test_failed_job_reports_through_the_progress_message(ran):
+    backend = MemoryQueueBackend()
+    bot = FakeBot()
+    publish(backend, "test-fail")
+    run_jobs(backend, bot)
+    assert bot.calls == [("edit", 42, 7, "Something went wrong. Please try again later.")]
+    # Not retried, a failed render would only fail again
+    assert len(backend.acked) == 1
+
+
+def test_undecodable_job_is_dropped():
+    backend = MemoryQueueBackend()
+    backend.publish(JOB_QUEUE, b"not json")
+    run_jobs(backend, FakeBot())
+    assert len(backend.acked) == 1
+
+
+def test_job_worker_process_runs_jobs(ran, monkeypatch):
+    # Skipped without the chart rendering dependencies (plotly, ta)
+    tg_job_worker = pytest.importorskip("tg_job_worker")
+
+    backend = MemoryQueueBackend()
+    backend.close = lambda: None
+    publish(backend, "test-echo", text="from the worker")
+    monkeypatch.setattr(tg_job_worker, "create_backend", lambda: backend)
+    monkeypatch.setattr(tg_job_worker, "TELEGRAM_API_TOKEN", "123456:TEST")
+    # work() resets the signal handlers of the process it runs in
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+    stopper = threading.Thread(target=lambda: ran.finished.wait(5) and backend.stop())
+    stopper.start()
+    try:
+        tg_job_worker.work()
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        stopper.join()
+    assert ran.texts == ["from the worker"]
@@ -0,0 +1,81 @@
+import pytest
+
+from bot import lanes
+from bot.lanes import (
+    BULK_LANE,
+    INTERACTIVE_LANE,
+    PREMIUM_LANE,
+    classify_update,
+    command_name,
+    lane_prefetch,
+    lane_priority,
+)
+
+PREMIUM_USER = 1
+FREE_USER = 2
+
+
+@pytest.fixture(autouse=True)
+def subscriptions(monkeypatch):
+    lookups = []
+
+    def check_user_access(user_id):
+        lookups.append(user_id)
+        return user_id == PREMIUM_USER
+
+    lanes.tier_cache.clear()
+    monkeypatch.setattr(lanes, "check_user_access", check_user_access)
+    return lookups
+
+
+def message(user_id, text):
+    return {"update_id": 1, "message": {"from": {"id": user_id}, "text": text}}
+
+
+@pytest.mark.parametrize("text, command", [
+    ("/chart BTCUSDT 4h", "chart"),
+    ("/Chart@CryptoSentinelBot BTCUSDT", "chart"),
+    ("hello", None),
+    ("", None),
+])
+def test_command_name(text, command):
+    assert command_name(message(FREE_USER, text)) == command
+
+
+def test_free_users_expensive_commands_go_to_the_bulk_lane():
+    assert classify_update(message(FREE_USER, "/chart BTCUSDT")) == BULK_LANE
+    assert classify_update(message(FREE_USER, "/help")) == INTERACTIVE_LANE
+    assert classify_update(message(FREE_USER, "hello")) == INTERACTIVE_LANE
+
+
+def test_subscribers_and_payments_go_to_the_premium_lane():
+    assert classify_update(message(PREMIUM_USER, "/chart BTCUSDT")) == PREMIUM_LANE
+    assert classify_update({"pre_checkout_query": {"from": {"id": FREE_USER}}}) == PREMIUM_LANE
+    assert classify_update({"callback_query": {"from": {"id": FREE_USER}}}) == PREMIUM_LANE
+
+
+def test_subscription_lookups_are_cached(subscriptions):
+    for _ in range(3):
+        classify_update(message(FREE_USER, "/help"))
+    assert subscriptions == [FREE_USER]
+
+
+def test_failed_lookup_routes_as_free_and_is_not_cached(monkeypatch):
+    def check_user_access(user_id):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(lanes, "check_user_access", check_user_access)
+    assert classify_update(message(PREMIUM_USER, "/stats")) == BULK_LANE
+    assert PREMIUM_USER not in lanes.tier_cache
+
+
+def test_lane_priorities_follow_the_lane_order():
+    assert lane_priority(PREMIUM_LANE) < lane_priority(INTERACTIVE_LANE) < lane_priority(BULK_LANE)
+    assert lane_priority("unknown") > lane_priority(BULK_LANE)
+
+
+def test_every_lane_gets_some_prefetch():
+    shares = {lane: lane_prefetch(lane, 10) for lane in lanes.LANES}
+    assert all(share >= 1 for share in shares.values())
+    assert shares[PREMIUM_LANE] >= shares[BULK_LANE]
+    assert lane_prefetch(BULK_LANE, 1) == 1
@@ -0,0 +1,111 @@
+import types
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from bot.leader import LeaderLease, lock_key
+from bot.scheduler import PeriodicScheduler
+
+
+class FakePostgres:
+    """Session-level advisory locks of a Postgres server, for FakeEngine connections."""
+
+    def __init__(self):
+        self.locks = {}  # key -> holding connection
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.broken = False
+        self.closed = False
+
+    def execution_options(self, **options):
+        return self
+
+    def execute(self, statement, params=None):
+        if self.broken:
+            raise OperationalError(str(statement), params, Exception("server closed the connection"))
+        sql = str(statement)
+        if "pg_try_advisory_lock" in sql:
+            holder = self.server.locks.setdefault(params["key"], self)
+            return types.SimpleNamespace(scalar=lambda: holder is self)
+        if "pg_advisory_unlock" in sql:
+            self.server.locks.pop(params["key"], None)
+        return types.SimpleNamespace(scalar=lambda: 1)
+
+    def close(self):
+        self.closed = True
+        # Postgres releases the session's locks with the connection
+        for key, holder in list(self.server.locks.items()):
+            if holder is self:
+                del self.server.locks[key]
+
+
+class FakeEngine:
+    dialect = types.SimpleNamespace(name="postgresql")
+
+    def __init__(self, server):
+        self.server = server
+        self.connections = []
+
+    def connect(self):
+        self.connections.append(FakeConnection(self.server))
+        return self.connections[-1]
+
+
+def test_lock_key_is_stable_and_signed_64_bit():
+    assert lock_key("periodic-jobs") == lock_key("periodic-jobs")
+    assert lock_key("periodic-jobs") != lock_key("other")
+    assert -2 ** 63 <= lock_key("periodic-jobs") < 2 ** 63
+
+
+def test_one_replica_leads_until_it_releases():
+    server = FakePostgres()
+    first, second = LeaderLease(FakeEngine(server)), LeaderLease(FakeEngine(server))
+    assert first.refresh()
+    assert not second.refresh()
+    assert first.refresh()
+
+    first.release()
+    assert not first.is_leader
+    assert second.refresh()
+
+
+def test_followers_take_over_when_the_leader_connection_breaks():
+    server = FakePostgres()
+    engine = FakeEngine(server)
+    first, second = LeaderLease(engine), LeaderLease(FakeEngine(server))
+    assert first.refresh()
+
+    engine.connections[-1].broken = True
+    assert not first.refresh()
+    assert engine.connections[-1].closed
+    assert second.refresh()
+    # The old leader reconnects as a follower
+    assert not first.refresh()
+    assert len(engine.connections) == 2
+
+
+def test_other_databases_always_lead():
+    lease = LeaderLease(create_engine("sqlite://"))
+    assert lease.refresh()
+    lease.release()
+    assert not lease.is_leader
+
+
+def test_leader_only_jobs_run_on_the_leader():
+    server = FakePostgres()
+    leader, follower = LeaderLease(FakeEngine(server)), LeaderLease(FakeEngine(server))
+    leader.refresh()
+    follower.refresh()
+    runs = []
+    for lease in (leader, follower):
+        scheduler = PeriodicScheduler(leader=lease)
+        scheduler.add_job(lambda: runs.append(lease), 60, name="alerts", leader_only=True)
+        scheduler.add_job(lambda: runs.append("every replica"), 60, name="catalog")
+        # Run the jobs once, as the scheduler thread would
+        for job in scheduler.scheduler.get_jobs():
+            if job.name != "leader_lease":
+                job.func()
+    assert runs == [leader, "every replica", "every replica"]
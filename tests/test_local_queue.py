@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from bot.queues import AsyncioQueueBackend, QueueError
+
+
+class Recorder:
+    """Consumer callback keeping its deliveries, settled by the test."""
+
+    def __init__(self):
+        self.deliveries = []
+        self._condition = threading.Condition()
+
+    def __call__(self, delivery):
+        with self._condition:
+            self.deliveries.append(delivery)
+            self._condition.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        with self._condition:
+            assert self._condition.wait_for(lambda: len(self.deliveries) >= count, timeout)
+        # Give the backend a chance to deliver more than it should
+        time.sleep(0.05)
+        return [delivery.body for delivery in self.deliveries]
+
+
+@pytest.fixture
+def backend():
+    backend = AsyncioQueueBackend(maxsize=10, dead_letter_queue="dead", publish_timeout=0.2)
+    yield backend
+    backend.stop()
+    backend.close()
+
+
+def start(backend):
+    threading.Thread(target=backend.run, daemon=True).start()
+
+
+def test_consumer_holds_at_most_prefetch_deliveries(backend):
+    consumer = Recorder()
+    backend.consume("updates", consumer, prefetch=2)
+    for index in range(5):
+        backend.publish("updates", b"%d" % index)
+    start(backend)
+
+    assert consumer.wait_for(2) == [b"0", b"1"]
+    backend.settle(consumer.deliveries[0])
+    assert consumer.wait_for(3) == [b"0", b"1", b"2"]
+
+
+def test_acked_deliveries_are_gone(backend):
+    consumer, dead = Recorder(), Recorder()
+    backend.consume("updates", consumer, prefetch=1)
+    backend.consume("dead", dead)
+    backend.publish("updates", b"a")
+    backend.publish("updates", b"b")
+    start(backend)
+
+    consumer.wait_for(1)
+    backend.settle(consumer.deliveries[0])
+    consumer.wait_for(2)
+    backend.settle(consumer.deliveries[1])
+    time.sleep(0.05)
+    assert [delivery.body for delivery in consumer.deliveries] == [b"a", b"b"]
+    assert dead.deliveries == []
+
+
+def test_failed_delivery_is_dead_lettered_not_redelivered(backend):
+    # Like RabbitMQ rejects without requeueing, a failed message gets no
+    # other try on its queue
+    consumer, dead = Recorder(), Recorder()
+    backend.consume("updates", consumer, prefetch=1)
+    backend.consume("dead", dead)
+    backend.publish("updates", b"broken", message_id="7")
+    backend.publish("updates", b"next")
+    start(backend)
+
+    consumer.wait_for(1)
+    backend.settle(consumer.deliveries[0], success=False)
+    assert dead.wait_for(1) == [b"broken"]
+    assert dead.deliveries[0].message_id == "7"
+    # The failure freed the consumer's window, and the message did not come back
+    assert consumer.wait_for(2) == [b"broken", b"next"]
+
+
+def test_raising_callback_frees_its_window(backend):
+    received = []
+
+    def callback(delivery):
+        received.append(delivery.body)
+        raise RuntimeError("consumer bug")
+
+    backend.consume("updates", callback, prefetch=1)
+    backend.publish("updates", b"a")
+    backend.publish("updates", b"b")
+    start(backend)
+    deadline = time.monotonic() + 5
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert received == [b"a", b"b"]
+
+
+def test_publish_fails_when_the_queue_stays_full():
+    backend = AsyncioQueueBackend(maxsize=1, publish_timeout=0.05)
+    try:
+        backend.publish("updates", b"a")
+        with pytest.raises(QueueError):
+            backend.publish("updates", b"b")
+    finally:
+        backend.close()
@@ -0,0 +1,139 @@
+import threading
+import types
+
+import pytest
+
+from bot import lunarcrush as lunarcrush_module
+from bot.budget import BudgetExceeded
+from bot.lunarcrush import DEFAULT_TTL, LunarCrushClient, LunarCrushError, generated
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(lunarcrush_module, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def client():
+    client = LunarCrushClient("key", max_stale=3600)
+    client.responses = []
+    client.calls = 0
+
+    def fetch(endpoint, params, validate):
+        client.calls += 1
+        response = client.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client._fetch = fetch
+    return client
+
+
+def settle(client):
+    # Wait for the background refreshes
+    client._executor.shutdown(wait=True)
+
+
+def test_fresh_response_is_served_from_the_cache(client, clock):
+    client.responses = [{"v": 1}]
+    assert client.get("coins/1") == {"v": 1}
+    clock.now += DEFAULT_TTL - 1
+    assert client.get("coins/1") == {"v": 1}
+    assert client.calls == 1
+
+
+def test_params_are_part_of_the_key(client, clock):
+    client.responses = [{"v": 1}, {"v": 2}]
+    assert client.get("coins/global/top", {"page": 1}) == {"v": 1}
+    assert client.get("coins/global/top", {"page": 2}) == {"v": 2}
+
+
+def test_expired_response_is_served_while_it_is_refetched(client, clock):
+    client.responses = [{"v": 1}, {"v": 2}]
+    client.get("coins/1")
+    clock.now += DEFAULT_TTL
+    assert client.get("coins/1") == {"v": 1}
+    settle(client)
+    assert client.get("coins/1") == {"v": 2}
+    assert client.calls == 2
+
+
+def test_one_background_refresh_per_key(client, clock):
+    client.responses = [{"v": 1}, {"v": 2}]
+    client.get("coins/1")
+    clock.now += DEFAULT_TTL
+    release = threading.Event()
+    fetch = client._fetch
+
+    def slow_fetch(*args):
+        release.wait(5)
+        return fetch(*args)
+
+    client._fetch = slow_fetch
+    for _ in range(5):
+        assert client.get("coins/1") == {"v": 1}
+    release.set()
+    settle(client)
+    assert client.calls == 2
+
+
+def test_too_stale_response_is_refetched_before_answering(client, clock):
+    client.responses = [{"v": 1}, {"v": 2}]
+    client.get("coins/1")
+    clock.now += 3600
+    assert client.get("coins/1") == {"v": 2}
+
+
+def test_last_good_response_survives_failures(client, clock):
+    client.responses = [{"v": 1}, LunarCrushError("down"), LunarCrushError("down")]
+    client.get("coins/1")
+    clock.now += DEFAULT_TTL
+    assert client.get("coins/1") == {"v": 1}
+    settle(client)
+    clock.now += 3600
+    assert client.get("coins/1") == {"v": 1}
+
+
+def test_failure_without_a_cached_response_raises(client, clock):
+    client.responses = [LunarCrushError("down")]
+    with pytest.raises(LunarCrushError):
+        client.get("coins/1")
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+@pytest.mark.parametrize("outcome", [
+    BudgetExceeded("lunarcrush", "daily quota"),
+    Response([]),
+    Response({"config": {"generated": False}}),
+])
+def test_refused_and_incomplete_fetches_are_failures(monkeypatch, outcome):
+    def get(url, **kwargs):
+        assert kwargs["provider"] == "lunarcrush"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(lunarcrush_module.http_client, "get", get)
+    with pytest.raises(LunarCrushError):
+        LunarCrushClient("key").get("coinoftheday", validate=generated)
@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+import types
+
+import ccxt
+import pytest
+
+from bot import market_catalog as catalog_module
+from bot.market_catalog import Listing, MarketCatalog, normalize
+
+
+def market(base, quote, market_id=None, spot=True, active=True):
+    return {
+        "symbol": f"{base}/{quote}", "id": market_id or base + quote,
+        "base": base, "quote": quote, "spot": spot, "active": active,
+    }
+
+
+MARKETS = {
+    "binance": [market("BTC", "USDT"), market("ETH", "BTC"), market("BTC", "USDT", "BTCUSDT_PERP", spot=False)],
+    "bybit": [market("BTC", "USDT"), market("SOL", "USDT"), market("LUNA", "USDT", active=False)],
+}
+
+
+@pytest.fixture
+def exchanges(monkeypatch):
+    calls = []
+
+    def get_exchange(exchange_id):
+        calls.append(exchange_id)
+        if exchange_id not in MARKETS:
+            raise ccxt.NetworkError("exchange down")
+        markets = {m["id"] + str(index): m for index, m in enumerate(MARKETS[exchange_id])}
+        return types.SimpleNamespace(markets=markets)
+
+    monkeypatch.setattr(catalog_module, "get_exchange", get_exchange)
+    return calls
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.json")
+
+
+def catalog(path, exchange_ids=("binance", "bybit"), **kwargs):
+    return MarketCatalog(path, exchange_ids=exchange_ids, **kwargs)
+
+
+@pytest.mark.parametrize("symbol", ["btc", "BTC/USDT", "BTCUSDT", "btc-usdt", " btc_usdt "])
+def test_spellings_of_a_symbol_resolve_the_same(exchanges, path, symbol):
+    assert catalog(path).resolve(symbol) == [
+        Listing("binance", "BTC/USDT", "BTCUSDT"),
+        Listing("bybit", "BTC/USDT", "BTCUSDT"),
+    ]
+
+
+def test_normalize():
+    assert normalize("eth/btc") == "ETHBTC"
+    assert normalize(None) == ""
+
+
+def test_unknown_inactive_and_derivative_markets_are_not_listed(exchanges, path):
+    markets = catalog(path)
+    assert markets.resolve("DOGE") == []
+    assert markets.find("DOGE") is None
+    assert not markets.is_listed("LUNA")
+    assert [listing.market_id for listing in markets.resolve("BTC")] == ["BTCUSDT", "BTCUSDT"]
+
+
+def test_find_picks_the_preferred_or_given_exchange(exchanges, path):
+    markets = catalog(path)
+    assert markets.find("btc").exchange_id == "binance"
+    assert markets.find("btc", "bybit").exchange_id == "bybit"
+    assert markets.find("ETH/BTC", "bybit") is None
+
+
+def test_unreachable_exchange_is_skipped(exchanges, path):
+    markets = catalog(path, exchange_ids=("kucoin", "bybit"))
+    assert markets.find("SOL").exchange_id == "bybit"
+
+
+def test_persisted_catalog_is_loaded_without_exchange_calls(exchanges, path):
+    built = catalog(path)
+    built.resolve("btc")
+    exchanges.clear()
+
+    restarted = catalog(path)
+    assert restarted.resolve("btc") == built.resolve("btc")
+    assert restarted.updated_at == built.updated_at
+    assert exchanges == []
+
+
+def write(path, **fields):
+    data = {
+        "updated_at": time.time(),
+        "exchanges": ["binance", "bybit"],
+        "markets": {"DOGEUSDT": [["binance", "DOGE/USDT", "DOGEUSDT"]]},
+    }
+    data.update(fields)
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+@pytest.mark.parametrize("fields", [
+    {"exchanges": ["kucoin"]},
+    {"updated_at": time.time() - 8 * 86400},
+    {"markets": None},
+])
+def test_mismatched_stale_or_broken_catalog_is_rebuilt(exchanges, path, fields):
+    write(path, **fields)
+    markets = catalog(path)
+    assert not markets.load()
+    assert markets.find("btc") is not None
+    assert markets.find("doge") is None
+    assert exchanges
+
+
+def test_old_catalog_is_used_while_it_is_rebuilt(exchanges, path, monkeypatch):
+    write(path, updated_at=time.time() - 7200)
+    release = threading.Event()
+    get_exchange = catalog_module.get_exchange
+
+    def slow_get_exchange(exchange_id):
+        release.wait(5)
+        return get_exchange(exchange_id)
+
+    monkeypatch.setattr(catalog_module, "get_exchange", slow_get_exchange)
+    markets = catalog(path, max_age=3600)
+    # Answered from the persisted catalog, the rebuild runs in the background
+    assert markets.find("doge") is not None
+    release.set()
+    deadline = time.monotonic() + 5
+    while markets.find("btc") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert markets.find("doge") is None
@@ -0,0 +1,218 @@
+import numpy as np
+import pytest
+
+from bot import timeframes
+from bot.market_data import CLOSE, HIGH, LOW, OPEN, TIMESTAMP, VOLUME, MarketData, resample
+
+HOUR = timeframes.duration("1h")
+# Monday 2024-01-01 00:00 UTC plus 100 days and 30 minutes
+NOW = 1704067200000 + 100 * 24 * HOUR + 30 * 60 * 1000
+
+
+class FakeExchange:
+    """Exchange with synthetic candles from `listed` on, recording its fetch_ohlcv calls."""
+
+    id = "fake"
+    timeframes = {"1m": "1m", "1h": "1h", "1d": "1d"}
+
+    def __init__(self, listed=NOW - 1000 * 24 * HOUR, page=1000, default_page=200):
+        self.listed = listed
+        self.page = page
+        self.default_page = default_page
+        self.now = NOW
+        self.calls = []
+
+    def parse_timeframe(self, timeframe):
+        return timeframes.duration(timeframe) // 1000
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append((timeframe, since, limit))
+        period = timeframes.duration(timeframe)
+        first = -(-self.listed // period) * period
+        last = self.now // period * period
+        if since is None:
+            start = max(first, last - (self.default_page - 1) * period)
+        else:
+            start = max(first, -(-since // period) * period)
+        count = min(limit or self.default_page, self.page)
+        rows = []
+        for timestamp in range(start, last + 1, period):
+            if len(rows) == count:
+                break
+            price = timestamp / HOUR
+            rows.append([timestamp, price, price + 2, price - 1, price + 1, 1.0])
+        return rows
+
+
+def market_data(**kwargs):
+    kwargs.setdefault("base_timeframes", ("1h",))
+    kwargs.setdefault("base_candles", 5000)
+    kwargs.setdefault("min_refresh", 0)
+    return MarketData(**kwargs)
+
+
+def test_first_request_only_fetches_what_the_reader_needs():
+    exchange = FakeExchange()
+    candles = market_data().candles(exchange, "BTC/USDT", "4h", count=218)
+    # 219 4h candles need 876 1h candles: one page
+    assert len(exchange.calls) == 1
+    assert exchange.calls[0][0] == "1h"
+    assert len(candles) >= 218
+
+
+def test_longer_request_extends_the_series_backward():
+    exchange = FakeExchange()
+    data = market_data()
+    short = data.candles(exchange, "BTC/USDT", "1h", count=100)
+    assert len(short) == 100
+    exchange.calls.clear()
+
+    long = data.candles(exchange, "BTC/USDT", "1h", count=2500)
+    assert len(long) == 2500
+    assert np.all(np.diff(long[:, TIMESTAMP]) == HOUR)
+    assert long[-1, TIMESTAMP] == short[-1, TIMESTAMP]
+    # The catch-up from the last candle, then three pages of older ones
+    assert len(exchange.calls) == 4
+
+    # A shorter request keeps the longer history
+    assert len(data.candles(exchange, "BTC/USDT", "1h", count=10)) == 2500
+
+
+def test_series_is_capped_at_base_candles():
+    exchange = FakeExchange()
+    candles = market_data(base_candles=1500).candles(exchange, "BTC/USDT", "1h", count=4000)
+    assert len(candles) == 1500
+
+
+def test_young_market_is_not_paged_again():
+    exchange = FakeExchange(listed=NOW - 50 * HOUR)
+    data = market_data()
+    assert len(data.candles(exchange, "NEW/USDT", "1h", count=500)) == 50
+    exchange.calls.clear()
+    data.candles(exchange, "NEW/USDT", "1h", count=500)
+    # Only the catch-up from the last candle
+    assert len(exchange.calls) == 1
+    assert exchange.calls[0][1] == NOW // HOUR * HOUR
+
+
+def test_new_candles_are_fetched_from_the_last_cached_one():
+    exchange = FakeExchange()
+    data = market_data()
+    data.candles(exchange, "BTC/USDT", "1h", count=300)
+    exchange.now += 3 * HOUR
+    exchange.calls.clear()
+
+    candles = data.candles(exchange, "BTC/USDT", "1h", count=300)
+    assert [call[0:2] for call in exchange.calls] == [("1h", NOW // HOUR * HOUR)]
+    assert candles[-1, TIMESTAMP] == exchange.now // HOUR * HOUR
+    assert np.all(np.diff(candles[:, TIMESTAMP]) == HOUR)
+
+
+def test_fresh_series_is_served_from_the_cache():
+    exchange = FakeExchange()
+    data = market_data(min_refresh=60)
+    data.candles(exchange, "BTC/USDT", "1h", count=100)
+    data.candles(exchange, "BTC/USDT", "4h", count=20)
+    assert len(exchange.calls) == 1
+
+
+def test_without_count_the_exchange_default_is_fetched():
+    exchange = FakeExchange()
+    candles = market_data(base_timeframes=()).candles(exchange, "BTC/USDT", "1h")
+    assert exchange.calls == [("1h", None, None)]
+    assert len(candles) == 200
+
+
+def hourly(start, count):
+    timestamps = start + HOUR * np.arange(count)
+    prices = np.arange(count, dtype=np.float64)
+    return np.column_stack([timestamps, prices, prices + 2, prices - 1, prices + 1, np.ones(count)])
+
+
+def test_resample_aggregates_whole_buckets():
+    # Starts at 02:00, the 00:00 4h candle is incomplete and dropped
+    candles = hourly(1704067200000 + 2 * HOUR, 10)
+    four_hours = resample(candles, "4h")
+    assert list(four_hours[:, TIMESTAMP]) == [1704067200000 + 4 * HOUR, 1704067200000 + 8 * HOUR]
+    first = four_hours[0]
+    assert (first[OPEN], first[HIGH], first[LOW], first[CLOSE], first[VOLUME]) == (2, 7, 1, 6, 4)
+    # The last candle is still open with the hours it has so far
+    assert four_hours[1, VOLUME] == 4
+
+
+@pytest.mark.parametrize("timeframe, expected", [
+    ("1w", "2024-01-08T00:00"),  # Monday
+    ("1M", "2024-02-01T00:00"),
+])
+def test_resample_aligns_calendar_timeframes(timeframe, expected):
+    # From Wednesday 2024-01-03 to mid March, daily candles
+    day = timeframes.duration("1d")
+    start = 1704067200000 + 2 * day
+    candles = np.column_stack([
+        start + day * np.arange(75), np.ones(75), np.ones(75), np.ones(75), np.ones(75), np.ones(75),
+    ])
+    first = resample(candles, timeframe)[0, TIMESTAMP]
+    assert np.datetime64(int(first), "ms") == np.datetime64(expected)
+
+
+def test_history_combines_the_store_and_the_cache(tmp_path):
+    from datetime import datetime, timezone
+
+    from bot.candle_store import CandleStore
+
+    exchange = FakeExchange()
+    store = CandleStore(str(tmp_path))
+    data = market_data(store=store)
+    data.candles(exchange, "BTC/USDT", "1h", count=100)
+    # Closed candles only
+    assert len(store.read("fake", "BTC/USDT", "1h")) == 99
+
+    start = datetime.fromtimestamp((NOW - 2000 * HOUR) / 1000, timezone.utc).replace(tzinfo=None)
+    history = data.history(exchange, "BTC/USDT", "1h", start)
+    assert history[0, TIMESTAMP] >= NOW - 2000 * HOUR
+    assert len(history) == 2000
+    assert np.all(np.diff(history[:, TIMESTAMP]) == HOUR)
+
+    # After a restart the stored candles are read back, only newer ones are fetched
+    exchange.calls.clear()
+    restarted = market_data(store=store)
+    stored_start = datetime.fromtimestamp(
+        store.read("fake", "BTC/USDT", "1h")[0, TIMESTAMP] / 1000, timezone.utc
+    ).replace(tzinfo=None)
+    history = restarted.history(exchange, "BTC/USDT", "1h", stored_start)
+    assert exchange.calls == [("1h", NOW // HOUR * HOUR - HOUR, 1000)]
+    assert history[-1, TIMESTAMP] == NOW // HOUR * HOUR
+
+
+# Time ranges of the default /chart timeframes (see PlotChart.plot_ohlcv_chart)
+CHART_WINDOWS = {"1m": 0.5, "5m": 1, "15m": 3, "1h": 7, "4h": 14, "1d": 84, "1w": 560, "1M": 2268}
+
+
+@pytest.mark.parametrize("timeframe, days", sorted(CHART_WINDOWS.items()))
+def test_default_charts_get_their_full_window(timeframe, days):
+    from datetime import datetime, timezone
+
+    from config.settings import CANDLE_BASE_SIZE, CANDLE_BASE_TIMEFRAMES, CANDLE_FETCH_LIMIT
+
+    class Exchange(FakeExchange):
+        timeframes = {timeframe: timeframe for timeframe in ("1m", "5m", "15m", "1h", "4h", "1d", "1w", "1M")}
+
+    exchange = Exchange(listed=NOW - 10000 * 24 * HOUR)
+    data = market_data(
+        base_timeframes=CANDLE_BASE_TIMEFRAMES,
+        base_candles=CANDLE_BASE_SIZE,
+        fetch_limit=CANDLE_FETCH_LIMIT,
+    )
+    # The chart range plus the SMA50 warm-up
+    start_ms = NOW - days * 24 * HOUR - 50 * timeframes.duration(timeframe)
+    start = datetime.fromtimestamp(start_ms / 1000, timezone.utc).replace(tzinfo=None)
+    history = data.history(exchange, "BTC/USDT", timeframe, start)
+
+    assert history[0, TIMESTAMP] <= start_ms + timeframes.duration(timeframe)
+    assert history[-1, TIMESTAMP] == timeframes.bucket_starts([NOW], timeframe)[0]
+    if timeframe == "15m":
+        # Fetched as is, one exchange call
+        assert [call[0] for call in exchange.calls] == ["15m"]
@@ -0,0 +1,177 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from bot.alert_book import Alert, AlertBook
+from bot.price_feed import ReplaySource, SocketSource, StreamingAlerts, parse_tick
+
+
+@pytest.fixture(autouse=True)
+def plain_markets(monkeypatch):
+    # Keep the market catalog (and its exchange requests) out of the tests
+    monkeypatch.setattr(AlertBook, "market", staticmethod(lambda symbol: symbol))
+
+
+class Recorder:
+    def __init__(self):
+        self.alerts = []
+
+    def __call__(self, alert, price):
+        self.alerts.append((alert.alert_id, price))
+
+
+def write_ticks(path, ticks, start=1_700_000_000_000):
+    with open(path, "w") as f:
+        for index, (market, price) in enumerate(ticks):
+            f.write(f"{start + index * 100},{market},{price}\n")
+    return str(path)
+
+
+def replay(stream, path):
+    """Replay a tick file into `stream` and evaluate what it recorded."""
+    ReplaySource(path).run(stream.push)
+    stream.evaluate()
+
+
+def test_parse_tick_formats():
+    assert parse_tick('{"market": "BTC/USDT", "price": "27000.5", "timestamp": 1}\n') == ("BTC/USDT", 27000.5, 1)
+    assert parse_tick("1,BTC/USDT,27000.5\n") == ("BTC/USDT", 27000.5, 1)
+
+
+def test_wick_between_evaluations_triggers(tmp_path):
+    book = AlertBook(band=0)
+    book.add(Alert(1, 1, "BTC/USDT", 95))
+    book.add(Alert(2, 1, "BTC/USDT", 120))
+    on_alert = Recorder()
+    stream = StreamingAlerts(None, book, on_alert)
+
+    replay(stream, write_ticks(tmp_path / "first", [("BTC/USDT", 100)]))
+    assert on_alert.alerts == []
+
+    # Down to 90 and back within one evaluation: only the range is kept
+    replay(stream, write_ticks(tmp_path / "wick", [("BTC/USDT", p) for p in (98, 90, 97, 101)]))
+    assert on_alert.alerts == [(1, 90)]
+    assert len(book) == 1
+
+
+def test_inactive_follower_does_not_evaluate(tmp_path):
+    book = AlertBook(band=0)
+    book.add(Alert(1, 1, "BTC/USDT", 95))
+    on_alert = Recorder()
+    active = threading.Event()
+    stream = StreamingAlerts(None, book, on_alert, active=active.is_set)
+
+    replay(stream, write_ticks(tmp_path / "ticks", [("BTC/USDT", 100), ("BTC/USDT", 90)]))
+    assert (stream.ticks, stream.evaluations) == (2, 0)
+    assert on_alert.alerts == []
+    # Ticks seen while following are not evaluated later either
+    active.set()
+    stream.evaluate()
+    assert stream.evaluations == 0
+    assert len(book) == 1
+
+
+@pytest.mark.parametrize("alert_count", [1, 1000])
+def test_evaluation_work_does_not_grow_with_ticks_or_alerts(tmp_path, alert_count):
+    book = AlertBook(band=0)
+    for alert_id in range(alert_count):
+        book.add(Alert(alert_id, 1, "BTC/USDT", 1000 + alert_id))
+    stream = StreamingAlerts(None, book, Recorder())
+    ticks = [(market, 100 + index % 7) for index in range(5000) for market in ("BTC/USDT", "ETH/USDT")]
+
+    replay(stream, write_ticks(tmp_path / "ticks", ticks))
+    # One evaluation per market, whatever the number of ticks and alerts
+    assert stream.ticks == 10000
+    assert stream.evaluations == 2
+    assert len(book) == alert_count
+
+
+def test_replay_through_the_running_threads(tmp_path):
+    book = AlertBook(band=0)
+    book.add(Alert(1, 1, "ETH/USDT", 1500))
+    on_alert = Recorder()
+    ticks = [("ETH/USDT", 1490 + index % 5) for index in range(2000)] + [("ETH/USDT", 1505)]
+    stream = StreamingAlerts(ReplaySource(write_ticks(tmp_path / "ticks", ticks)), book, on_alert, interval=0.01)
+
+    stream.start()
+    deadline = time.monotonic() + 5
+    while not on_alert.alerts and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stream.stop(timeout=5)
+
+    assert on_alert.alerts == [(1, 1505)]
+    assert stream.ticks == len(ticks)
+    # Evaluations are paced by the interval, not by the ticks
+    assert stream.evaluations < len(ticks) / 10
+
+
+def test_replay_at_recorded_pace(tmp_path):
+    path = write_ticks(tmp_path / "ticks", [("BTC/USDT", 100)] * 4)
+    emitted = []
+    started = time.monotonic()
+    ReplaySource(path, speed=3).run(lambda *tick: emitted.append(tick))
+
+    # 300ms recorded, replayed three times faster
+    assert 0.09 <= time.monotonic() - started < 1
+    assert len(emitted) == 4
+
+
+class FeedServer:
+    """TCP feed sending one batch of lines per accepted connection, then closing it."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.connections = 0
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        for lines in self.batches:
+            conn, _ = self.sock.accept()
+            self.connections += 1
+            with conn:
+                conn.sendall("".join(lines).encode("utf-8"))
+
+    def close(self):
+        self.sock.close()
+
+
+def test_socket_source_skips_bad_lines_and_reconnects():
+    server = FeedServer([
+        ["1,BTC/USDT,100\n", "not a tick\n", '{"price": 1}\n', "\n", "2,BTC/USDT,101\n"],
+        ["3,BTC/USDT,102\n"],
+    ])
+    source = SocketSource("127.0.0.1", server.port)
+    emitted = []
+
+    def emit(market, price, timestamp):
+        emitted.append(price)
+        if len(emitted) == 3:
+            source.stop()
+
+    thread = threading.Thread(target=source.run, args=(emit,), daemon=True)
+    thread.start()
+    thread.join(10)
+    server.close()
+
+    assert not thread.is_alive()
+    assert emitted == [100, 101, 102]
+    assert server.connections == 2
+
+
+def test_socket_source_retries_a_refused_connection():
+    with socket.create_server(("127.0.0.1", 0)) as sock:
+        port = sock.getsockname()[1]
+    # Nothing listens on the port any more
+    source = SocketSource("127.0.0.1", port, max_backoff=1)
+    thread = threading.Thread(target=source.run, args=(lambda *tick: None,), daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    assert thread.is_alive()
+    source.stop()
+    thread.join(5)
+    assert not thread.is_alive()
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+import telegram
+from telegram.error import RetryAfter
+
+from bot.ratelimit import RateLimitedBot, TokenBucket
+from bot.workers import ChatWorkerPool
+from config.settings import TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE
+
+
+def test_bucket_serves_its_burst_then_paces_callers():
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    waits = [bucket.reserve() for _ in range(2)]
+    assert waits[0] == pytest.approx(0.1, abs=0.01)
+    assert waits[1] == pytest.approx(0.2, abs=0.01)
+
+
+def test_block_holds_back_every_caller():
+    bucket = TokenBucket(rate=10, capacity=3)
+    bucket.block(2)
+    assert bucket.reserve() == pytest.approx(2, abs=0.01)
+    assert bucket.reserve() == pytest.approx(2, abs=0.01)
+
+
+@pytest.fixture
+def bot():
+    return RateLimitedBot(token="123456:TEST", max_retries=1)
+
+
+@pytest.mark.parametrize("chat_id, rate", [
+    (42, TELEGRAM_CHAT_RATE),
+    ("42", TELEGRAM_CHAT_RATE),
+    (-1001234567, TELEGRAM_GROUP_RATE),
+    ("-1001234567", TELEGRAM_GROUP_RATE),
+    ("@channel", TELEGRAM_GROUP_RATE),
+])
+def test_chats_and_groups_get_their_own_limits(bot, chat_id, rate):
+    assert bot._chat_bucket(chat_id).rate == rate
+
+
+def test_string_and_int_ids_share_a_bucket(bot):
+    assert bot._chat_bucket("42") is bot._chat_bucket(42)
+
+
+def test_flood_wait_does_not_stall_other_chats(bot, monkeypatch):
+    sent = []
+    throttled = set()
+    lock = threading.Lock()
+
+    def post(self, endpoint, data=None, timeout=None, api_kwargs=None):
+        with lock:
+            if data["chat_id"] == 1 and 1 not in throttled:
+                throttled.add(1)
+                raise RetryAfter(0.5)
+            sent.append((data["chat_id"], data["text"], time.monotonic()))
+
+    monkeypatch.setattr(telegram.Bot, "_post", post)
+    done = threading.Event()
+
+    def handler(item):
+        bot._post("sendMessage", {"chat_id": item[0], "text": item[1]})
+        if len(sent) == 3:
+            done.set()
+
+    pool = ChatWorkerPool(1, handler)
+    started = time.monotonic()
+    pool.start()
+    pool.submit(1, (1, "first"))
+    pool.submit(1, (1, "second"))
+    pool.submit(2, (2, "other chat"))
+    assert done.wait(5)
+    pool.stop(timeout=5)
+
+    assert [text for _, text, _ in sent] == ["other chat", "first", "second"]
+    assert sent[0][2] - started < 0.4
+    assert sent[1][2] - started >= 0.5
+
+
+def test_bursting_chat_does_not_delay_other_chats(bot, monkeypatch):
+    sent = []
+
+    def post(self, endpoint, data=None, timeout=None, api_kwargs=None):
+        sent.append((data["text"], time.monotonic()))
+
+    monkeypatch.setattr(telegram.Bot, "_post", post)
+    # Chat 1 may send 2 messages, then 1 every 0.25s
+    bot._chat_buckets[1] = TokenBucket(rate=4, capacity=2)
+    done = threading.Event()
+
+    def handler(item):
+        chat_id, count = item
+        for index in range(count):
+            bot._post("sendMessage", {"chat_id": chat_id, "text": f"{chat_id}.{index}"})
+        if chat_id == 1:
+            done.set()
+
+    pool = ChatWorkerPool(1, handler)
+    started = time.monotonic()
+    pool.start()
+    pool.submit(1, (1, 6))
+    pool.submit(2, (2, 1))
+    assert done.wait(5)
+    pool.stop(timeout=5)
+
+    sent_at = dict(sent)
+    assert sent_at["2.0"] - started < 0.2
+    assert sent_at["1.5"] - started >= 0.9
+    assert [text for text, _ in sent if text.startswith("1.")] == [f"1.{index}" for index in range(6)]
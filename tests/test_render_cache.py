@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import time
+
+from bot.render_cache import RenderCache
+
+
+def render_in_process(directory, counter, key):
+    # Every process has its own cache object, as the job workers do
+    cache = RenderCache(directory, ttl=60)
+
+    def render():
+        with counter.get_lock():
+            counter.value += 1
+        time.sleep(0.3)
+        return b"png"
+
+    assert cache.get(key, render) == b"png"
+
+
+def test_processes_share_one_render(tmp_path):
+    context = multiprocessing.get_context("fork")
+    counter = context.Value("i", 0)
+    processes = [
+        context.Process(target=render_in_process, args=(str(tmp_path), counter, ("chart", "BTCUSDT", "4h")))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=10)
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert counter.value == 1
+
+
+def test_expired_image_is_rendered_again(tmp_path):
+    cache = RenderCache(str(tmp_path), ttl=60)
+    key = ("chart", "ETHUSDT", "1h")
+    assert cache.get(key, lambda: b"old") == b"old"
+    assert cache.get(key, lambda: b"new") == b"old"
+
+    expired = time.time() - 120
+    os.utime(cache.path(key), (expired, expired))
+    assert cache.get(key, lambda: b"new") == b"new"
+
+
+def test_none_is_not_cached(tmp_path):
+    cache = RenderCache(str(tmp_path), ttl=60)
+    key = ("chart", "NOPEUSDT", "1h")
+    assert cache.get(key, lambda: None) is None
+    assert cache.get(key, lambda: b"png") == b"png"
+
+
+def test_disabled_without_a_directory():
+    cache = RenderCache("", ttl=60)
+    renders = []
+    for _ in range(2):
+        cache.get(("chart", "BTCUSDT", "4h"), lambda: renders.append(1) or b"png")
+    assert len(renders) == 2
+
+
+def test_prune_keeps_fresh_images_and_locks(tmp_path):
+    cache = RenderCache(str(tmp_path), ttl=60)
+    fresh, stale = ("chart", "A", "1h"), ("chart", "B", "1h")
+    cache.get(fresh, lambda: b"a")
+    cache.get(stale, lambda: b"b")
+    expired = time.time() - 600
+    os.utime(cache.path(stale), (expired, expired))
+
+    cache.prune()
+
+    assert os.path.exists(cache.path(fresh))
+    assert not os.path.exists(cache.path(stale))
+    assert os.path.exists(cache.path(stale) + ".lock")
+
+
+def test_prune_removes_the_locks_of_expired_entries(tmp_path):
+    import fcntl
+
+    cache = RenderCache(str(tmp_path), ttl=60)
+    stale, busy = ("chart", "A", "1h"), ("chart", "B", "1h")
+    cache.get(stale, lambda: b"a")
+    cache.get(busy, lambda: b"b")
+    expired = time.time() - 600
+    for key in (stale, busy):
+        for path in (cache.path(key), cache.path(key) + ".lock"):
+            os.utime(path, (expired, expired))
+
+    with open(cache.path(busy) + ".lock", "a") as lock_file:
+        # A render in progress keeps its lock
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        cache.prune()
+
+    assert os.listdir(tmp_path) == [os.path.basename(cache.path(busy)) + ".lock"]
+    assert cache.get(stale, lambda: b"new") == b"new"
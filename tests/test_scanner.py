@@ -0,0 +1,34 @@
+import numpy as np
+
+from bot.scanner import composite_scores, rank
+
+NAN = float("nan")
+
+
+def test_composite_scores_use_the_signal_weights():
+    scores = composite_scores(
+        rsi=[25, 75, 50, NAN],
+        obv=[2, 1, 1, NAN],
+        previous_obv=[1, 2, 1, NAN],
+        mfi=[10, 90, 50, NAN],
+        histogram=[1, -1, 0, NAN],
+        previous_histogram=[0, 0, 0, NAN],
+    )
+    assert list(scores) == [4.5, -4.5, 0, 0]
+
+
+def test_rank_keeps_liquidity_order_between_equal_scores():
+    symbols = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "XRP/USDT", "DOGE/USDT"]
+    scores = [1, 2.5, 1, -1, -2.5]
+    rsi = [40, 25, NAN, 60, 75]
+
+    bullish, bearish = rank(symbols, scores, rsi, top=2)
+
+    assert [entry["symbol"] for entry in bullish] == ["ETH/USDT", "BTC/USDT"]
+    assert [entry["symbol"] for entry in bearish] == ["DOGE/USDT", "XRP/USDT"]
+    assert bullish[0] == {"symbol": "ETH/USDT", "score": 2.5, "rsi": 25.0}
+
+
+def test_rank_leaves_out_neutral_symbols():
+    bullish, bearish = rank(["BTC/USDT"], np.array([0.0]), [NAN])
+    assert bullish == [] and bearish == []
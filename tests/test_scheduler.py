@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from bot.scheduler import PeriodicScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = PeriodicScheduler(max_workers=4)
+    yield scheduler
+    scheduler.shutdown(wait=True)
+
+
+def test_long_run_does_not_overlap_the_next_one(scheduler):
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def slow_job():
+        with lock:
+            running.append(1)
+            overlaps.append(len(running))
+        time.sleep(0.35)
+        with lock:
+            running.pop()
+
+    scheduler.add_job(slow_job, 0.1, jitter=0)
+    scheduler.start()
+    time.sleep(1)
+    scheduler.shutdown(wait=True)
+
+    stats = scheduler.stats["slow_job"]
+    assert max(overlaps) == 1
+    assert 2 <= stats.runs <= 3
+    assert stats.skipped >= 3
+
+
+def test_missed_runs_are_coalesced(scheduler):
+    runs = []
+    scheduler.add_job(lambda: runs.append(1), 0.2, name="tick", jitter=0, run_now=False)
+    # Nothing runs while paused, five runs become due
+    scheduler.scheduler.start(paused=True)
+    time.sleep(1.1)
+    scheduler.scheduler.resume()
+    time.sleep(0.25)
+
+    # One catch-up run, then at most the next regular one
+    assert 1 <= len(runs) <= 2
+
+
+def test_durations_and_failures_are_recorded(scheduler):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        time.sleep(0.02)
+        if len(calls) == 2:
+            raise RuntimeError("provider down")
+
+    scheduler.add_job(flaky, 60)
+    for _ in range(3):
+        scheduler._run("flaky", flaky)
+
+    stats = scheduler.stats["flaky"]
+    assert (stats.runs, stats.failures) == (3, 1)
+    assert stats.last_duration >= 0.02
+    assert stats.max_duration >= stats.last_duration
+    assert stats.average_duration == pytest.approx(stats.total_duration / 3)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from bot.singleflight import SingleFlight, coalesce
+
+CALLERS = 20
+
+
+def run_concurrently(target, count=CALLERS):
+    """Start `count` threads running target() together, return their outcomes."""
+    barrier = threading.Barrier(count)
+    outcomes = [None] * count
+
+    def run(index):
+        barrier.wait()
+        try:
+            outcomes[index] = ("result", target())
+        except Exception as e:
+            outcomes[index] = ("error", e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+
+def slow_upstream(calls, result="chart", delay=0.2, error=None):
+    lock = threading.Lock()
+
+    def upstream():
+        with lock:
+            calls.append(1)
+        # Long enough for every caller to arrive while the call is in flight
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return upstream
+
+
+def test_concurrent_identical_calls_make_one_upstream_call():
+    flight = SingleFlight()
+    calls = []
+    upstream = slow_upstream(calls)
+
+    outcomes = run_concurrently(lambda: flight.do(("chart", "BTCUSDT", "4h"), upstream))
+
+    assert len(calls) == 1
+    assert outcomes == [("result", "chart")] * CALLERS
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    calls = []
+    error = RuntimeError("exchange down")
+    upstream = slow_upstream(calls, error=error)
+
+    outcomes = run_concurrently(lambda: flight.do("key", upstream))
+
+    assert len(calls) == 1
+    assert outcomes == [("error", error)] * CALLERS
+
+
+def test_key_is_released_after_the_call():
+    flight = SingleFlight()
+    calls = []
+    upstream = slow_upstream(calls, delay=0)
+
+    assert flight.do("key", upstream) == "chart"
+    assert flight.in_flight() == 0
+    # A later call computes afresh
+    assert flight.do("key", upstream) == "chart"
+    assert len(calls) == 2
+
+
+def test_key_is_released_after_an_error():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("key", slow_upstream([], delay=0, error=ValueError()))
+    assert flight.in_flight() == 0
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    calls = []
+    upstream = slow_upstream(calls, delay=0.05)
+    counter = iter(range(CALLERS))
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            key = next(counter)
+        return flight.do(key, upstream)
+
+    run_concurrently(call)
+    assert len(calls) == CALLERS
+
+
+def test_coalesce_builds_the_key_from_the_arguments():
+    flight = SingleFlight()
+    calls = []
+
+    @coalesce(lambda symbol, timeframe: ("chart", symbol.upper(), timeframe), flight)
+    def render(symbol, timeframe):
+        calls.append((symbol, timeframe))
+        time.sleep(0.2)
+        return f"{symbol.upper()} {timeframe}"
+
+    symbols = ["btcusdt", "BTCUSDT"] * (CALLERS // 2)
+    counter = iter(range(CALLERS))
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            index = next(counter)
+        return render(symbols[index], "4h")
+
+    outcomes = run_concurrently(call)
+    assert len(calls) == 1
+    assert outcomes == [("result", "BTCUSDT 4h")] * CALLERS
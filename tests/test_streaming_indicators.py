@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from bot.market_data import CLOSE, HIGH, LOW, OPEN, TIMESTAMP, VOLUME
+from bot.streaming_indicators import IndicatorSet, IndicatorStates, batch_values
+
+MINUTE = 60 * 1000
+
+
+def random_candles(count, seed=1, start=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    candles = np.empty((count, 6))
+    candles[:, TIMESTAMP] = start + np.arange(count) * MINUTE
+    candles[:, OPEN] = np.concatenate(([close[0]], close[:-1]))
+    candles[:, HIGH] = np.maximum(candles[:, OPEN], close) * 1.002
+    candles[:, LOW] = np.minimum(candles[:, OPEN], close) * 0.998
+    candles[:, CLOSE] = close
+    candles[:, VOLUME] = rng.uniform(1, 100, count)
+    # Flat closes exercise the zero change and zero flow branches
+    candles[20:23, CLOSE] = candles[19, CLOSE]
+    return candles
+
+
+def assert_same_values(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        if math.isnan(value):
+            assert math.isnan(actual[name]), name
+        else:
+            assert actual[name] == value, name
+
+
+@pytest.mark.parametrize("count", [1, 10, 15, 16, 30, 49, 50, 300])
+def test_streaming_values_equal_the_batch_values(count):
+    candles = random_candles(300)[:count]
+    state = IndicatorSet()
+    for candle in candles:
+        state.update(candle)
+    assert_same_values(state.values(), batch_values(candles))
+
+
+def test_rsi_and_mfi_of_a_rising_series_are_100():
+    candles = random_candles(40)
+    candles[:, CLOSE] = np.arange(40) + 100.0
+    candles[:, HIGH] = candles[:, CLOSE] + 1
+    candles[:, LOW] = candles[:, CLOSE] - 1
+    state = IndicatorSet()
+    for candle in candles:
+        state.update(candle)
+    assert state.rsi.value == 100.0
+    assert state.mfi.value == 100.0
+
+
+def test_states_only_take_new_closed_candles():
+    candles = random_candles(120)
+    states = IndicatorStates()
+    key = ("fake", "BTC/USDT", "1m")
+    open_time = candles[100, TIMESTAMP]
+
+    states.advance(key, candles[:60], closed_before=open_time)
+    # The cached window slides forward and overlaps what was already fed
+    state = states.advance(key, candles[40:101], closed_before=open_time)
+    assert state.last_timestamp == candles[99, TIMESTAMP]
+    assert_same_values(state.values(), batch_values(candles[:100]))
+    # Nothing new: the same state, unchanged
+    assert states.advance(key, candles[40:101], closed_before=open_time) is state
+    assert_same_values(state.values(), batch_values(candles[:100]))
+
+
+def test_state_starts_over_when_the_window_moved_past_it():
+    candles = random_candles(200)
+    states = IndicatorStates()
+    key = ("fake", "BTC/USDT", "1m")
+    states.advance(key, candles[:50], closed_before=candles[50, TIMESTAMP])
+
+    state = states.advance(key, candles[100:], closed_before=candles[-1, TIMESTAMP] + MINUTE)
+    assert_same_values(state.values(), batch_values(candles[100:]))
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from bot import timeframes
+
+HOUR = 3600 * 1000
+DAY = 24 * HOUR
+# Wednesday 2024-01-03 13:45 UTC
+WEDNESDAY = 1704289500000
+
+
+@pytest.mark.parametrize("timeframe, expected", [
+    ("15m", 15 * 60 * 1000),
+    ("4h", 4 * HOUR),
+    ("1w", 7 * DAY),
+    ("1M", 30 * DAY),
+])
+def test_duration(timeframe, expected):
+    assert timeframes.duration(timeframe) == expected
+
+
+@pytest.mark.parametrize("timeframe", ["", "0h", "4x", "h", None])
+def test_invalid_timeframes(timeframe):
+    assert not timeframes.is_valid(timeframe)
+    with pytest.raises(ValueError):
+        timeframes.parse(timeframe)
+
+
+@pytest.mark.parametrize("timeframe, expected", [
+    ("4h", 1704283200000),  # 12:00
+    ("1d", 1704240000000),  # Wednesday 00:00
+    ("1w", 1704067200000),  # Monday 2024-01-01
+    ("1M", 1704067200000),  # 2024-01-01
+    ("3M", 1704067200000),
+])
+def test_bucket_starts(timeframe, expected):
+    assert timeframes.bucket_starts(np.array([WEDNESDAY]), timeframe)[0] == expected
+
+
+@pytest.mark.parametrize("base, timeframe, divides", [
+    ("1h", "4h", True),
+    ("1h", "1w", True),
+    ("1h", "1M", True),
+    ("4h", "6h", False),
+    ("7h", "1d", False),
+    ("1M", "3M", True),
+    ("1d", "1M", True),
+    ("1M", "1y", True),
+    ("2M", "3M", False),
+])
+def test_divides(base, timeframe, divides):
+    assert timeframes.divides(base, timeframe) == divides
+
+
+def test_base_for_picks_the_longest_usable_base():
+    bases = ["1m", "1h", "1d"]
+    assert timeframes.base_for("4h", bases) == "1h"
+    assert timeframes.base_for("1w", bases) == "1d"
+    assert timeframes.base_for("1h", bases) == "1h"
+    assert timeframes.base_for("30s", bases) is None
@@ -0,0 +1,83 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from bot.webhook import SECRET_TOKEN_HEADER, WebhookServer
+
+SECRET = "s3cret"
+
+
+@pytest.fixture
+def server():
+    received = []
+    # Updates are accepted unless a test replaces on_update
+    server = WebhookServer(
+        ("127.0.0.1", 0), lambda update: received.append(update) or True, secret_token=SECRET
+    )
+    server.received = received
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+def post(server, body, path="/telegram", secret=SECRET):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    headers = {"Content-Type": "application/json"}
+    if secret is not None:
+        headers[SECRET_TOKEN_HEADER] = secret
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    connection.request("POST", path, body=body, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "text": "/help"}}
+
+
+def test_valid_update_is_accepted(server):
+    assert post(server, UPDATE) == 200
+    assert server.received == [UPDATE]
+
+
+@pytest.mark.parametrize("secret", ["wrong", "", None])
+def test_wrong_or_missing_secret_is_forbidden(server, secret):
+    assert post(server, UPDATE, secret=secret) == 403
+    assert server.received == []
+
+
+@pytest.mark.parametrize("body", [b"not json", [1, 2], {"message": {}}])
+def test_non_update_body_is_a_bad_request(server, body):
+    assert post(server, body) == 400
+    assert server.received == []
+
+
+def test_full_buffer_answers_busy(server):
+    server.on_update = lambda update: False
+    assert post(server, UPDATE) == 503
+
+
+def test_failing_callback_answers_500(server):
+    def on_update(update):
+        raise RuntimeError("database down")
+
+    server.on_update = on_update
+    assert post(server, UPDATE) == 500
+
+
+def test_wrong_path_is_not_found(server):
+    assert post(server, UPDATE, path="/other") == 404
+    assert server.received == []
+
+
+@pytest.mark.parametrize("secret_token", [None, ""])
+def test_server_refuses_to_start_without_a_secret(secret_token):
+    with pytest.raises(ValueError):
+        WebhookServer(("127.0.0.1", 0), lambda update: True, secret_token=secret_token)
@@ -0,0 +1,63 @@
+import json
+import zlib
+
+import pytest
+import telegram
+
+from bot.wire import CONTENT_TYPE, DEFLATE, decode_update, encode_update, project_update
+
+UPDATE = {
+    "update_id": 10,
+    "message": {
+        "message_id": 5,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private", "first_name": "Ann", "photo": {"small_file_id": "x"}},
+        "from": {"id": 42, "is_bot": False, "first_name": "Ann", "language_code": "en"},
+        "text": "/chart BTCUSDT 4h",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6, "url": None}],
+    },
+}
+
+
+def test_update_keeps_only_the_fields_handlers_read():
+    message = project_update(UPDATE)["message"]
+    assert message["chat"] == {"id": 42, "type": "private"}
+    assert "language_code" not in message["from"]
+    assert message["entities"] == [{"type": "bot_command", "offset": 0, "length": 6}]
+
+
+def test_unhandled_update_types_pass_untouched():
+    poll = {"update_id": 11, "poll": {"id": "1", "question": "?", "options": []}}
+    assert project_update(poll) == poll
+
+
+def test_round_trip_builds_the_same_telegram_update():
+    body, content_type, encoding = encode_update(UPDATE)
+    update = telegram.Update.de_json(decode_update(body, content_type, encoding), None)
+    assert update.effective_chat.id == 42
+    assert update.effective_user.id == 42
+    assert update.message.text == "/chart BTCUSDT 4h"
+    assert update.message.entities[0].type == "bot_command"
+
+
+def test_large_updates_are_compressed():
+    update = dict(UPDATE, message=dict(UPDATE["message"], text="x" * 4096))
+    body, content_type, encoding = encode_update(update)
+    assert (content_type, encoding) == (CONTENT_TYPE, DEFLATE)
+    assert len(body) < 1024
+    assert decode_update(body, content_type, encoding)["message"]["text"] == "x" * 4096
+
+
+def test_legacy_json_is_still_decoded():
+    body = json.dumps(UPDATE).encode()
+    assert decode_update(body, "application/json") == UPDATE
+    assert decode_update(body) == UPDATE
+
+
+@pytest.mark.parametrize("content_type, encoding", [
+    ("application/xml", None),
+    (CONTENT_TYPE, "gzip"),
+])
+def test_unknown_formats_are_rejected(content_type, encoding):
+    with pytest.raises(ValueError):
+        decode_update(zlib.compress(b"{}"), content_type, encoding)
@@ -0,0 +1,143 @@
+import threading
+
+from bot.workers import ChatWorkerPool, blocking
+
+
+def run_pool(submissions, size=1):
+    """Submit (chat_id, item, priority) before starting the pool, return the processing order."""
+    processed = []
+    done = threading.Event()
+
+    def handler(item):
+        processed.append(item)
+        if len(processed) == len(submissions):
+            done.set()
+
+    pool = ChatWorkerPool(size, handler)
+    for chat_id, item, priority in submissions:
+        pool.submit(chat_id, item, priority=priority)
+    pool.start()
+    assert done.wait(5)
+    pool.stop(timeout=5)
+    return processed
+
+
+def test_items_of_a_chat_keep_their_order_across_priorities():
+    processed = run_pool([
+        (1, "bulk /chart", 2),
+        (1, "premium /start", 0),
+        (1, "interactive /help", 1),
+    ])
+    assert processed == ["bulk /chart", "premium /start", "interactive /help"]
+
+
+def test_priority_orders_chats():
+    processed = run_pool([
+        (1, "bulk", 2),
+        (2, "interactive", 1),
+        (3, "premium", 0),
+    ])
+    assert processed == ["premium", "interactive", "bulk"]
+
+
+def test_chat_is_scheduled_by_its_oldest_item():
+    processed = run_pool([
+        (1, "chat 1 bulk", 2),
+        (1, "chat 1 premium", 0),
+        (2, "chat 2 interactive", 1),
+    ])
+    # Chat 1's premium update waits for its bulk one, which ranks after chat 2
+    assert processed == ["chat 2 interactive", "chat 1 bulk", "chat 1 premium"]
+
+
+def test_equal_priorities_run_in_submission_order():
+    submissions = [(chat_id % 3, index, 1) for index, chat_id in enumerate(range(9))]
+    assert run_pool(submissions) == list(range(9))
+
+
+def test_on_done_gets_the_handler_error():
+    results = []
+    done = threading.Event()
+
+    def handler(item):
+        if item == "bad":
+            raise ValueError(item)
+
+    def on_done(item, error):
+        results.append((item, type(error).__name__ if error else None))
+        if len(results) == 2:
+            done.set()
+
+    pool = ChatWorkerPool(2, handler)
+    pool.start()
+    pool.submit(1, "bad", on_done)
+    pool.submit(1, "good", on_done)
+    assert done.wait(5)
+    pool.stop(timeout=5)
+    assert results == [("bad", "ValueError"), ("good", None)]
+
+
+def test_stop_finishes_queued_items():
+    processed = []
+    pool = ChatWorkerPool(2, processed.append)
+    for index in range(20):
+        pool.submit(index, index, priority=index % 3)
+    pool.start()
+    pool.stop(timeout=5)
+    assert sorted(processed) == list(range(20))
+
+
+def test_chats_are_pinned_to_a_shard():
+    pool = ChatWorkerPool(4, lambda item: None)
+    assert pool.shard_for(-1001234567) == 1001234567 % 4
+    assert pool.shard_for(None) == 0
+    assert pool.shard_for("42") == pool.shard_for(42)
+
+
+def test_blocked_item_does_not_hold_back_other_chats():
+    processed = []
+    release = threading.Event()
+    done = threading.Event()
+
+    def handler(item):
+        if item == "chat 1 waits":
+            with blocking():
+                assert release.wait(5)
+        processed.append(item)
+        if item == "chat 2":
+            release.set()
+        if len(processed) == 3:
+            done.set()
+
+    pool = ChatWorkerPool(1, handler)
+    pool.start()
+    pool.submit(1, "chat 1 waits")
+    pool.submit(1, "chat 1 next")
+    pool.submit(2, "chat 2")
+    assert done.wait(5)
+    pool.stop(timeout=5)
+    # Chat 2 ran during the wait, chat 1 kept its order
+    assert processed == ["chat 2", "chat 1 waits", "chat 1 next"]
+
+
+def test_spare_threads_are_capped_and_retire():
+    started = threading.Barrier(3, timeout=5)
+    release = threading.Event()
+
+    def handler(item):
+        with blocking():
+            if item < 2:
+                started.wait()
+            assert release.wait(5)
+
+    pool = ChatWorkerPool(1, handler, spare_threads=1)
+    pool.start()
+    for chat_id in range(3):
+        pool.submit(chat_id, chat_id)
+    # Chats 0 and 1 wait, the spare started for chat 0 is the only one
+    started.wait()
+    assert pool._spares == 1
+    assert pool._shards[0].threads == 2
+    release.set()
+    pool.stop(timeout=5)
+    assert pool._shards[0].threads == 0
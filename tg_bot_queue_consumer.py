@@ -1,25 +1,26 @@
-# This script establishes a connection to RabbitMQ and listens for messages from the telegram que.
+# This script connects to the queue backend and listens for messages from the telegram que.
 # Initialize the The Telegram Bot to process the messages as they come in.
 # (messages are commands from users that will be processed by the bot)
 # Rate Limiting:
-# Telegram has a rate limit of 30 messages per second.
-# use the TokenBucket algorithm to limit the rate of messages sent to Telegram.
+# Telegram has a rate limit of 30 messages per second (and about 1 per second per chat).
+# The bot uses the TokenBucket algorithm to limit the rate of messages sent to Telegram.
 # Message Processing:
 # Define a function to process messages from the queue.
 # This function should consume messages from the queue and process them via the dispatcher command handlers of the bot.
 # # Main Function:
-# start consuming messages from the RabbitMQ queue.
+# start consuming messages from the update queues (RabbitMQ by default, see QUEUE_BACKEND).
+# With the in-process "local" backend this process also runs the ingest and the job
+# workers, so the whole bot runs as a single process on a single node.
 # You'll need to handle any potential errors that could occur during this process,
-# and you should also ensure that the RabbitMQ connection is
+# and you should also ensure that the queue connection is
 # closed when the application shuts down.
 
 
-import pika
-import json
 import logging
 import telegram
-import time
 import threading
+import zlib
+from cachetools import TTLCache
 from telegram.ext import (
     CallbackContext,
     CommandHandler,
@@ -32,8 +33,32 @@ from telegram.ext import (
 )
 from telegram.error import (
     TelegramError, Unauthorized, BadRequest, TimedOut, ChatMigrated, NetworkError)
-
-from config.settings import TELEGRAM_API_TOKEN, CLOUDAMQP_URL
+from telegram.utils.request import Request
+
+from config.settings import (
+    TELEGRAM_API_TOKEN,
+    UPDATE_WORKERS,
+    RABBITMQ_PREFETCH,
+    JOB_WORKERS,
+    INGEST_MODE,
+    SUBSCRIPTION_CHECK_INTERVAL,
+    PRICE_ALERT_INTERVAL,
+    LEADER_LEASE_INTERVAL,
+    SCAN_INTERVAL,
+)
+from bot.workers import ChatWorkerPool
+from bot.jobs import consume_jobs
+from bot.lanes import LANES, lane_prefetch, lane_priority
+from bot.queues import create_backend
+from bot.scheduler import PeriodicScheduler
+from bot.leader import LeaderLease
+from bot.database import engine
+from bot.alert_book import alert_book
+from bot.price_feed import StreamingAlerts, create_price_source
+from bot.scanner import market_scanner
+from bot.wire import decode_update
+from bot.ratelimit import RateLimitedBot
+from bot.budget import request_priority
 
 # Import all the command handlers
 # Start and help handlers
@@ -65,6 +90,7 @@ from bot.handlers.premium.positions import PositionsHandler
 from bot.handlers.premium.plot_chart import ChartHandler
 from bot.handlers.premium.stats import StatsHandler
 from bot.handlers.premium.signal import SignalHandler
+from bot.handlers.premium.scan import ScanHandler
 
 from users.management import check_expired_subscriptions
 
@@ -74,14 +100,17 @@ logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s
 
 logger = logging.getLogger(__name__)
 
-# setup connection to RabbitMQ
-params = pika.URLParameters(CLOUDAMQP_URL)
-connection = pika.BlockingConnection(params)
-channel = connection.channel()
-channel.queue_declare(queue='telegram')
+# Queue backend the updates are consumed from
+# (the broker connection is only opened by main)
+backend = create_backend()
 
 # Initialize the Telegram Bot
-bot = telegram.Bot(token=TELEGRAM_API_TOKEN)
+# (one HTTP connection per update worker, plus a few for the periodic jobs)
+# Outgoing sends, edits and deletes are throttled to the Telegram rate limits.
+bot = RateLimitedBot(
+    token=TELEGRAM_API_TOKEN,
+    request=Request(con_pool_size=UPDATE_WORKERS + 4),
+)
 
 # Initialize the Dispatcher
 dp = Dispatcher(bot, None, workers=1)
@@ -120,6 +149,7 @@ dp.add_handler(CommandHandler(
     "chart", ChartHandler.plot_chart, pass_args=True))
 dp.add_handler(StatsHandler.command_handler())
 dp.add_handler(SignalHandler.command_handler())
+dp.add_handler(ScanHandler.command_handler())
 
 # Subscribe Handlers
 subscribe_handler = SubscribeHandler.subscribe_handler
@@ -151,29 +181,6 @@ dp.add_handler(three_monthly_handler)
 dp.add_handler(yearly_handler)
 
 
-# Rate Limiting
-# Telegram has a rate limit of 30 messages per second.
-def rate_limited(max_per_second):
-    """
-    Decorator that make functions not be called faster than
-    """
-    min_interval = 1.0 / float(max_per_second)
-
-    def decorate(func):
-        last_time_called = [0.0]
-
-        def rate_limited_function(*args, **kargs):
-            elapsed = time.perf_counter() - last_time_called[0]
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            ret = func(*args, **kargs)
-            last_time_called[0] = time.perf_counter()
-            return ret
-        return rate_limited_function
-    return decorate
-
-
 def check_and_revoke_expired_subscriptions():
     revoked_users = check_expired_subscriptions()
     if revoked_users is None:
@@ -186,46 +193,142 @@ def check_and_revoke_expired_subscriptions():
         )
         logger.info(f"Revoked access for user {user_id}")
 
-    # Schedule the next run of this function
-    threading.Timer(300, check_and_revoke_expired_subscriptions).start()
-
 
 def check_price_alerts():
     PriceAlerts.check_price_alerts(bot)
 
-    # Schedule the next run of this functio
-    threading.Timer(30, check_price_alerts).start()
+
+# Recurring jobs, run on the scheduler's thread pool without overlapping runs
+# 1. check for expired subscriptions
+# 2. check for price alerts
+# 3. rescan the market once a candle closes (see bot.scanner)
+# Only the replica holding the leader lease runs them, so scaling out the consumers
+# does not send duplicate alerts or multiply the exchange calls
+scheduler = PeriodicScheduler(leader=LeaderLease(engine, name='periodic-jobs'),
+                              lease_interval=LEADER_LEASE_INTERVAL)
+scheduler.add_job(check_and_revoke_expired_subscriptions, SUBSCRIPTION_CHECK_INTERVAL,
+                  leader_only=True)
+scheduler.add_job(market_scanner.scan, SCAN_INTERVAL, name='market_scan', leader_only=True)
+
+# Price alerts are either checked against polled tickers, or evaluated on every
+# tick pushed by a price feed (PRICE_FEED), whose subscriptions follow the alert book
+price_source = create_price_source()
+if price_source is None:
+    scheduler.add_job(check_price_alerts, PRICE_ALERT_INTERVAL, leader_only=True)
+    price_stream = None
+else:
+    price_stream = StreamingAlerts(
+        price_source, alert_book,
+        lambda alert, price: PriceAlerts.notify(bot, alert, price),
+        active=lambda: scheduler.leader.is_leader)
+    scheduler.add_job(lambda: PriceAlerts.sync_price_stream(price_source), PRICE_ALERT_INTERVAL,
+                      name='sync_price_stream', leader_only=True)
+
+
+# Errors raised by handlers are caught by the dispatcher, so they are recorded
+# here and re-raised by the worker to mark the update as failed
+handler_errors = threading.local()
+
+
+def record_handler_error(update, context: CallbackContext):
+    logger.error('Update %s caused error: %s', getattr(update, 'update_id', None), context.error,
+                 exc_info=context.error)
+    handler_errors.error = context.error
+
+
+dp.add_error_handler(record_handler_error)
 
 
 # Message Processing
-@rate_limited(30)
-def process_message(ch, method, properties, body):
+def process_update(item):
+    update, priority = item
+    logging.info('Processing update: %s', update.update_id)
+    handler_errors.error = None
+    # Provider calls made by the handlers are budgeted with the lane's priority
+    with request_priority(priority):
+        dp.process_update(update)
+    if handler_errors.error is not None:
+        raise handler_errors.error
+
+
+# Updates are processed on a pool of workers, sharded by chat so that the
+# updates of one chat (e.g. the /contact conversation) stay in order
+workers = ChatWorkerPool(UPDATE_WORKERS, process_update)
+
+
+def update_chat_id(update):
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+# Ids of recently received updates. The publisher republishes updates whose
+# confirm was lost, so an update can arrive twice.
+seen_updates = TTLCache(maxsize=10000, ttl=600)
+
+
+def process_message(delivery):
+    if delivery.message_id is not None:
+        if delivery.message_id in seen_updates:
+            logging.info('Skipping duplicate update %s', delivery.message_id)
+            backend.settle(delivery)
+            return
+        seen_updates[delivery.message_id] = True
+
     # Deserialize update from queue
-    update_json = body.decode('utf-8')
-    update_dict = json.loads(update_json)
-    # Process update
     try:
-        logging.info('Processing update: %s', update_dict)
-        dp.process_update(telegram.Update.de_json(update_dict, bot))
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-    except (TelegramError, ValueError) as err:
+        update_dict = decode_update(delivery.body, delivery.content_type, delivery.content_encoding)
+        update = telegram.Update.de_json(update_dict, bot)
+    except (TelegramError, ValueError, zlib.error) as err:
         logging.error('Could not process update: %s', err)
+        backend.settle(delivery, success=False)
+        return
+
+    priority = lane_priority(delivery.queue)
+    workers.submit(update_chat_id(update), (update, priority),
+                   lambda item, error: backend.settle(delivery, success=error is None),
+                   priority=priority)
+
+
+def start_single_node() -> None:
+    # In-process queues can't be reached from other processes, so the ingest and
+    # the job workers run here, on their own threads
+    from tg_msg_publisher import create_ingest, ingest_options
+
+    consume_jobs(backend, bot, workers=JOB_WORKERS)
+    ingest = create_ingest(backend)
+    threading.Thread(target=ingest.run, args=(INGEST_MODE,), kwargs=ingest_options(INGEST_MODE),
+                     name='ingest', daemon=True).start()
 
 
 # Main Function
 def main() -> None:
+    if backend.in_process:
+        start_single_node()
+
     # Listen for messages
+    workers.start()
     logging.info('Listening for messages...')
-    channel.basic_consume(
-        queue='telegram', on_message_callback=process_message, auto_ack=False)
-    channel.start_consuming()
+    # Each lane gets its own share of the prefetch window, weighted by
+    # priority, so the backend keeps premium updates flowing while the bulk
+    # lane is busy. This limits the number of unacknowledged updates held by
+    # the consumer, so the workers stay fed without buffering the whole queue.
+    for lane in LANES:
+        backend.consume(lane, process_message, prefetch=lane_prefetch(lane, RABBITMQ_PREFETCH))
+    scheduler.start()
+    if price_stream is not None:
+        price_stream.start()
+    try:
+        backend.run()
+    finally:
+        if price_stream is not None:
+            price_stream.stop(timeout=5)
+        scheduler.shutdown(wait=False)
+        workers.stop()
+        backend.close()
 
 
 if __name__ == '__main__':
-    # add 2 recurring jobs
-    # 1. check for expired subscriptions
-    # 2. check for price alerts
-    check_and_revoke_expired_subscriptions()
-    check_price_alerts()
-
     main()
@@ -0,0 +1,93 @@
+# This script runs the job workers for chart rendering and analytics jobs.
+# Command handlers in the queue consumer only parse the command and publish a job
+# to the jobs queue, so slow renders never hold up the interactive updates.
+# Job Processing:
+# A pool of worker processes consumes the jobs queue, one job at a time per process.
+# Each job sends its result back to the chat and edits the job's progress message in place.
+# Main Function:
+# start the worker processes and restart any that exits unexpectedly.
+# Only used with the RabbitMQ queue backend; with an in-process backend the consumer runs
+# the jobs on worker threads.
+
+
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+
+from telegram.utils.request import Request
+
+from config.settings import TELEGRAM_API_TOKEN, JOB_WORKERS, QUEUE_BACKEND
+from bot.ratelimit import RateLimitedBot
+from bot.jobs import consume_jobs
+from bot.queues import create_backend
+
+# Import the modules that register job handlers
+import bot.utils  # noqa: F401 (chart)
+import bot.handlers.free.cotd  # noqa: F401 (cotd_chart)
+import bot.handlers.premium.positions  # noqa: F401 (positions)
+
+# Set up logging
+logging.basicConfig(format='%(asctime)s - %(name)s - %(processName)s - %(levelname)s - %(message)s',
+                    level=logging.INFO)
+
+logger = logging.getLogger(__name__)
+
+
+def work() -> None:
+    """Consume and run jobs until the process is stopped."""
+    # Don't run the parent's signal handler in the worker processes
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    telegram_bot = RateLimitedBot(token=TELEGRAM_API_TOKEN, request=Request(con_pool_size=4))
+
+    backend = create_backend()
+    # Jobs are slow, so each process only takes one at a time
+    pool = consume_jobs(backend, telegram_bot, workers=1)
+    logger.info('Waiting for jobs...')
+    try:
+        backend.run()
+    finally:
+        pool.stop()
+        backend.close()
+
+
+# Main Function
+def main() -> None:
+    if QUEUE_BACKEND != 'rabbitmq':
+        # In-process queues only exist inside the consumer, which runs the jobs itself
+        logger.error('Job workers need a shared queue backend, QUEUE_BACKEND is %s', QUEUE_BACKEND)
+        sys.exit(1)
+
+    processes = {}
+
+    def start_worker(index):
+        process = multiprocessing.Process(target=work, name=f'job-worker-{index}', daemon=True)
+        process.start()
+        processes[index] = process
+
+    def signal_handler(sig, frame):
+        logger.info('Signal received, stopping job workers...')
+        for process in processes.values():
+            process.terminate()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    for index in range(JOB_WORKERS):
+        start_worker(index)
+
+    # Restart workers that died (e.g. after losing the broker connection)
+    while True:
+        time.sleep(5)
+        for index, process in list(processes.items()):
+            if not process.is_alive():
+                logger.warning('Job worker %s exited, restarting it', index)
+                start_worker(index)
+
+
+if __name__ == '__main__':
+    main()
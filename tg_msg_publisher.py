@@ -1,106 +1,77 @@
 # This script listens for updates from the Telegram API.
-# When it receives a message, it publishes the message to a RabbitMQ queue.
+# When it receives an update, it publishes the update to the update queue.
+# Updates are either long polled in batches (INGEST_MODE=polling) or received by a
+# webhook HTTP server (INGEST_MODE=webhook) that can run as several replicas.
+# They are buffered locally; a publisher thread drains the buffer to the queue backend
+# (RabbitMQ by default, see QUEUE_BACKEND), so a short broker outage does not stop
+# ingestion and does not lose updates.
+# With the in-process "local" backend the consumer runs the ingest itself and this
+# script is not needed.
 
-import pika
-from pika.exceptions import AMQPConnectionError, ConnectionClosedByBroker
-import json
 import logging
 import telegram
-import ssl
-from telegram import Update
-from telegram.ext import (
-    CallbackContext,
-    MessageHandler,
-    Updater,
-    Filters,
-)
 
 from telegram.utils.request import Request
 import signal
 import sys
 
-from config.settings import TELEGRAM_API_TOKEN, CLOUDAMQP_URL
+from config.settings import (
+    TELEGRAM_API_TOKEN,
+    PUBLISH_BUFFER_SIZE,
+    PUBLISH_BATCH_SIZE,
+    POLL_TIMEOUT,
+    INGEST_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+)
+from bot.ingest import UpdateIngest
+from bot.queues import create_backend
 
 # Set up logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     level=logging.INFO)
 
-# setup connection to RabbitMQ
-params = pika.URLParameters(CLOUDAMQP_URL)
-# configure heartbeat to keep connection open (even when idle for a long time) to avoid timeouts
-# send heartbeat every 30 seconds
-params.heartbeat = 30
-
-# Create a connection and channel
-
-
-def create_connection_and_channel():
-    connection = pika.BlockingConnection(params)
-    channel = connection.channel()
-    channel.queue_declare(queue='telegram')
-    return connection, channel
-
-
-connection, channel = create_connection_and_channel()
-
-# Handle messages
-# When a message is received, publish it to RabbitMQ
-# The message should include the update_id, chat_id, and message text
-
 
-def handle_message(update: Update, context: CallbackContext) -> None:
-    global connection
-    global channel
-    logging.info('Received message: %s', update.message.text)
-    update_dict = update.to_dict()
-    update_json = json.dumps(update_dict, default=str)  # handle None values
-    while True:
-        try:
-            channel.basic_publish(exchange='',
-                                  routing_key='telegram',
-                                  body=update_json)
-            logging.info('Update published to RabbitMQ')
-            break
-        except (ConnectionClosedByBroker, AMQPConnectionError, ssl.SSLEOFError) as err:
-            logging.error('Could not publish update to RabbitMQ: %s', err)
-            # Close the old connection and create a new one
-            try:
-                connection.close()
-            except AMQPConnectionError:
-                pass  # Ignore errors when closing a broken connection
-            connection, channel = create_connection_and_channel()
+def ingest_options(mode):
+    # Options of UpdateIngest.run for the configured ingest mode
+    if mode == 'webhook':
+        if not WEBHOOK_SECRET_TOKEN:
+            # The webhook is public, without the token anyone could post forged updates
+            logging.error('INGEST_MODE=webhook needs WEBHOOK_SECRET_TOKEN')
+            sys.exit(1)
+        return dict(port=WEBHOOK_PORT, webhook_url=WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET_TOKEN, webhook_path=WEBHOOK_PATH)
+    return dict(poll_timeout=POLL_TIMEOUT)
 
-# Signal handling for graceful shutdown
 
-
-def signal_handler(sig, frame):
-    logging.info('Signal received, closing RabbitMQ connection...')
-    try:
-        connection.close()
-    except AMQPConnectionError:
-        pass  # Ignore errors when closing a broken connection
-    sys.exit(0)
-
-
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+def create_ingest(backend):
+    request = Request(connect_timeout=60, read_timeout=60, con_pool_size=8)
+    bot = telegram.Bot(token=TELEGRAM_API_TOKEN, request=request)
+    return UpdateIngest(bot, backend, buffer_size=PUBLISH_BUFFER_SIZE,
+                        batch_size=PUBLISH_BATCH_SIZE)
 
 # Main function
 
 
 def main() -> None:
-    request = Request(connect_timeout=60, read_timeout=60, con_pool_size=8)
-    bot = telegram.Bot(token=TELEGRAM_API_TOKEN, request=request)
-    updater = Updater(bot=bot, use_context=True)
-
-    # Listen for messages
-    updater.dispatcher.add_handler(
-        MessageHandler(Filters.text, handle_message))
-
-    # Publish messages to RabbitMQ
-    logging.info('Listening for messages...')
-    updater.start_polling()
-    updater.idle()
+    # The queue connection is only opened by the publisher thread
+    backend = create_backend()
+    ingest = create_ingest(backend)
+
+    # Signal handling for graceful shutdown
+    def signal_handler(sig, frame):
+        logging.info('Signal received, publishing buffered updates...')
+        ingest.stop(timeout=10)
+        backend.close()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    # Listen for updates and publish them
+    ingest.run(INGEST_MODE, **ingest_options(INGEST_MODE))
 
 
 if __name__ == '__main__':